@@ -23,6 +23,8 @@ const ChoroplethMap = () => {
                 const params = new URLSearchParams();
                 if (selectedState) params.append('state', selectedState);
                 if (selectedCounty) params.append('county', selectedCounty);
+                // Geometry comes from the long-lived /api/map/geometry assets; the response only carries the values
+                params.append('geometry', 'url');
 
                 const backendUrl = import.meta.env.VITE_BACKEND_URL || 'http://127.0.0.1:5020';
                 // console.log(`Fetching choropleth data from ${backendUrl} with params:`, Object.fromEntries(params));
@@ -57,12 +59,19 @@ const ChoroplethMap = () => {
                     throw new Error('Invalid response format: missing data array');
                 }
 
+                // Geometry URLs are paths on the backend; plotly would fetch them from the page's host
+                const traces = data.data.map(trace => (
+                    typeof trace.geojson === 'string'
+                        ? { ...trace, geojson: new URL(trace.geojson, backendUrl).href }
+                        : trace
+                ));
+
                 // Process the data to ensure all traces have geo reference and handle county color
                 let processedData;
 
                 if (selectedCounty) {
                     // For county level, create a custom trace with explicit blue color
-                    processedData = data.data.map(trace => {
+                    processedData = traces.map(trace => {
                         // Use a direct color without relying on colorscale
                         return {
                             ...trace,
@@ -86,7 +95,7 @@ const ChoroplethMap = () => {
                     });
                 } else {
                     // For state/national level, keep original behavior
-                    processedData = data.data.map(trace => ({
+                    processedData = traces.map(trace => ({
                         ...trace,
                         geo: 'geo'
                     }));
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useLocation } from "../context/LocationContext";
 
 const LatestInfections = () => {
@@ -8,8 +8,9 @@ const LatestInfections = () => {
     infected: [],
     flockType: [],
     state: []
-  }); // DataFrame-like structure
-  const [filteredIndices, setFilteredIndices] = useState([]); // Indices of filtered rows
+  }); // DataFrame-like structure holding the current page only
+  const [totalEntries, setTotalEntries] = useState(0); // Rows matching the state filter (server-side count)
+  const cursors = useRef([]); // cursors.current[n] = server cursor for page n + 1
   const [selectedState, setSelectedState] = useState("All");
   const [currentPage, setCurrentPage] = useState(1);
   const [entriesPerPage, setEntriesPerPage] = useState(10);
@@ -18,84 +19,93 @@ const LatestInfections = () => {
   const isMobile = window.matchMedia("(max-width: 768px)").matches;
   const [isTooltipVisible, setIsTooltipVisible] = useState(false);
 
-  // Fetch data from the API
+  // Fetch one newest-first page from the API (the server sorts, filters and paginates)
   useEffect(() => {
+    let ignore = false; // Set when a newer page request replaces this one
+
+    const requestPage = (useCursor) => {
+      const params = new URLSearchParams({ limit: entriesPerPage, total: "true" });
+      if (selectedState !== "All") {
+        params.append("state", selectedState);
+      }
+      // Walk pages with the cursor from the previous page; jump (ex: "Last") with an offset
+      const cursor = cursors.current[currentPage - 1];
+      if (useCursor && cursor) {
+        params.append("cursor", cursor);
+      } else {
+        params.append("offset", (currentPage - 1) * entriesPerPage);
+      }
+      return fetch(`${backendUrl}/api/outbreaks?${params}`);
+    };
+
     const fetchInfections = async () => {
       try {
-        const response = await fetch(`${backendUrl}/api/cdc/data`);
+        let response = await requestPage(true);
+        // The data was refreshed since the cursor was issued: start over from offsets
+        if (response.status === 409) {
+          cursors.current = [];
+          response = await requestPage(false);
+        }
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const data = await response.json();
+        const result = await response.json();
+        if (ignore) {
+          return;
+        }
+        const data = result.data;
 
-        // Convert the data to DataFrame-like structure
-        const newDf = {
+        setDf({
           date: data["Outbreak Date"] || [],
           location: data.County.map((county, idx) => `${county}, ${data.State[idx]}`),
           infected: data["Flock Size"].map(size => parseInt(size) || 0),
           flockType: data["Flock Type"] || [],
           state: data.State || []
-        };
-
-        // Sort by date (most recent first)
-        const indices = Array.from({ length: newDf.date.length }, (_, i) => i);
-        indices.sort((a, b) => new Date(newDf.date[b]) - new Date(newDf.date[a]));
-
-        // Reorder all columns based on sorted indices
-        const sortedDf = {
-          date: indices.map(i => newDf.date[i]),
-          location: indices.map(i => newDf.location[i]),
-          infected: indices.map(i => newDf.infected[i]),
-          flockType: indices.map(i => newDf.flockType[i]),
-          state: indices.map(i => newDf.state[i])
-        };
-
-        setDf(sortedDf);
-        setFilteredIndices(Array.from({ length: sortedDf.date.length }, (_, i) => i));
+        });
+        setTotalEntries(result.total);
+        cursors.current[currentPage] = result.next_cursor;
       } catch (error) {
         console.error("Error fetching infections:", error);
       }
     };
 
     fetchInfections();
-  }, [backendUrl]);
+    return () => {
+      ignore = true;
+    };
+  }, [backendUrl, selectedState, entriesPerPage, currentPage]);
 
-  // Update filtered indices when selected state changes
-  useEffect(() => {
-    if (selectedState === "All") {
-      setFilteredIndices(Array.from({ length: df.date.length }, (_, i) => i));
-    } else {
-      const filtered = df.state
-        .map((state, index) => state === selectedState ? index : -1)
-        .filter(index => index !== -1);
-      setFilteredIndices(filtered);
-    }
-    setCurrentPage(1); // Reset to first page when filter changes
-  }, [selectedState, df]);
+  // Cursors belong to one filter and page size: reset to first page when they change
+  const resetPages = () => {
+    cursors.current = [];
+    setCurrentPage(1);
+  };
 
   // Update selected state when location context changes
   useEffect(() => {
     if (selectedLocation?.state) {
+      cursors.current = [];
+      setCurrentPage(1);
       setSelectedState(selectedLocation.state);
     }
   }, [selectedLocation]);
 
   // Handle state filter change
   const handleStateChange = (event) => {
+    resetPages();
     setSelectedState(event.target.value);
   };
 
   // Handle entries per page change
   const handleEntriesPerPageChange = (event) => {
+    resetPages();
     setEntriesPerPage(Number(event.target.value));
-    setCurrentPage(1);
   };
 
   // Calculate pagination values
-  const totalPages = Math.ceil(filteredIndices.length / entriesPerPage);
+  const totalPages = Math.ceil(totalEntries / entriesPerPage);
   const startIndex = (currentPage - 1) * entriesPerPage;
   const endIndex = startIndex + entriesPerPage;
-  const currentIndices = filteredIndices.slice(startIndex, endIndex);
 
   // Handle page navigation
   const handlePageChange = (newPage) => {
@@ -104,19 +114,8 @@ const LatestInfections = () => {
     }
   };
 
-  // Helper function to get a subset of the DataFrame
-  const getDfSubset = (indices) => {
-    return {
-      date: indices.map(i => df.date[i]),
-      location: indices.map(i => df.location[i]),
-      infected: indices.map(i => df.infected[i]),
-      flockType: indices.map(i => df.flockType[i]),
-      state: indices.map(i => df.state[i])
-    };
-  };
-
-  // Get current page data
-  const currentDf = getDfSubset(currentIndices);
+  // Current page data
+  const currentDf = df;
 
   return (
     <div style={{
@@ -374,7 +373,7 @@ const LatestInfections = () => {
               ))}
             </tbody>
           </table>
-          {filteredIndices.length === 0 && (
+          {totalEntries === 0 && (
             <p style={{ textAlign: "center", marginTop: "0.625rem", fontSize: isMobile ? "0.875rem" : "1rem" }}>
               No data available for the selected state.
             </p>
@@ -382,7 +381,7 @@ const LatestInfections = () => {
         </div>
 
         {/* Pagination Controls */}
-        {filteredIndices.length > 0 && (
+        {totalEntries > 0 && (
           <div style={{
             display: "flex",
             flexDirection: isMobile ? "column" : "row",
@@ -394,7 +393,7 @@ const LatestInfections = () => {
             fontSize: isMobile ? "0.75rem" : "0.875rem"
           }}>
             <div>
-              Showing {startIndex + 1} to {Math.min(endIndex, filteredIndices.length)} of {filteredIndices.length} entries
+              Showing {startIndex + 1} to {Math.min(endIndex, totalEntries)} of {totalEntries} entries
             </div>
             <div style={{
               display: "flex",
@@ -1,5 +1,9 @@
 import os
+import io
+import threading
 import psycopg2
+from psycopg2 import pool
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -10,7 +14,13 @@ load_dotenv(dotenv_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connections kept open per gunicorn worker. Match DB_POOL_MAX to the worker's thread count
+# so every request thread can hold a connection without waiting
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", os.getenv("GUNICORN_THREADS", "4")))
+
 # Get connection to DB using Database URL
+# Opens a new connection every time; request code should use get_connection() instead
 def connect_db():
   try:
     conn = psycopg2.connect(DATABASE_URL)
@@ -20,12 +30,114 @@ def connect_db():
     print("Error connecting to database:", e)
     return None
 
+
+# --- connection pool ---
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# The pool is created on first use in each process. Gunicorn forks workers after importing the app,
+# so a pool inherited from the parent process is thrown away and rebuilt
+def get_pool():
+  global _pool, _pool_pid
+  if _pool is not None and _pool_pid == os.getpid():
+    return _pool
+  with _pool_lock:
+    if _pool is None or _pool_pid != os.getpid():
+      if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL environment variable not set.")
+      _pool = pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL)
+      _pool_pid = os.getpid()
+  return _pool
+
+# Borrow a pooled connection. Commits on success, rolls back on error, always returns it to the pool
+@contextmanager
+def get_connection():
+  db_pool = get_pool()
+  conn = db_pool.getconn()
+  try:
+    yield conn
+    conn.commit()
+  except Exception:
+    conn.rollback()
+    raise
+  finally:
+    db_pool.putconn(conn)
+
+def close_pool():
+  global _pool
+  with _pool_lock:
+    if _pool is not None:
+      _pool.closeall()
+      _pool = None
+
+
+# --- outbreaks table ---
+# One row per CDC outbreak, with typed and trimmed columns
+# source_index is the row's "Index" in the ingested dataset (rows without a date are skipped, so it isn't id - 1)
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS outbreaks (
+  id BIGSERIAL PRIMARY KEY,
+  source_index BIGINT,
+  outbreak_date DATE NOT NULL,
+  state TEXT NOT NULL,
+  county TEXT NOT NULL,
+  flock_type TEXT NOT NULL DEFAULT '',
+  flock_size BIGINT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbreaks_state_county_date_idx ON outbreaks (state, county, outbreak_date);
+CREATE INDEX IF NOT EXISTS outbreaks_date_idx ON outbreaks (outbreak_date);
+ALTER TABLE outbreaks ADD COLUMN IF NOT EXISTS source_index BIGINT;
+"""
+
+# Table column -> DataFrame column
+OUTBREAK_COLUMNS = {
+  "outbreak_date": "Outbreak Date",
+  "state": "State",
+  "county": "County",
+  "flock_type": "Flock Type",
+  "flock_size": "Flock Size",
+}
+
+def create_schema():
+  with get_connection() as conn:
+    with conn.cursor() as cur:
+      cur.execute(SCHEMA_SQL)
+
+# Replaces the table contents with df in one transaction (readers never see a half-written table)
+def replace_outbreaks(df):
+  import pandas as pd
+
+  frame = pd.DataFrame({
+    "source_index": pd.Series(df.index, index=df.index).astype("int64"),
+    "outbreak_date": pd.to_datetime(df["Outbreak Date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+    "state": df["State"].astype(str).str.strip(),
+    "county": df["County"].astype(str).str.strip(),
+    "flock_type": df["Flock Type"].fillna("").astype(str).str.strip(),
+    "flock_size": pd.to_numeric(df["Flock Size"], errors="coerce").fillna(0).astype("int64"),
+  })
+  frame = frame[frame["outbreak_date"].notna()]
+
+  buffer = io.StringIO()
+  frame.to_csv(buffer, index=False, header=False)
+  buffer.seek(0)
+
+  with get_connection() as conn:
+    with conn.cursor() as cur:
+      cur.execute(SCHEMA_SQL)
+      cur.execute("TRUNCATE outbreaks RESTART IDENTITY")
+      # In CSV format an empty field is NULL; FORCE_NOT_NULL loads blank text columns as ''
+      cur.copy_expert(
+        "COPY outbreaks (source_index, outbreak_date, state, county, flock_type, flock_size) FROM STDIN "
+        "WITH (FORMAT csv, FORCE_NOT_NULL (state, county, flock_type))",
+        buffer
+      )
+  return len(frame)
+
+
 # Testing connection with database
 def test_query():
-  conn = connect_db()
-  if conn:
-    cur = conn.cursor()
-    cur.execute("SELECT NOW();")
-    print("Database time:", cur.fetchone()[0])
-    cur.close()
-    conn.close()
\ No newline at end of file
+  with get_connection() as conn:
+    with conn.cursor() as cur:
+      cur.execute("SELECT NOW();")
+      print("Database time:", cur.fetchone()[0])
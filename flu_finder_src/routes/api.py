@@ -1,14 +1,23 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, url_for
 from flu_finder_src.utils import db_methods as data
 from flu_finder_src.utils import queries
 from flu_finder_src.utils import data_visualizer as dv
-from flu_finder_src.utils.map_visualizer import generate_choropleth
+from flu_finder_src.utils.map_visualizer import generate_choropleth, generate_choropleth_values
+from flu_finder_src.utils import geo_data
+from flu_finder_src.utils.schema import to_records_frame
+from flu_finder_src.routes.http_cache import register_http_cache
+from flu_finder_src.routes import compression
+from flu_finder_src.routes import choropleth_cache
+from flu_finder_src.routes import chart_cache
 import pandas as pd
 import json
+import math
 import numpy as np
 
 # Create a Blueprint for API routes
 api_bp = Blueprint('api', __name__, url_prefix='/api')
+# ETag / Last-Modified / 304 handling for every route below (see http_cache.py)
+register_http_cache(api_bp)
 
 class NumpyJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -21,8 +30,15 @@ class NumpyJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 # Endpoint for fetching data from the CDC
+# since - Optional data version (the "version" token of an earlier response) the client already holds.
+#         Returns only the rows added / changed / removed after it (see delta_response), or everything plus
+#         "resync_required" if the change log doesn't recognize it
 @api_bp.route('/cdc/data', methods=['GET'])
 def fetch_data():
+    since = request.args.get('since')
+    if since is not None:
+        return delta_response(since.strip())
+
     try:
         print("Fetching CDC data...")
         df = data.get_db()
@@ -34,21 +50,8 @@ def fetch_data():
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
             raise ValueError(f"Missing required columns: {missing_columns}")
-            
-        df['Outbreak Date'] = pd.to_datetime(df['Outbreak Date'], errors='coerce')
-        
-        # Convert DataFrame to records format with explicit error handling
-        records = {}
-        try:
-            records['Outbreak Date'] = (df['Outbreak Date'].dt.strftime('%m/%d/%Y').fillna('').tolist())
-            records['County'] = df['County'].fillna('Unknown').tolist()
-            records['State'] = df['State'].fillna('Unknown').tolist()
-            records['Flock Size'] = df['Flock Size'].fillna(0).astype(int).tolist()
-            records['Flock Type'] = df['Flock Type'].fillna('Unknown').tolist()
-        except Exception as e:
-            print(f"Error converting dates: {str(e)}")
-            records['Outbreak Date'] = df['Outbreak Date'].astype(str).tolist()
         
+        records = outbreak_records(df)
         print(f"Successfully prepared records with {len(records['State'])} entries")
         return jsonify(records)
     except Exception as e:
@@ -57,11 +60,88 @@ def fetch_data():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# Convert DataFrame to records format (column -> list) with explicit error handling
+# (dates are already parsed and names already cleaned when the snapshot loads, see schema.py)
+def outbreak_records(df):
+    records = {}
+    try:
+        records['Outbreak Date'] = (df['Outbreak Date'].dt.strftime('%m/%d/%Y').fillna('').tolist())
+        records['County'] = df['County'].astype(object).fillna('Unknown').tolist()
+        records['State'] = df['State'].astype(object).fillna('Unknown').tolist()
+        records['Flock Size'] = df['Flock Size'].fillna(0).astype(int).tolist()
+        records['Flock Type'] = df['Flock Type'].astype(object).fillna('Unknown').tolist()
+    except Exception as e:
+        print(f"Error converting dates: {str(e)}")
+        records['Outbreak Date'] = df['Outbreak Date'].astype(str).tolist()
+    return records
+
+# Row ids go out as 16-digit hex strings (JavaScript numbers can't hold 64-bit ints exactly)
+def row_id_strings(ids):
+    return [f"{int(row_id):016x}" for row_id in ids]
+
+# /api/cdc/data?since=<version>
+# {"version", "since", "resync_required": false, "added": {columns + "Row Id"}, "changed": {...}, "removed": [row ids]}
+# When `since` isn't a version the change log can get from (too old, or never seen by this worker):
+# every row (with "Row Id") and "resync_required": true
+def delta_response(since):
+    try:
+        snapshot = data.get_snapshot()
+        row_ids = queries.get_row_ids(snapshot)
+        delta = queries.get_changes_since(since, snapshot)
+
+        def rows_with_ids(ids):
+            positions = np.flatnonzero(np.isin(row_ids, ids))
+            records = outbreak_records(snapshot.frame.iloc[positions])
+            records['Row Id'] = row_id_strings(row_ids[positions])
+            return records
+
+        if delta is None:
+            return jsonify({
+                'version': snapshot.version,
+                'since': since,
+                'resync_required': True,
+                'data': rows_with_ids(row_ids)
+            })
+        return jsonify({
+            'version': snapshot.version,
+            'since': since,
+            'resync_required': False,
+            'added': rows_with_ids(delta['added']),
+            'changed': rows_with_ids(delta['changed']),
+            'removed': row_id_strings(delta['removed'])
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint for cache counters: snapshot hits/misses/load times/data version, plus raw vs sent bytes per route
+@api_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = data.get_snapshot_stats()
+    stats["responses"] = compression.stats()
+    stats["choropleth"] = choropleth_cache.stats()
+    stats["charts"] = chart_cache.stats()
+    return jsonify(stats)
+
+# Optional ?start=&end= for the summary endpoints (both inclusive, any format pandas understands)
+# Parsed up front so a bad date is a 400 instead of a 500
+def get_date_range_args():
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
+    for value in (start, end):
+        if value:
+            queries.parse_date_bound(value)
+    return start, end
+
 # Enpoint for data by country
 @api_bp.route('/country/data', methods=['GET'])
 def country_data():
     try:
-        summary = queries.get_national_summary()
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
+
+    try:
+        summary = queries.get_national_summary(start, end)
 
         return jsonify({
             'status': 'success',
@@ -75,12 +155,18 @@ def country_data():
 def state_data(state):
     if not state:
         return jsonify({'error': 'Valid State parameter is required'}), 400
+    try:
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
 
     try:
         state = state.title()
         filtered_data = queries.filter_by_state(state)
-        summary = queries.get_state_summary(state)
-        result = filtered_data.to_dict()
+        if start or end:
+            filtered_data = queries.get_time_frame_from_df(filtered_data, start, end)
+        summary = queries.get_state_summary(state, start, end)
+        result = to_records_frame(filtered_data).to_dict()
 
         return jsonify({
             'status': 'success',
@@ -96,13 +182,19 @@ def state_data(state):
 def county_data(state, county):
     if not county or not state:
         return jsonify({'error': 'Valid County and State parameters are required'}), 400
+    try:
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
 
     try:
         county = county.title()
         state = state.title()
         filtered_data = queries.filter_by_county(county, state)
-        summary = queries.get_county_summary(county, state)
-        result = filtered_data.to_dict()
+        if start or end:
+            filtered_data = queries.get_time_frame_from_df(filtered_data, start, end)
+        summary = queries.get_county_summary(county, state, start, end)
+        result = to_records_frame(filtered_data).to_dict()
 
         return jsonify({
             'status': 'success',
@@ -114,14 +206,137 @@ def county_data(state, county):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Endpoint for every summary at once: the nation, each state and each county
+# /api/summaries?scope=states,counties&start=01/01/2024&end=06/30/2024
+# scope - Comma-separated parts to return: national, states, counties. Defaults to all three
+# start, end - Optional time range, both inclusive
+@api_bp.route('/summaries', methods=['GET'])
+def summaries():
+    scope = [part.strip() for part in request.args.get('scope', '').split(',') if part.strip()]
+    invalid = [part for part in scope if part not in queries.SUMMARY_SCOPES]
+    if invalid:
+        return jsonify({'error': f'Invalid scope: {invalid}'}), 400
+    try:
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
+
+    try:
+        result = queries.get_all_summaries(start, end, scope)
+        return jsonify({
+            'status': 'success',
+            **result
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint for a newest-first page of outbreaks (replaces downloading all of /api/cdc/data to show a table)
+# /api/outbreaks?limit=25&state=Georgia&start=01/01/2024&total=true, then &cursor=<next_cursor> for the next page
+# limit - Rows per page (default 25, max 500)
+# cursor - next_cursor from the previous page. Only valid for the data version it came from (409 after a refresh)
+# offset - Rows to skip, for jumping to a page (ex: the last one) instead of walking cursors
+# state, county (needs state), flock_type - Optional filters (case insensitive)
+# start, end - Optional time range, both inclusive
+# fields - Comma-separated columns to return (default: all of them)
+# total - "true" to also count every matching row
+@api_bp.route('/outbreaks', methods=['GET'])
+def outbreaks():
+    try:
+        limit = int(request.args.get('limit', 25))
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or limit > 500 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be between 1 and 500 and offset must be 0 or more'}), 400
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()] or queries.LISTING_FIELDS
+    invalid = [field for field in fields if field not in queries.LISTING_FIELDS]
+    if invalid:
+        return jsonify({'error': f'Invalid fields: {invalid}'}), 400
+    state = request.args.get('state', '').strip().title() or None
+    county = request.args.get('county', '').strip().title() or None
+    if county and not state:
+        return jsonify({'error': 'county requires state'}), 400
+    try:
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
+
+    snapshot = data.get_snapshot()
+    cursor_version = snapshot.content_hash[:12]
+    before = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        version, _, position = cursor.partition('.')
+        if version != cursor_version:
+            return jsonify({'error': 'The data has been refreshed since this cursor was issued. Start again without a cursor'}), 409
+        try:
+            before = int(position)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        offset = 0
+
+    try:
+        listing = queries.get_outbreak_listing(snapshot)
+        positions, next_before, total = listing.page(
+            limit,
+            before=before,
+            offset=offset,
+            state=state,
+            county=county,
+            flock_type=request.args.get('flock_type'),
+            start=queries.parse_date_bound(start) if start else None,
+            end=queries.parse_date_bound(end) if end else None,
+            include_total=request.args.get('total', '').lower() == 'true',
+        )
+        result = {
+            'status': 'success',
+            'count': len(positions),
+            'next_cursor': f"{cursor_version}.{next_before}" if next_before is not None else None,
+            'data': listing.columns(positions, fields)
+        }
+        if total is not None:
+            result['total'] = total
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint for roll-ups of the aggregate cube (outbreak count + flock size per group)
+# /api/aggregates?by=State,Flock Type&state=Georgia&start=2024-01&end=2024-06
+# by - Comma-separated group columns: State, County, Flock Type, Month. Empty for a single total
+# state, county, flock_type - Optional filters (case insensitive)
+# start, end - Optional month range, both inclusive (ex: 2024-01)
+@api_bp.route('/aggregates', methods=['GET'])
+def aggregates():
+    by = [col.strip() for col in request.args.get('by', '').split(',') if col.strip()]
+    invalid = [col for col in by if col not in queries.DIMENSIONS + [queries.MONTH]]
+    if invalid:
+        return jsonify({'error': f'Invalid group columns: {invalid}'}), 400
+    try:
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
+
+    try:
+        rolled = queries.get_aggregates(
+            by,
+            state=request.args.get('state'),
+            county=request.args.get('county'),
+            flock_type=request.args.get('flock_type'),
+            start_month=start,
+            end_month=end,
+        )
+        return jsonify({
+            'status': 'success',
+            'by': by,
+            'data': rolled.to_dict(orient='records')
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Endpoint for initializing the map
 @api_bp.route('/map/initialize', methods=['GET'])
 def initialize_map_endpoint():
     try:
-        # Get the outbreak data
-        df = data.get_db()
-        # print("Successfully fetched database")
-
         # Create time frame if argument is passed
         # I think this fails because map only initializes once
         # start = request.args.get('start', None)
@@ -129,58 +344,17 @@ def initialize_map_endpoint():
         # if start or end:
         #     df = queries.get_time_frame_from_df(df.copy(), start=start, end=end)
 
-        # Count outbreaks per county
-        county_outbreaks = df.groupby(['State', 'County']).size().reset_index(name='outbreak_count')
-        print("Successfully counted outbreaks per county")
-
-        # Read the GeoJSON file
-        geojson_path = "flu_finder_src/data/geojson-counties-fips.json"
-        print(f"Attempting to read GeoJSON from: {geojson_path}")
-
-        try:
-            with open(geojson_path, "r") as f:
-                counties_geojson = json.load(f)
-            print("Successfully loaded GeoJSON file")
-        except FileNotFoundError:
-            print(f"GeoJSON file not found at {geojson_path}")
-            return jsonify({'error': 'GeoJSON file not found'}), 500
-        except json.JSONDecodeError as e:
-            print(f"Error decoding GeoJSON: {str(e)}")
-            return jsonify({'error': 'Invalid GeoJSON format'}), 500
-
-        # Add outbreak counts to GeoJSON properties
-        feature_count = 0
-        for feature in counties_geojson['features']:
-            county_name = feature['properties'].get('NAME')
-            state_name = feature['properties'].get('STATE')
-
-            if not county_name or not state_name:
-                continue
-
-            # Find matching outbreak count
-            match = county_outbreaks[
-                (county_outbreaks['County'].str.strip() == county_name.strip()) &
-                (county_outbreaks['State'].str.strip() == state_name.strip())
-            ]
-
-            # Add outbreak count to properties
-            feature['properties']['outbreak_count'] = int(match['outbreak_count'].iloc[0]) if not match.empty else 0
-
-            # Add total flock size if available
-            if not match.empty:
-                county_flock_size = df[
-                    (df['County'].str.strip() == county_name.strip()) &
-                    (df['State'].str.strip() == state_name.strip())
-                ]['Flock Size'].sum()
-                feature['properties']['flock_size'] = int(county_flock_size)
-            else:
-                feature['properties']['flock_size'] = 0
-
-            feature_count += 1
-
-        print(f"Processed {feature_count} features")
-        return jsonify(counties_geojson)
-
+        # The enriched GeoJSON only changes with the data, so it's built and serialized once per data version
+        snapshot = data.get_snapshot()
+        body = snapshot.derived("map_initialize_json", lambda frame: build_initialize_map_json(snapshot))
+        return current_app.response_class(body, mimetype="application/json")
+
+    except FileNotFoundError:
+        print(f"GeoJSON file not found at {geo_data.COUNTIES_GEOJSON_PATH}")
+        return jsonify({'error': 'GeoJSON file not found'}), 500
+    except json.JSONDecodeError as e:
+        print(f"Error decoding GeoJSON: {str(e)}")
+        return jsonify({'error': 'Invalid GeoJSON format'}), 500
     except Exception as e:
         import traceback
         print(f"Error in initialize_map_endpoint: {str(e)}")
@@ -188,51 +362,41 @@ def initialize_map_endpoint():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+# County GeoJSON with outbreak_count / flock_size on every feature, as the bytes jsonify would send
+# Outbreaks are counted and summed per county FIPS code in one grouped pass, then looked up by feature id
+def build_initialize_map_json(snapshot):
+    counties_geojson = geo_data.load_counties_geojson()
+    enriched = geo_data.enrich_county_features(counties_geojson, queries.get_fips_totals(snapshot))
+    return jsonify(enriched).get_data()
+
 # Endpoint for map data in GeoJSON format
 @api_bp.route('/map/data', methods=['GET'])
 def map_data():
+    # Optional filters: bbox=minLon,minLat,maxLon,maxLat (the visible viewport), start/end, flock_type
+    bbox = request.args.get('bbox')
+    if bbox:
+        try:
+            bbox = [float(value) for value in bbox.split(',')]
+            # float() also accepts "nan" / "inf", which the point index can't search with
+            if len(bbox) != 4 or not all(math.isfinite(value) for value in bbox):
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'bbox must be minLon,minLat,maxLon,maxLat'}), 400
     try:
-        df = data.get_db()
-        # print("DataFrame columns:", df.columns.tolist())  # Debug print
-
-        # Convert DataFrame to GeoJSON format
-        features = []
-        for _, row in df.iterrows():
-            try:
-                # Skip entries without valid coordinates
-                if 'Longitude' not in row or 'Latitude' not in row:
-                    continue
-
-                # Ensure coordinates are valid numbers
-                longitude = pd.to_numeric(row.get('Longitude', 0))
-                latitude = pd.to_numeric(row.get('Latitude', 0))
-
-                if pd.isna(longitude) or pd.isna(latitude):
-                    continue
-
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [longitude, latitude]
-                    },
-                    "properties": {
-                        "state": str(row.get('State', '')),
-                        "county": str(row.get('County', '')),
-                        "flockSize": int(row.get('Flock Size', 0)),
-                        "flockType": str(row.get('Flock Type', '')),
-                        "outbreakDate": str(row.get('Outbreak Date', ''))
-                    }
-                }
-                features.append(feature)
-            except Exception as row_error:
-                print(f"Error processing row: {row_error}")
-                continue
-
-        geojson = {
-            "type": "FeatureCollection",
-            "features": features
-        }
+        start, end = get_date_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end date'}), 400
+
+    try:
+        # Rows without valid coordinates are skipped (see map_points.py)
+        points = queries.get_point_index()
+        selected = points.select(
+            bbox=bbox,
+            start=queries.parse_date_bound(start) if start else None,
+            end=queries.parse_date_bound(end) if end else None,
+            flock_type=request.args.get('flock_type'),
+        )
+        geojson = points.feature_collection(selected)
 
         return jsonify(geojson)
     except Exception as e:
@@ -240,104 +404,164 @@ def map_data():
         return jsonify({'error': str(e)}), 500
     
 # Endpoint for interactive Plotly choropleth map
+# Served from the choropleth cache (see choropleth_cache.py); build_choropleth_json runs on a miss
+# geometry - "inline" (default) embeds the county GeoJSON in the figure. "url" leaves it out: the traces
+#            name the /map/geometry assets instead and the response also lists them under "geometry"
+# Either way the geometry is simplified for the view: national, or zoomed to the selected state (see geo_data.view_resolution)
 @api_bp.route('/map/choropleth', methods=['GET'])
 def get_choropleth_map():
     try:
         selected_state = request.args.get('state')
         selected_county = request.args.get('county')
-        
-        print(f"[DEBUG] Starting choropleth generation for state: {selected_state}, county: {selected_county}")
-        
+        geometry = request.args.get('geometry', 'inline')
+        if geometry not in ('inline', 'url'):
+            return jsonify({'error': 'geometry must be inline or url'}), 400
+        if geometry == 'url':
+            urls = geometry_urls(geo_data.view_resolution(selected_state), geo_data.state_partition().state_fips(selected_state))
+            build = lambda state, county: build_choropleth_values_json(urls, state, county)
+            body = choropleth_cache.get_choropleth_json(selected_state, selected_county, build, variant=tuple(urls.values()))
+        else:
+            body = choropleth_cache.get_choropleth_json(selected_state, selected_county, build_choropleth_json)
+        return body, {'Content-Type': 'application/json'}
+    except Exception as e:
+        import traceback
+        print(f"[DEBUG] Error in get_choropleth_map: {str(e)}")
+        print("[DEBUG] Traceback:")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+# The /map/choropleth response body (figure data, layout and bounds as JSON bytes)
+def build_choropleth_json(selected_state, selected_county):
+    print(f"[DEBUG] Starting choropleth generation for state: {selected_state}, county: {selected_county}")
+    try:
+        result = generate_choropleth(return_fig=True, selected_state=selected_state, selected_county=selected_county)
+        print("[DEBUG] Successfully generated choropleth")
+    except Exception as e:
+        print(f"[DEBUG] Error in generate_choropleth: {str(e)}")
+        import traceback
+        print("[DEBUG] Traceback:")
+        print(traceback.format_exc())
+        raise
+    
+    print("[DEBUG] Result type:", type(result))
+    if isinstance(result, dict) and 'figure' in result:
+        print("[DEBUG] Processing new format with bounds")
         try:
-            result = generate_choropleth(return_fig=True, selected_state=selected_state, selected_county=selected_county)
-            print("[DEBUG] Successfully generated choropleth")
+            # Check if data is already in dictionary format
+            figure_dict = {
+                'data': [trace if isinstance(trace, dict) else trace.to_plotly_json() 
+                        for trace in result['figure']['data']],
+                'layout': (result['figure']['layout'] if isinstance(result['figure']['layout'], dict) 
+                          else result['figure']['layout'].to_plotly_json()),
+                'bounds': result.get('bounds')
+            }
+            print("[DEBUG] Successfully created figure_dict")
         except Exception as e:
-            print(f"[DEBUG] Error in generate_choropleth: {str(e)}")
+            print(f"[DEBUG] Error creating figure_dict: {str(e)}")
             import traceback
             print("[DEBUG] Traceback:")
             print(traceback.format_exc())
             raise
-        
-        print("[DEBUG] Result type:", type(result))
-        if isinstance(result, dict) and 'figure' in result:
-            print("[DEBUG] Processing new format with bounds")
-            try:
-                # Check if data is already in dictionary format
-                figure_dict = {
-                    'data': [trace if isinstance(trace, dict) else trace.to_plotly_json() 
-                            for trace in result['figure']['data']],
-                    'layout': (result['figure']['layout'] if isinstance(result['figure']['layout'], dict) 
-                              else result['figure']['layout'].to_plotly_json()),
-                    'bounds': result.get('bounds')
-                }
-                print("[DEBUG] Successfully created figure_dict")
-            except Exception as e:
-                print(f"[DEBUG] Error creating figure_dict: {str(e)}")
-                import traceback
-                print("[DEBUG] Traceback:")
-                print(traceback.format_exc())
-                raise
-        else:
-            print("[DEBUG] Processing old format")
-            try:
-                figure_dict = {
-                    'data': [trace if isinstance(trace, dict) else trace.to_plotly_json() 
-                            for trace in result.data],
-                    'layout': result.layout.to_plotly_json() if hasattr(result.layout, 'to_plotly_json') 
-                             else result.layout
-                }
-                print("[DEBUG] Successfully created figure_dict from old format")
-            except Exception as e:
-                print(f"[DEBUG] Error creating figure_dict from old format: {str(e)}")
-                import traceback
-                print("[DEBUG] Traceback:")
-                print(traceback.format_exc())
-                raise
-        
+    else:
+        print("[DEBUG] Processing old format")
         try:
-            json_str = json.dumps(figure_dict, cls=NumpyJSONEncoder)
-            print(f"[DEBUG] Successfully serialized JSON (length: {len(json_str)})")
-            return json_str, {'Content-Type': 'application/json'}
+            figure_dict = {
+                'data': [trace if isinstance(trace, dict) else trace.to_plotly_json() 
+                        for trace in result.data],
+                'layout': result.layout.to_plotly_json() if hasattr(result.layout, 'to_plotly_json') 
+                         else result.layout
+            }
+            print("[DEBUG] Successfully created figure_dict from old format")
         except Exception as e:
-            print(f"[DEBUG] Error serializing to JSON: {str(e)}")
+            print(f"[DEBUG] Error creating figure_dict from old format: {str(e)}")
             import traceback
             print("[DEBUG] Traceback:")
             print(traceback.format_exc())
             raise
-            
+    
+    try:
+        json_str = json.dumps(figure_dict, cls=NumpyJSONEncoder)
+        print(f"[DEBUG] Successfully serialized JSON (length: {len(json_str)})")
+        return json_str.encode()
     except Exception as e:
+        print(f"[DEBUG] Error serializing to JSON: {str(e)}")
         import traceback
-        print(f"[DEBUG] Error in get_choropleth_map: {str(e)}")
         print("[DEBUG] Traceback:")
         print(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
+        raise
+
+# The geometry-free /map/choropleth response body: {"data", "layout", "bounds", "geometry"} as JSON bytes
+def build_choropleth_values_json(urls, selected_state, selected_county):
+    figure_dict = generate_choropleth_values(urls, selected_state=selected_state, selected_county=selected_county)
+    figure_dict['geometry'] = urls
+    return json.dumps(figure_dict, cls=NumpyJSONEncoder).encode()
+
+# Path of the current version of a geometry asset (ex: /api/map/geometry/counties.<digest>.json)
+# Relative, so the cached choropleth body doesn't depend on the host or scheme it was first built for
+# (behind Render's TLS proxy the request looks like plain http); the frontend resolves it against its backend URL
+def geometry_url(asset):
+    return url_for('api.map_geometry', name=asset, digest=geo_data.geometry_asset(asset)[1])
+
+# {"counties": url, "states": url} for a resolution (see geo_data.GEOMETRY_RESOLUTIONS)
+# With a state FIPS code, "counties" is only that state's counties and "neighbours" the ring around it
+def geometry_urls(resolution='full', state_fips=None):
+    urls = {name: geometry_url(geo_data.asset_name(name, resolution)) for name in geo_data.GEOMETRY_PATHS}
+    if state_fips:
+        urls['counties'] = geometry_url(geo_data.state_asset_name(state_fips))
+        urls['neighbours'] = geometry_url(geo_data.state_asset_name(state_fips, 'neighbours'))
+    return urls
+
+# County / state GeoJSON at every resolution (ex: counties, counties-national) and per state
+# (ex: counties-state-19, counties-state-19-neighbours), at URLs that change with the geometry (see geo_data.geometry_asset)
+# Served with a one-year immutable Cache-Control (see http_cache.py); an outdated hash is a 404
+@api_bp.route('/map/geometry/<name>.<digest>.json', methods=['GET'])
+def map_geometry(name, digest):
+    try:
+        body, current_digest = geo_data.geometry_asset(name)
+    except KeyError:
+        return jsonify({'error': f'Unknown geometry: {name}'}), 404
+    if digest != current_digest:
+        return jsonify({'error': 'Outdated geometry version', 'current': geometry_url(name)}), 404
+    return current_app.response_class(body, mimetype='application/json')
 
 # Endpoint for interactive Plotly charts
+# Served from the chart cache (see chart_cache.py); build_chart runs on a miss
+# The Server-Timing header reports the build's compute / figure / serialize time (or the cache lookup)
 @api_bp.route('/chart', methods=['GET'])
 def create_graph():
-    # Get data
-    df = data.get_db()
-    
-    # Mapping chart types to functions
-    chart_options = {
-        'hbar_sizes': dv.get_horizontal_comparison_flock_sizes,
-        'hbar_freqs': dv.get_horizontal_comparison_frequencies,
-        'hbar_types': dv.get_horizontal_comparison_flock_types,
-        'pie_sizes': dv.get_pie_flock_sizes,
-        'pie_freqs': dv.get_pie_frequencies,
-        'pie_types': dv.get_pie_flock_types,
-        'vbar': dv.get_vertical_outbreaks_over_time,
-    }
-
     chart_type = request.args.get("type", default="vbar")
-    chart_func = chart_options.get(chart_type)
-
-    if not chart_func:
+    if chart_type not in chart_options:
         return {"error": "Invalid chart type"}, 400
 
-    # Get all other query parameters except 'type'
-    params = {key: value for key, value in request.args.items() if key != "type"}
-    
+    try:
+        params = chart_cache.normalize_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    body, mimetype, timings = chart_cache.get_chart(chart_type, params, build_chart)
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.headers["Server-Timing"] = chart_cache.server_timing(timings)
+    return response
+
+# Mapping chart types to functions
+chart_options = {
+    'hbar_sizes': dv.get_horizontal_comparison_flock_sizes,
+    'hbar_freqs': dv.get_horizontal_comparison_frequencies,
+    'hbar_types': dv.get_horizontal_comparison_flock_types,
+    'pie_sizes': dv.get_pie_flock_sizes,
+    'pie_freqs': dv.get_pie_frequencies,
+    'pie_types': dv.get_pie_flock_types,
+    'vbar': dv.get_vertical_outbreaks_over_time,
+}
+
+# The /chart response body: {"config": ..., "figure": ...} as JSON bytes
+# The figure is serialized once by plotly and dropped into the envelope as it is (not parsed and re-encoded)
+def build_chart(chart_type, params, timings):
+    with chart_cache.timed(timings, "compute"):
+        df = data.get_db()
+        # Whole-snapshot groupings are rolled up from the per-version aggregate cube instead of the rows
+        aggregates = queries.get_aggregate_cube()
+
     # Set the config based on the chart_type name
     if "pie" in chart_type:
         config = {"displaylogo": False}
@@ -350,12 +574,15 @@ def create_graph():
                 "displaylogo": False,
         }
     try:
-        # result = json.loads(chart_func(df, config=config, **params).to_json())
-        fig = chart_func(df, **params)
-        result = {"figure": json.loads(fig.to_json()), "config": config}
+        with chart_cache.timed(timings, "figure"):
+            fig = chart_options[chart_type](df, aggregates=aggregates, **params)
+        with chart_cache.timed(timings, "serialize"):
+            figure_json = fig.to_json()
+            config_json = json.dumps(config, sort_keys=True, separators=(",", ":"))
+            body = f'{{"config":{config_json},"figure":{figure_json}}}\n'.encode()
+        return body, "application/json"
     except AttributeError:
-        result = "Invalid data. Check time range and try again."
-    return result
+        return "Invalid data. Check time range and try again.".encode(), "text/html"
 # Example use for this route
 # To create a pie chart showing a comparison of top 3 flock sizes by county in New York State, with a date range from 2023 - 2024:
 # /api/chart?type=pie_sizes&state=New%20York&show_top_n=3&start=2023&end=2024
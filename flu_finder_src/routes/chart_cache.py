@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from flu_finder_src.utils import db_methods as data
+from flu_finder_src.utils import queries
+from flu_finder_src.utils.byte_cache import ByteCache
+
+# Finished /api/chart responses, keyed on the snapshot's content hash, the chart type and the normalized parameters
+# There are seven chart types and the frontend only varies state, county and the date range, so most
+# requests repeat. Each response is serialized once (see build_chart in api.py) and served from here
+# until the data changes; new data gets new keys and the old entries age out of the LRU
+
+# Memory budget for the cache (per process)
+CHART_CACHE_BYTES = int(os.getenv("CHART_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Query parameters the chart functions read (see data_visualizer.py); anything else is ignored
+CHART_PARAMS = ("selected_state", "selected_county", "show_top_n", "start", "end", "title")
+PHASES = ("compute", "figure", "serialize")
+
+responses = ByteCache(CHART_CACHE_BYTES)
+
+_metrics_lock = threading.Lock()
+_metrics = {"builds": 0, "stale_builds": 0, **{f"{phase}_ms": 0.0 for phase in PHASES}}
+
+
+# Dates become MM/DD/YYYY (what the frontend sends), so "2024", "2024-01-01" and "01/01/2024" share an entry
+# and the chart title shows the date actually used. Dates with a time of day are kept as given
+def canonical_date(value):
+    bound = queries.parse_date_bound(value)
+    if bound != bound.normalize():
+        return value
+    return bound.strftime("%m/%d/%Y")
+
+
+# The chart parameters from the query string, normalized. Raises ValueError for a bad date or top-n
+# The chart functions compare state and county names title-cased, so they are title-cased here too
+def normalize_params(args):
+    params = {}
+    for name in CHART_PARAMS:
+        value = args.get(name)
+        if not value:
+            continue
+        if name in ("start", "end"):
+            try:
+                value = canonical_date(value)
+            except ValueError:
+                raise ValueError(f"Invalid {name} date")
+        elif name == "show_top_n":
+            try:
+                value = str(int(value))
+            except ValueError:
+                raise ValueError("show_top_n must be a whole number")
+        elif name in ("selected_state", "selected_county"):
+            value = value.title()
+        params[name] = value
+    return params
+
+
+# Adds the milliseconds spent in the block to timings[phase]
+@contextmanager
+def timed(timings, phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + (time.perf_counter() - started) * 1000
+
+
+# (body, mimetype, timings) for the chart; build(chart_type, params, timings) -> (body, mimetype) runs on a miss
+# timings holds the build's compute / figure / serialize milliseconds, or just "cache" for a hit
+def get_chart(chart_type, params, build):
+    snapshot = data.get_snapshot()
+    key = (snapshot.content_hash, chart_type, tuple(sorted(params.items())))
+    timings = {}
+
+    def timed_build():
+        body, mimetype = build(chart_type, params, timings)
+        with _metrics_lock:
+            _metrics["builds"] += 1
+            for phase in PHASES:
+                _metrics[f"{phase}_ms"] += timings.get(phase, 0.0)
+        return body, mimetype
+
+    with timed(timings, "cache"):
+        body, mimetype = responses.get_or_build(key, timed_build)
+    if any(phase in timings for phase in PHASES):
+        del timings["cache"]
+    # The data was reloaded mid-build, so the body may hold the newer data: don't keep it under the old key
+    if data.get_snapshot() is not snapshot:
+        responses.discard(key)
+        with _metrics_lock:
+            _metrics["stale_builds"] += 1
+    return body, mimetype, timings
+
+
+# Server-Timing header value, ex: "compute;dur=12.3, figure;dur=80.1, serialize;dur=9.4"
+def server_timing(timings):
+    return ", ".join(f"{phase};dur={duration:.1f}" for phase, duration in timings.items())
+
+
+def stats():
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    for phase in PHASES:
+        metrics[f"{phase}_ms"] = round(metrics[f"{phase}_ms"], 1)
+    metrics.update(responses.stats())
+    return metrics
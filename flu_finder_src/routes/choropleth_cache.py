@@ -0,0 +1,57 @@
+import os
+import time
+import threading
+from flu_finder_src.utils import db_methods as data
+from flu_finder_src.utils.byte_cache import ByteCache
+
+# Finished /api/map/choropleth responses, one per (data, state, county)
+# Building a choropleth (grouping + plotly + serializing every county polygon) takes seconds, but the
+# result only depends on the snapshot and the selection, so repeat views are served from memory.
+# Entries are keyed on the snapshot's content hash: new data gets new keys and the old entries age out of the LRU
+
+# Memory budget for the cache (per process); one national map is a few MB
+CHOROPLETH_CACHE_BYTES = int(os.getenv("CHOROPLETH_CACHE_BYTES", str(128 * 1024 * 1024)))
+
+responses = ByteCache(CHOROPLETH_CACHE_BYTES)
+
+_metrics_lock = threading.Lock()
+_metrics = {"builds": 0, "build_seconds": 0.0, "stale_builds": 0}
+
+
+# generate_choropleth compares the state and county case-insensitively and ignores the county
+# without a state, so those requests share one entry
+def cache_key(content_hash, selected_state, selected_county):
+    state = selected_state.upper() if selected_state else None
+    county = selected_county.upper() if state and selected_county else None
+    return (content_hash, state, county)
+
+
+# Response bytes for the selection; build(selected_state, selected_county) -> bytes runs on a miss
+# variant tells apart responses that differ for the same selection (ex: geometry inlined or by URL)
+def get_choropleth_json(selected_state, selected_county, build, variant=None):
+    snapshot = data.get_snapshot()
+    key = cache_key(snapshot.content_hash, selected_state, selected_county) + (variant,)
+
+    def timed_build():
+        started = time.perf_counter()
+        body = build(selected_state, selected_county)
+        with _metrics_lock:
+            _metrics["builds"] += 1
+            _metrics["build_seconds"] += time.perf_counter() - started
+        return body, None
+
+    body, _ = responses.get_or_build(key, timed_build)
+    # The data was reloaded mid-build, so the body may hold the newer data: don't keep it under the old key
+    if data.get_snapshot() is not snapshot:
+        responses.discard(key)
+        with _metrics_lock:
+            _metrics["stale_builds"] += 1
+    return body
+
+
+def stats():
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["build_seconds"] = round(metrics["build_seconds"], 3)
+    metrics.update(responses.stats())
+    return metrics
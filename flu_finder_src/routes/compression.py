@@ -0,0 +1,118 @@
+import os
+import gzip
+import threading
+from flask import current_app, request
+from flu_finder_src.utils.byte_cache import ByteCache
+try: # brotli is optional; without it clients get gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding negotiation for the /api routes
+# Responses are compressed with the best encoding the client accepts (br, then gzip).
+# Large responses are also kept as finished bytes, keyed by their ETag (see http_cache.py) and encoding,
+# so the next request for the same data skips both the route's JSON serialization and the compression
+
+# Responses smaller than this go out uncompressed (the gzip header isn't worth it)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Responses at least this big are kept in the artifact cache
+ARTIFACT_MIN_BYTES = int(os.getenv("ARTIFACT_MIN_BYTES", "65536"))
+# Memory budget for the artifact cache (per process)
+ARTIFACT_CACHE_BYTES = int(os.getenv("ARTIFACT_CACHE_BYTES", str(64 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "6"))
+
+ENCODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+
+artifacts = ByteCache(ARTIFACT_CACHE_BYTES)
+
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def negotiate_encoding():
+    return request.accept_encodings.best_match(ENCODINGS) or "identity"
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime=0 so the same body always compresses to the same bytes
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+# The ETag for one encoding of a response: "<etag>-gzip" etc. (identity keeps the plain ETag)
+def encoded_etag(etag, encoding):
+    return etag if encoding == "identity" else f"{etag}-{encoding}"
+
+
+# Reverses encoded_etag so a cached gzip copy still validates against the plain ETag
+def base_etag(etag):
+    for encoding in ("br", "gzip"):
+        if etag.endswith(f"-{encoding}"):
+            return etag[:-len(encoding) - 1]
+    return etag
+
+
+def record(endpoint, raw_bytes, sent_bytes, compressed, artifact_hit):
+    with _metrics_lock:
+        route = _metrics.setdefault(endpoint or "unknown", {
+            "responses": 0,
+            "compressed_responses": 0,
+            "artifact_hits": 0,
+            "raw_bytes": 0,
+            "sent_bytes": 0,
+        })
+        route["responses"] += 1
+        route["compressed_responses"] += int(compressed)
+        route["artifact_hits"] += int(artifact_hit)
+        route["raw_bytes"] += raw_bytes
+        route["sent_bytes"] += sent_bytes
+
+
+def set_encoding_headers(response, etag, encoding):
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if etag is not None:
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
+
+
+# A finished response from the artifact cache, or None
+def cached_response(etag, encoding):
+    entry = artifacts.get((etag, encoding))
+    if entry is None:
+        return None
+    body, (mimetype, raw_bytes) = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    record(request.endpoint, raw_bytes, len(body), encoding != "identity", True)
+    return set_encoding_headers(response, etag, encoding)
+
+
+# Compresses a response from a route and stores it if it's big enough to be worth keeping
+# etag is None for responses that can't be cached (they are still compressed)
+def encode_response(response, etag, encoding):
+    if response.direct_passthrough or response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+    body = response.get_data()
+    raw_bytes = len(body)
+    if raw_bytes < COMPRESS_MIN_BYTES:
+        encoding = "identity"
+    encoded = compress(body, encoding)
+    if encoding != "identity":
+        response.set_data(encoded)
+    if etag is not None and raw_bytes >= ARTIFACT_MIN_BYTES:
+        artifacts.put((etag, encoding), encoded, (response.mimetype, raw_bytes))
+    record(request.endpoint, raw_bytes, len(encoded), encoding != "identity", False)
+    return set_encoding_headers(response, etag, encoding)
+
+
+def stats():
+    with _metrics_lock:
+        routes = {endpoint: dict(values) for endpoint, values in _metrics.items()}
+    for values in routes.values():
+        values["compression_ratio"] = round(values["sent_bytes"] / values["raw_bytes"], 4) if values["raw_bytes"] else 1.0
+    return {"encodings": ENCODINGS, "routes": routes, "artifact_cache": artifacts.stats()}
@@ -0,0 +1,120 @@
+import os
+import hashlib
+from datetime import datetime, timezone
+from flask import current_app, g, request
+from flu_finder_src.utils import db_methods as data
+from flu_finder_src.routes import compression
+
+# Conditional GET support for the /api routes
+# Every response is a function of the outbreak data and the request, so the ETag is a hash of
+# (data content hash, path, sorted query parameters). When the browser or a CDN sends that ETag back
+# in If-None-Match, the request is answered with 304 Not Modified before the route does any DataFrame work
+# Responses are then compressed (and large ones kept as finished bytes), see compression.py
+
+# Sent with every cacheable response. The default lets clients keep a copy but check back each time
+API_CACHE_CONTROL = os.getenv("API_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+# Mixed into every ETag so a deploy that changes response formats doesn't 304 against old copies
+API_CACHE_SALT = os.getenv("API_CACHE_SALT", os.getenv("RENDER_GIT_COMMIT", ""))
+# Routes whose responses change without the data changing
+UNCACHED_ENDPOINTS = {"api.cache_stats"}
+# Routes with a content hash in the URL: the response never changes, whatever the data does
+# Their ETag leaves the data out, so answering them never loads the outbreak snapshot
+IMMUTABLE_ENDPOINTS = {"api.map_geometry"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+# Same parameters in any order (or with blank values) give the same key
+def normalized_args():
+    return sorted((key, value.strip()) for key, values in request.args.lists() for value in values if value.strip())
+
+
+# content_hash is the snapshot's ("" for IMMUTABLE_ENDPOINTS)
+def request_etag(content_hash):
+    key = repr((API_CACHE_SALT, content_hash, request.path, normalized_args()))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+# None for IMMUTABLE_ENDPOINTS (no snapshot): their copies are never out of date
+def last_modified(snapshot):
+    if snapshot is None:
+        return None
+    # HTTP dates only have whole seconds
+    return datetime.fromtimestamp(int(snapshot.modified_at), tz=timezone.utc)
+
+
+# The If-None-Match tag that matches this response (any encoding of it), or None
+def matching_etag(etag):
+    if request.if_none_match.star_tag:
+        return etag
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if compression.base_etag(tag) == etag:
+            return tag
+    return None
+
+
+def is_not_modified(etag, modified):
+    if request.if_none_match:
+        return matching_etag(etag) is not None
+    if request.if_modified_since:
+        return modified is None or request.if_modified_since >= modified
+    return False
+
+
+def cache_control():
+    return IMMUTABLE_CACHE_CONTROL if request.endpoint in IMMUTABLE_ENDPOINTS else API_CACHE_CONTROL
+
+
+def set_validators(response, etag, modified):
+    response.set_etag(etag)
+    # (werkzeug turns a None last_modified into "now")
+    if modified is not None:
+        response.last_modified = modified
+    response.headers["Cache-Control"] = cache_control()
+    return response
+
+
+# Runs before every route: 304 if the client's copy is current, the stored bytes if we have them,
+# otherwise None to let the route build the response
+def check_conditional_request():
+    g.cache_encoding = compression.negotiate_encoding()
+    if request.method not in ("GET", "HEAD") or request.endpoint in UNCACHED_ENDPOINTS:
+        return None
+    snapshot = None if request.endpoint in IMMUTABLE_ENDPOINTS else data.get_snapshot()
+    g.cache_snapshot_hash = snapshot.content_hash if snapshot is not None else ""
+    g.cache_etag = request_etag(g.cache_snapshot_hash)
+    g.cache_modified = last_modified(snapshot)
+    if is_not_modified(g.cache_etag, g.cache_modified):
+        g.cache_served = True
+        response = current_app.response_class(status=304)
+        response.vary.add("Accept-Encoding")
+        return set_validators(response, matching_etag(g.cache_etag) or g.cache_etag, g.cache_modified)
+    response = compression.cached_response(g.cache_etag, g.cache_encoding)
+    if response is not None:
+        g.cache_served = True
+        if g.cache_modified is not None:
+            response.last_modified = g.cache_modified
+        response.headers["Cache-Control"] = cache_control()
+    return response
+
+
+# Runs after every route (and after check_conditional_request answered on its own)
+def add_cache_headers(response):
+    if g.get("cache_served"):
+        return response
+    etag = g.get("cache_etag")
+    if request.endpoint in UNCACHED_ENDPOINTS:
+        response.headers["Cache-Control"] = "no-store"
+        etag = None
+    elif etag is not None and response.status_code == 200:
+        # The data was refreshed while this response was being built: it may not match the ETag
+        if request.endpoint not in IMMUTABLE_ENDPOINTS and data.get_snapshot().content_hash != g.cache_snapshot_hash:
+            etag = None
+        else:
+            set_validators(response, etag, g.cache_modified)
+    return compression.encode_response(response, etag if response.status_code == 200 else None, g.get("cache_encoding", "identity"))
+
+
+# Hooks the ETag checks and compression into a blueprint (see routes/api.py)
+def register_http_cache(blueprint):
+    blueprint.before_request(check_conditional_request)
+    blueprint.after_request(add_cache_headers)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated outbreak data: one cell per (State, County, Flock Type, month) with the outbreak
+# count and flock size total. Built once per data version (see queries.get_aggregate_cube) so charts
+# and summaries add up a few thousand cells instead of grouping every outbreak row again
+#
+# Each cell also remembers the position of its first outbreak row. Rolled-up groups are listed in
+# order of first appearance, the same order value_counts() gives on the raw rows, so charts that
+# sort by count break ties exactly the way they did before
+
+DIMENSIONS = ["State", "County", "Flock Type"]
+MONTH = "Month"
+
+
+class AggregateCube:
+    def __init__(self, frame):
+        self.categories = {dim: frame[dim].cat.categories for dim in DIMENSIONS}
+
+        cells = pd.DataFrame({dim: frame[dim].cat.codes.to_numpy() for dim in DIMENSIONS})
+        cells[MONTH] = frame["Outbreak Date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[M]")
+        cells["Flock Size"] = frame["Flock Size"].to_numpy(dtype=np.int64)
+        cells["First Row"] = np.arange(len(frame))
+
+        # Missing values keep their -1 code here, so a State roll-up still counts rows with no County
+        grouped = cells.groupby(DIMENSIONS + [MONTH], sort=True, dropna=False).agg(
+            outbreaks=("First Row", "size"),
+            flock_size=("Flock Size", "sum"),
+            first_row=("First Row", "min"),
+        ).reset_index()
+
+        self.codes = {dim: grouped[dim].to_numpy() for dim in DIMENSIONS}
+        self.months = grouped[MONTH].to_numpy(dtype="datetime64[M]")
+        self.outbreaks = grouped["outbreaks"].to_numpy(dtype=np.int64)
+        self.flock_size = grouped["flock_size"].to_numpy(dtype=np.int64)
+        self.first_row = grouped["first_row"].to_numpy(dtype=np.int64)
+
+    def __len__(self):
+        return len(self.outbreaks)
+
+    # Case-insensitive match against a dimension's names, the way the charts compare names
+    def _matches(self, dim, value):
+        names = self.categories[dim].astype(str).str.title()
+        matching_codes = np.flatnonzero(names == str(value).title())
+        return np.isin(self.codes[dim], matching_codes)
+
+    # Totals grouped by any of State / County / Flock Type / Month
+    # Filters: state, county, flock_type (case-insensitive), start_month / end_month (inclusive, ex: "2024-01")
+    # order="name" sorts groups by name (like groupby), order="first_seen" by first outbreak (like value_counts)
+    # Returns a DataFrame: the group columns + "Outbreak Count" + "Flock Size"
+    def rollup(self, by, state=None, county=None, flock_type=None, start_month=None, end_month=None, order="name"):
+        keep = np.ones(len(self), dtype=bool)
+        for dim, value in (("State", state), ("County", county), ("Flock Type", flock_type)):
+            if value:
+                keep &= self._matches(dim, value)
+        if start_month:
+            keep &= self.months >= np.datetime64(pd.Timestamp(start_month), "M")
+        if end_month:
+            keep &= self.months <= np.datetime64(pd.Timestamp(end_month), "M")
+        # A group needs a name, so cells missing that dimension drop out of it
+        for dim in by:
+            if dim != MONTH:
+                keep &= self.codes[dim] >= 0
+
+        cells = pd.DataFrame({dim: (self.months if dim == MONTH else self.codes[dim])[keep] for dim in by})
+        cells["Outbreak Count"] = self.outbreaks[keep]
+        cells["Flock Size"] = self.flock_size[keep]
+        cells["First Row"] = self.first_row[keep]
+
+        if by:
+            grouped = cells.groupby(list(by), sort=True).agg({
+                "Outbreak Count": "sum",
+                "Flock Size": "sum",
+                "First Row": "min",
+            }).reset_index()
+        else:
+            grouped = pd.DataFrame({
+                "Outbreak Count": [cells["Outbreak Count"].sum()],
+                "Flock Size": [cells["Flock Size"].sum()],
+                "First Row": [cells["First Row"].min() if len(cells) else 0],
+            })
+        if order == "first_seen":
+            grouped = grouped.sort_values("First Row", kind="stable")
+
+        for dim in by:
+            if dim == MONTH:
+                grouped[dim] = pd.to_datetime(grouped[dim]).dt.strftime("%Y-%m")
+            else:
+                grouped[dim] = self.categories[dim].astype(str)[grouped[dim].to_numpy()]
+        return grouped.drop(columns="First Row").reset_index(drop=True)
+
+
+def build_aggregate_cube(frame):
+    return AggregateCube(frame)
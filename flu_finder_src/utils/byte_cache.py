@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+# Least-recently-used cache with a size budget in bytes instead of an entry count
+# Values are (bytes-like body, extra) pairs; only the body counts towards the budget.
+# Used for response bodies that are expensive to build but identical until the data changes
+# get_or_build also makes concurrent misses for one key share a single build ("single flight")
+
+
+class _Build:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class ByteCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "rejected": 0, "shared_builds": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    # The (body, extra) entry for key, building it with build() -> (body, extra) on a miss
+    # While one caller builds a key, other callers for that key wait for its result instead of building
+    # it again (counted as shared_builds, not misses). A failed build raises in every waiting caller
+    def get_or_build(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+            pending = self._building.get(key)
+            if pending is None:
+                pending = self._building[key] = _Build()
+                self._stats["misses"] += 1
+                builder = True
+            else:
+                self._stats["shared_builds"] += 1
+                builder = False
+
+        if not builder:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.entry
+
+        try:
+            body, extra = build()
+            pending.entry = (body, extra)
+            self.put(key, body, extra)
+            return pending.entry
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            pending.done.set()
+
+    def discard(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+    def put(self, key, body, extra=None):
+        size = len(body)
+        with self._lock:
+            # Bigger than the whole budget: caching it would only flush everything else
+            if size > self.max_bytes:
+                self._stats["rejected"] += 1
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, extra)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["building"] = len(self._building)
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
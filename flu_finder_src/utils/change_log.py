@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import deque
+import numpy as np
+
+# Which rows changed between data versions, so clients that already hold the data can fetch just the delta
+# Each entry covers one step from_version -> to_version with the row ids (see ingest_diff.row_ids)
+# that were added, changed or removed. Versions are data tokens (see snapshot_cache.py), not numbers:
+# steps are chained by matching tokens, newest first. Only the last CHANGE_LOG_VERSIONS steps are kept;
+# a client older than that, or with a token this log never saw, has to download everything again
+
+CHANGE_LOG_VERSIONS = int(os.getenv("CHANGE_LOG_VERSIONS", "30"))
+CHANGE_KINDS = ("added", "changed", "removed")
+
+
+def _ids(values):
+    return np.asarray(values, dtype=np.uint64)
+
+
+class ChangeLog:
+    def __init__(self, limit=CHANGE_LOG_VERSIONS):
+        self._entries = deque(maxlen=limit)
+        self._lock = threading.Lock()
+
+    # changes: {"added": ids, "changed": ids, "removed": ids}
+    def record(self, from_version, to_version, changes):
+        entry = {"from_version": from_version, "to_version": to_version}
+        entry.update({kind: _ids(changes.get(kind, [])) for kind in CHANGE_KINDS})
+        with self._lock:
+            self._entries.append(entry)
+
+    # Everything that changed after `version`, merged into one step, or None if the log can't get from
+    # `version` to current_version (too old, or a token it doesn't know)
+    # current_ids are the row ids of the current data: rows removed and then re-added come back as "changed"
+    def since(self, version, current_version, current_ids):
+        if version == current_version:
+            return {kind: _ids([]) for kind in CHANGE_KINDS}
+        with self._lock:
+            entries = list(self._entries)
+        # Walk back from the current version, one step at a time, until we reach the client's
+        chain = []
+        target = current_version
+        for entry in reversed(entries):
+            if entry["to_version"] != target:
+                continue
+            chain.append(entry)
+            if entry["from_version"] == version:
+                break
+            target = entry["from_version"]
+        else:
+            return None
+        chain.reverse()
+
+        added = np.unique(np.concatenate([entry["added"] for entry in chain]))
+        changed = np.unique(np.concatenate([entry["changed"] for entry in chain]))
+        removed = np.unique(np.concatenate([entry["removed"] for entry in chain]))
+        upserted = np.union1d(added, changed)
+        upserted = upserted[np.isin(upserted, current_ids)]
+        new_rows = np.setdiff1d(added, removed)
+        return {
+            "added": upserted[np.isin(upserted, new_rows)],
+            "changed": upserted[~np.isin(upserted, new_rows)],
+            "removed": removed[~np.isin(removed, current_ids)],
+        }
+
+    def oldest_version(self):
+        with self._lock:
+            return self._entries[0]["from_version"] if self._entries else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "oldest_version": self._entries[0]["from_version"] if self._entries else None,
+                "newest_version": self._entries[-1]["to_version"] if self._entries else None,
+            }
@@ -9,8 +9,9 @@ from db_methods import update_db
 if __name__ == "__main__":
     print("Starting database update...")
     try:
-        update_db()
-        print("Database update completed successfully.")
+        report = update_db()
+        report.pop("changes", None) # Row ids are only needed by the snapshot, not the log
+        print(f"Database update completed successfully: {report}")
     except Exception as e:
         print(f"ERROR: Failed to update database: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -1,5 +1,7 @@
 import os
 import sys
+import json
+import time
 import requests
 import pandas as pd
 from tabulate import tabulate
@@ -42,17 +44,122 @@ project_root = os.path.abspath(os.path.join(script_dir, "..", "..")) # Go up 2 d
 #     return df_sorted
 
 # Lets us pull the data from CDC directly into our database without downloading
+# Outbreak Date stays a datetime column; format it only where text is needed (ex: writing the sheet)
 def get_sorted_dataframe_from_link(link):
-    df = pd.read_csv(link)
-    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"], format="%m-%d-%Y")
-    df_sorted = df.sort_values("Outbreak Date").reset_index(drop=True)
-    df_sorted["Outbreak Date"] = df_sorted["Outbreak Date"].dt.strftime("%m-%d-%Y")
+    df, stats = fetch_cdc_dataframe(link)
+    return df
+
+
+# Where the ETag / Last-Modified of the last successful fetch are kept between runs
+# The folder is gitignored; the GitHub Actions cron keeps the file between runs with actions/cache (see main.yml)
+FETCH_STATE_PATH = os.getenv("FETCH_STATE_PATH", os.path.join(script_dir, "..", "data", "snapshot", "fetch_state.json"))
+
+# Rows parsed at a time, so memory stays flat as the CDC file grows
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "5000"))
+
+CDC_DTYPES = {
+    "State": "object",
+    "County": "object",
+    "Flock Type": "object",
+    "Flock Size": "Int64",
+    "Outbreak Date": "object",
+}
+
+
+def load_fetch_state(path=FETCH_STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_fetch_state(state, path=FETCH_STATE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+# Reads the CSV in chunks, parsing each chunk's dates as it goes
+def _parse_csv_stream(stream):
+    chunks = []
+    for chunk in pd.read_csv(stream, chunksize=CSV_CHUNK_SIZE, dtype=CDC_DTYPES):
+        chunk["Outbreak Date"] = pd.to_datetime(chunk["Outbreak Date"], format="%m-%d-%Y")
+        chunks.append(chunk)
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(CDC_DTYPES))
+    # Same type read_csv would have picked when there are no blank sizes
+    if "Flock Size" in df.columns and not df["Flock Size"].isna().any():
+        df["Flock Size"] = df["Flock Size"].astype("int64")
+    return df
+
+
+def _sort_by_date(df):
+    df_sorted = df.sort_values("Outbreak Date", kind="stable").reset_index(drop=True)
     df_sorted.index.name = "Index"
     pd.set_option("display.max_rows", len(df_sorted))
     return df_sorted
 
+
+# Downloads and parses the CDC CSV (a URL or a local path)
+# validators: {"etag": ..., "last_modified": ...} from the last fetch. If the file hasn't changed since,
+# nothing is downloaded or parsed and df is None
+# Returns (df, stats) where stats has the HTTP status, bytes fetched, timings and the new validators
+def fetch_cdc_dataframe(link, validators=None):
+    validators = validators or {}
+    stats = {"source": link, "not_modified": False, "bytes": 0}
+    started = time.perf_counter()
+
+    if not link.startswith(("http://", "https://")):
+        # Local file: size + modification time stand in for an ETag
+        file_stat = os.stat(link)
+        etag = f'"{file_stat.st_size}-{int(file_stat.st_mtime_ns)}"'
+        stats.update({"status": 200, "etag": etag, "last_modified": None})
+        if validators.get("etag") == etag:
+            stats.update({"status": 304, "not_modified": True, "fetch_seconds": round(time.perf_counter() - started, 4)})
+            return None, stats
+        parse_started = time.perf_counter()
+        with open(link, "rb") as f:
+            df = _sort_by_date(_parse_csv_stream(f))
+        stats["bytes"] = file_stat.st_size
+        stats["parse_seconds"] = round(time.perf_counter() - parse_started, 4)
+        stats["fetch_seconds"] = round(time.perf_counter() - started, 4)
+        return df, stats
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    with requests.get(link, headers=headers, stream=True, timeout=60) as response:
+        stats["status"] = response.status_code
+        stats["etag"] = response.headers.get("ETag", validators.get("etag"))
+        stats["last_modified"] = response.headers.get("Last-Modified", validators.get("last_modified"))
+        if response.status_code == 304:
+            stats["not_modified"] = True
+            stats["fetch_seconds"] = round(time.perf_counter() - started, 4)
+            return None, stats
+        response.raise_for_status()
+
+        # Let urllib3 undo gzip/deflate while pandas reads the stream
+        response.raw.decode_content = True
+        parse_started = time.perf_counter()
+        df = _sort_by_date(_parse_csv_stream(response.raw))
+        stats["parse_seconds"] = round(time.perf_counter() - parse_started, 4)
+        stats["bytes"] = response.raw.tell()
+
+    stats["fetch_seconds"] = round(time.perf_counter() - started, 4)
+    return df, stats
+
+# Newest outbreak first (rows without a date last); same-day rows in reverse row order
+# Sorted on the date itself: row position isn't date order in a sheet patched incrementally (see ingest_diff.plan_sheet_patch)
 def get_reversed_dataframe(df):
-    return df.sort_values(by=['Index'], ascending=False)
+    def sort_key(values):
+        if values.name == 'Outbreak Date':
+            return pd.to_datetime(values, errors='coerce', format='mixed')
+        return values
+    return df.sort_values(by=['Outbreak Date', 'Index'], ascending=False, na_position='last', kind='stable', key=sort_key)
 
 
 # UNCOMMENT THESE TO PRINT IN CONSOLE
@@ -1,11 +1,14 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 try: # Render requires a relative path, GitHub Actions requires an absolute path
     from .db_methods import *
     from .queries import *
+    from .schema import title_equals
 except ImportError:
     from db_methods import *
     from queries import *
+    from schema import title_equals
 import sys
 
 df = get_db()
@@ -45,10 +48,10 @@ def get_horizontal_comparison_flock_sizes(df, show_top_n=None, selected_state=No
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group and calculate percentage
-    grouped = df.groupby(group_col, as_index=False)["Flock Size"].sum()
+    grouped = sum_flock_size_by(df, group_col, cube_for(start, end, kwargs), selected_state)
     grouped["Percentage"] = (grouped["Flock Size"] / grouped["Flock Size"].sum() * 100).round(3)
 
     # Sort from highest to lowest and reverse y-axis later for top-to-bottom effect
@@ -170,11 +173,10 @@ def get_horizontal_comparison_frequencies(df, show_top_n=None, selected_state=No
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group and calculate frequency
-    grouped = df[group_col].value_counts().reset_index()
-    grouped.columns = [group_col, "Outbreak Count"]
+    grouped = count_outbreaks_by(df, group_col, "Outbreak Count", cube_for(start, end, kwargs), selected_state)
     grouped["Frequency (%)"] = (grouped["Outbreak Count"] / grouped["Outbreak Count"].sum() * 100).round(3)
 
     # Sort and optionally limit
@@ -296,11 +298,10 @@ def get_horizontal_comparison_flock_types(df, show_top_n=None, selected_state=No
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group by Flock Type and count
-    grouped = df["Flock Type"].value_counts().reset_index()
-    grouped.columns = ["Flock Type", "Count"]
+    grouped = count_outbreaks_by(df, "Flock Type", "Count", cube_for(start, end, kwargs), selected_state)
     grouped["Percentage"] = (grouped["Count"] / grouped["Count"].sum() * 100).round(3)
 
     # Sort and slice
@@ -411,10 +412,10 @@ def get_pie_flock_sizes(df, show_top_n=None, selected_state=None, start=None, en
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group and calculate total and percentage
-    grouped = df.groupby(group_col, as_index=False)["Flock Size"].sum()
+    grouped = sum_flock_size_by(df, group_col, cube_for(start, end, kwargs), selected_state)
     grouped["Percentage"] = (grouped["Flock Size"] / grouped["Flock Size"].sum() * 100).round(2)
     grouped = grouped.sort_values(by="Flock Size", ascending=False)
     
@@ -508,11 +509,10 @@ def get_pie_frequencies(df, show_top_n=None, selected_state=None, start=None, en
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group and calculate frequency
-    grouped = df[group_col].value_counts().reset_index()
-    grouped.columns = [group_col, "Outbreak Count"]
+    grouped = count_outbreaks_by(df, group_col, "Outbreak Count", cube_for(start, end, kwargs), selected_state)
     grouped["Frequency (%)"] = (grouped["Outbreak Count"] / grouped["Outbreak Count"].sum() * 100).round(3)
 
     # Sort for consistent display
@@ -609,11 +609,10 @@ def get_pie_flock_types(df, show_top_n=None, selected_state=None, start=None, en
         group_col = "County"
         group_col_plural = "Counties"
         scope_name = selected_state.title()
-        df = df[df["State"].str.title() == scope_name]
+        df = df[title_equals(df["State"], scope_name)]
 
     # Group by Flock Type and calculate percentage
-    grouped = df["Flock Type"].value_counts().reset_index()
-    grouped.columns = ["Flock Type", "Count"]
+    grouped = count_outbreaks_by(df, "Flock Type", "Count", cube_for(start, end, kwargs), selected_state)
     grouped["Flock (%)"] = (grouped["Count"] / grouped["Count"].sum() * 100).round(3)
     
     # Slice
@@ -691,11 +690,11 @@ def get_vertical_outbreaks_over_time(df, title=None, start=None, end=None, selec
     if selected_county: # COUNTY LEVEL
         scope = f"{selected_county.title()}, {selected_state.title()}"
         title = build_title_vbar(scope=scope, start=start, end=end)
-        df = df[(df["County"].str.title() == selected_county.title()) & (df["State"].str.title() == selected_state.title())]
+        df = df[title_equals(df["County"], selected_county) & title_equals(df["State"], selected_state)]
     elif selected_state: # STATE LEVEL
         scope = f"{selected_state.title()}"
         title = build_title_vbar(scope=scope, start=start, end=end)
-        df = df[df["State"].str.title() == selected_state.title()]
+        df = df[title_equals(df["State"], selected_state)]
     else:
         scope = "USA"
         title = build_title_vbar(scope=scope, start=start, end=end)
@@ -712,14 +711,12 @@ def get_vertical_outbreaks_over_time(df, title=None, start=None, end=None, selec
 
     # Filter by state if provided
     if selected_state:
-        df = df[df["State"].str.title() == selected_state.title()]
+        df = df[title_equals(df["State"], selected_state)]
         # Filter by county if provided and state is selected
         if selected_county:
-            df = df[df["County"].str.title() == selected_county.title()]
+            df = df[title_equals(df["County"], selected_county)]
 
-    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"])
-    
-    grouped = df.groupby("Outbreak Date", as_index=False)["Flock Size"].sum()
+    grouped = sum_by_date(df)
 
     fig = px.bar(
         grouped,
@@ -784,9 +781,7 @@ def line_graph_maker(df, start=None, end=None, title=None, output_file="line_out
     if df.empty:
         return "No data to visualize. Check your time range and try again"
     
-    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"])
-    
-    grouped = df.groupby("Outbreak Date", as_index=False)["Flock Size"].sum()
+    grouped = sum_by_date(df)
     
     # Title fallback
     if not title:
@@ -837,6 +832,47 @@ def line_graph_maker(df, start=None, end=None, title=None, output_file="line_out
     # print(f"Plot saved to {output_file}")
     return fig
 
+# The aggregate cube (passed in as aggregates=, see queries.get_aggregate_cube) only holds whole-snapshot
+# totals, so charts with a time range still group the rows themselves
+def cube_for(start, end, kwargs):
+    if start or end:
+        return None
+    return kwargs.get("aggregates")
+
+# Sums flock sizes per group. Group names come back as plain strings so plotly doesn't see categories
+# With the aggregate cube the sums come from its cells; selected_state is the filter already applied to df
+def sum_flock_size_by(df, group_col, aggregates=None, selected_state=None):
+    if aggregates is not None:
+        return aggregates.rollup([group_col], state=selected_state)[[group_col, "Flock Size"]]
+    grouped = df.groupby(group_col, as_index=False, observed=True)["Flock Size"].sum()
+    grouped[group_col] = grouped[group_col].astype(str)
+    return grouped
+
+# Counts outbreaks per group, like value_counts() but straight from the category codes
+# Groups are counted in order of first appearance before sorting, the same order value_counts() uses
+# for plain strings, so ties come out in the same order as before
+def count_outbreaks_by(df, group_col, count_col, aggregates=None, selected_state=None):
+    if aggregates is not None:
+        rolled = aggregates.rollup([group_col], state=selected_state, order="first_seen")
+        counts = pd.Series(rolled["Outbreak Count"].to_numpy(), index=rolled[group_col]).sort_values(ascending=False)
+        grouped = counts.reset_index()
+        grouped.columns = [group_col, count_col]
+        return grouped
+    values = df[group_col]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        codes = codes[codes >= 0]
+        order = pd.unique(codes)
+        counts = pd.Series(
+            np.bincount(codes, minlength=len(values.cat.categories))[order],
+            index=values.cat.categories[order].astype(str)
+        ).sort_values(ascending=False)
+    else:
+        counts = values.value_counts()
+    grouped = counts.reset_index()
+    grouped.columns = [group_col, count_col]
+    return grouped
+
 # Helper to dynamically build titles
 def build_title(prefix, group_col, group_col_plural, scope_name, show_top_n=None, start=None, end=None):
     title_parts = []
@@ -864,8 +900,8 @@ def title_picker(frame):
     if len(frame) > 0:
         # Fill NA values with "Unknown" before getting unique values
         frame = frame.copy()
-        frame["State"] = frame["State"].fillna("Unknown")
-        frame["County"] = frame["County"].fillna("Unknown")
+        frame["State"] = frame["State"].astype(object).fillna("Unknown")
+        frame["County"] = frame["County"].astype(object).fillna("Unknown")
         
         unique_states = frame["State"].unique()
         unique_counties = frame["County"].unique()
@@ -1,14 +1,22 @@
 import gspread
+import time
 import os
 import json
 import base64
 from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
 from pathlib import Path
 import pandas as pd
 try: # Render requires a relative path, GitHub Actions requires an absolute path
-    from .data_fetcher import get_sorted_dataframe_from_link
+    from .data_fetcher import fetch_cdc_dataframe, load_fetch_state, save_fetch_state
+    from .snapshot_cache import SnapshotCache, data_token
+    from .local_snapshot import write_snapshot, open_snapshot, read_changes
+    from .ingest_diff import diff_frames, plan_sheet_patch, summarize_diff
 except ImportError:
-    from data_fetcher import get_sorted_dataframe_from_link
+    from data_fetcher import fetch_cdc_dataframe, load_fetch_state, save_fetch_state
+    from snapshot_cache import SnapshotCache, data_token
+    from local_snapshot import write_snapshot, open_snapshot, read_changes
+    from ingest_diff import diff_frames, plan_sheet_patch, summarize_diff
 
 
 # Define scopes
@@ -18,48 +26,184 @@ SCOPES = ["https://www.googleapis.com/auth/spreadsheets",
 # Resolve the path to this directory
 THIS_DIR = Path(__file__).resolve().parent
 
-# Load credentials from file if it exists, otherwise from environment variable
-cred_path = THIS_DIR / "google_backend.json"
+SHEET_ID_DATA = os.getenv("SHEET_ID_DATA")
 
-if cred_path.exists():
-  creds = Credentials.from_service_account_file(
-    THIS_DIR / "google_backend.json", scopes=SCOPES
-)
-else:
-    b64_creds = os.getenv("GOOGLE_CREDS_B64")
-    if not b64_creds:
-        raise RuntimeError("GOOGLE_CREDS_B64 environment variable not set and local credentials file not found.")
+# Where get_db() reads from: "sheets" (Google Sheets), "local" (memory-mapped snapshot from local_snapshot.py)
+# or "postgres" (outbreaks table in DATABASE_URL, see db.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "sheets").lower()
 
-    creds_json = base64.b64decode(b64_creds).decode("utf-8")
-    creds_info = json.loads(creds_json)
-    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
+CDC_CSV_URL = "https://www.cdc.gov/bird-flu/modules/situation-summary/commercial-backyard-flocks.csv"
 
-# Authorize gspread with the credentials
-client = gspread.authorize(creds)
+# --- data ---
+# The sheet is opened on first use so the local backend can run without Google credentials
+_sheet1 = None
 
-SHEET_ID_DATA = os.getenv("SHEET_ID_DATA")
+def get_sheet():
+    global _sheet1
+    if _sheet1 is not None:
+        return _sheet1
 
-# --- data ---
-# Open the spreadsheet by name or URL
-sheet1 = client.open_by_key(SHEET_ID_DATA).worksheet("Sheet1")
+    # Load credentials from file if it exists, otherwise from environment variable
+    cred_path = THIS_DIR / "google_backend.json"
+
+    if cred_path.exists():
+        creds = Credentials.from_service_account_file(cred_path, scopes=SCOPES)
+    else:
+        b64_creds = os.getenv("GOOGLE_CREDS_B64")
+        if not b64_creds:
+            raise RuntimeError("GOOGLE_CREDS_B64 environment variable not set and local credentials file not found.")
+
+        creds_json = base64.b64decode(b64_creds).decode("utf-8")
+        creds_info = json.loads(creds_json)
+        creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
+
+    # Authorize gspread with the credentials and open the spreadsheet by key
+    client = gspread.authorize(creds)
+    _sheet1 = client.open_by_key(SHEET_ID_DATA).worksheet("Sheet1")
+    return _sheet1
 
 
 #! To automate, make this a daily cron job
-def update_db():
-    # Pull data from CDC
-    df = get_sorted_dataframe_from_link("https://www.cdc.gov/bird-flu/modules/situation-summary/commercial-backyard-flocks.csv")
-    # Convert to list of lists
-    data = [df.columns.tolist()] + df.values.tolist()
-    # Write data
-    sheet1.update(values=data, range_name='A1')
-    
+# incremental=True only rewrites the sheet rows that actually changed (see patch_sheet)
+# If the CDC file hasn't changed since the last run (same ETag / Last-Modified), nothing is parsed or written
+# Returns a report with rows added/changed/removed plus fetch stats
+def update_db(incremental=True):
+    started = time.perf_counter()
+    # Pull data from CDC (conditional request when this machine has fetched it before)
+    fetch_state = load_fetch_state() if incremental else {}
+    df, fetch_stats = fetch_cdc_dataframe(CDC_CSV_URL, validators=fetch_state)
+    if df is None:
+        return {"mode": "skipped", "fetch": fetch_stats, "seconds": round(time.perf_counter() - started, 3)}
 
-def get_db():
-    df = pd.DataFrame(sheet1.get_all_records())
+    # Convert to list of lists
+    data = sheet_values(df)
+    sheet = get_sheet()
+    if incremental:
+        report = patch_sheet(sheet, data)
+    else:
+        # Write data
+        sheet.update(values=data, range_name='A1')
+        report = {"mode": "full", "rows_written": len(data)}
+    # Keep the local columnar copy in sync so workers in "local" mode see the same rows
+    write_snapshot(df, changes=report.get("changes"))
+    if DB_BACKEND == "postgres":
+        get_pg_queries().replace_outbreaks(df)
+    save_fetch_state({"etag": fetch_stats.get("etag"), "last_modified": fetch_stats.get("last_modified")})
+    # Make this process pick up the new rows on its next read
+    snapshot_cache.invalidate()
+    report["fetch"] = fetch_stats
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+# Header + rows as plain values for gspread (dates written in the sheet's MM-DD-YYYY format)
+def sheet_values(df):
+    df = df.copy()
+    if "Outbreak Date" in df.columns and pd.api.types.is_datetime64_any_dtype(df["Outbreak Date"]):
+        df["Outbreak Date"] = df["Outbreak Date"].dt.strftime("%m-%d-%Y")
+    df = df.astype(object).where(df.notna(), "")
+    return [df.columns.tolist()] + df.values.tolist()
+
+
+# Diffs the new rows against what is in the sheet and sends only the difference:
+# one batch update for changed rows, one append for new rows, one clear for leftover rows
+def patch_sheet(sheet, data):
+    old_values = sheet.get_all_values()
+
+    # Different columns (or an empty sheet) means there's nothing to patch against
+    if not old_values or old_values[0] != [str(col) for col in data[0]]:
+        sheet.update(values=data, range_name='A1')
+        if old_values and len(old_values) > len(data):
+            sheet.batch_clear([f"A{len(data) + 1}:{rowcol_to_a1(len(old_values), len(old_values[0]))}"])
+        return {"mode": "full", "rows_written": len(data)}
+
+    old_df = pd.DataFrame(old_values[1:], columns=old_values[0])
+    new_df = pd.DataFrame(data[1:], columns=data[0])
+    changes = diff_frames(old_df, new_df)
+
+    changed_blocks, rows_to_append, first_row_to_clear = plan_sheet_patch(old_values, data)
+    width = len(data[0])
+    if changed_blocks:
+        sheet.batch_update([
+            {"range": f"{rowcol_to_a1(first_row, 1)}:{rowcol_to_a1(first_row + len(rows) - 1, width)}", "values": rows}
+            for first_row, rows in changed_blocks
+        ])
+    if rows_to_append:
+        sheet.append_rows(rows_to_append, table_range="A1")
+    if first_row_to_clear:
+        sheet.batch_clear([f"A{first_row_to_clear}:{rowcol_to_a1(len(old_values), len(old_values[0]))}"])
+
+    report = {
+        "mode": "incremental",
+        "rows_written": sum(len(rows) for _, rows in changed_blocks) + len(rows_to_append),
+        "changes": changes,
+    }
+    report.update(summarize_diff(changes))
+    return report
+
+
+# Full download of Sheet1. Only the snapshot cache should call this; everything else uses get_db()
+def load_db_from_sheet():
+    df = pd.DataFrame(get_sheet().get_all_records())
     df.index.name = "Index"
     return df
 
 
+# Opens the local snapshot file. If there isn't one yet, fall back to the sheet once and write it
+# String columns stay dictionary-encoded (Categorical), which is the canonical schema anyway
+def load_db_from_local_snapshot():
+    try:
+        df, manifest = open_snapshot()
+    except FileNotFoundError:
+        print("No local snapshot found, building one from Google Sheets")
+        write_snapshot(load_db_from_sheet())
+        df, manifest = open_snapshot()
+    df.attrs["ingested_at"] = manifest["created_at"]
+    # Stamped at ingest, so every worker hands out the same version token for this data
+    df.attrs["data_version"] = data_token(manifest["content_hash"])
+    changes = read_changes(manifest)
+    if changes is not None and manifest.get("previous_content_hash"):
+        df.attrs["changes"] = changes
+        df.attrs["changes_since"] = data_token(manifest["previous_content_hash"])
+    return df
+
+
+def load_db():
+    if DB_BACKEND == "local":
+        return load_db_from_local_snapshot()
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().select_outbreaks()
+    return load_db_from_sheet()
+
+
+# psycopg2 is only imported when the postgres backend is actually used
+def get_pg_queries():
+    try:
+        from . import pg_queries
+    except ImportError:
+        import pg_queries
+    return pg_queries
+
+
+# One cached copy of the data per process, refreshed every SNAPSHOT_TTL_SECONDS
+snapshot_cache = SnapshotCache(load_db)
+
+
+# Current snapshot (frame + version). Use this when you need the version too
+def get_snapshot():
+    return snapshot_cache.get()
+
+
+# Returns a shallow copy so callers can add/replace columns without touching the shared snapshot
+# Don't write into cells in place (ex: df.loc[...] = x), that would still change the shared data
+def get_db():
+    return get_snapshot().frame.copy(deep=False)
+
+
+def get_snapshot_stats():
+    return snapshot_cache.stats()
+
+
 # This method will likely not be necessary once cronjob automates updates
 # def get_updated_db():
 #     update_db()
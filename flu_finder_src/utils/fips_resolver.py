@@ -0,0 +1,181 @@
+import os
+import threading
+from pathlib import Path
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import jellyfish
+import us
+
+# County FIPS codes for the outbreak rows, worked out once when a snapshot is loaded
+# The FIPS table (data/fips_lookup.csv plus a few hand-added rows) is compiled once per process into a
+# {(State, County): FIPS} dict. Outbreak names are title-cased and patched (COUNTY_PATCHES) before the
+# lookup; names that still don't match fall back to the most similar county name in the same state
+# (Jaro-Winkler, jellyfish). Names that match nothing are kept in the report (see stats())
+# FIPS isn't stored in the sheet / database at ingest: it is resolved from the distinct (State, County)
+# pairs (a few thousand, not one per row) on each snapshot load, so a fix to the patches or the table
+# applies to all existing rows on the next deploy without re-ingesting or rewriting them
+
+FIPS_LOOKUP_PATH = Path(__file__).resolve().parent.parent / "data" / "fips_lookup.csv"
+# Lowest Jaro-Winkler similarity accepted by the fuzzy fallback
+FUZZY_MIN_SIMILARITY = float(os.getenv("FIPS_FUZZY_MIN_SIMILARITY", "0.93"))
+# Unresolved names listed in the report (the count covers all of them)
+REPORT_LIMIT = 50
+
+# Outbreak county names that differ from the FIPS table (after title-casing), per (State, County)
+# Keyed by state as well: the same name can be a different county elsewhere (Jefferson Davis, Mississippi)
+COUNTY_PATCHES = {
+    ("Louisiana", "Jefferson Davis"): "Jefferson Davis Parish",
+    ("Louisiana", "Bossier"): "Bossier Parish",
+    ("Louisiana", "Calcasieu"): "Calcasieu Parish",
+    ("Louisiana", "De Soto"): "De Soto Parish",
+    ("Florida", "De Soto"): "Desoto",
+    ("Mississippi", "De Soto"): "Desoto",
+    ("Alaska", "Matanuska Susitna"): "Matanuska-Susitna",
+    ("Alaska", "Bethel"): "Bethel Census Area",
+    ("Wisconsin", "Saint Croix"): "St. Croix",
+    ("Puerto Rico", "Culebra"): "Culebra Municipio"
+}
+# Counties the FIPS table lacks
+EXTRA_FIPS_ROWS = [
+    {"FIPS": "72049", "County": "Culebra Municipio", "State": "Puerto Rico"},
+]
+# Name endings the fuzzy fallback also tries without ("Bossier Parish" ~ "Bossier")
+COUNTY_SUFFIXES = (" Parish", " Borough", " Census Area", " Municipio", " City And Borough", " City")
+
+
+def load_fips_table(path=FIPS_LOOKUP_PATH):
+    fips = pd.read_csv(path, dtype=str).rename(columns={
+        "fips": "FIPS",
+        "name": "County",
+        "state": "State"
+    })
+    fips["County"] = fips["County"].str.replace(" County", "", regex=False).str.strip().str.title()
+    # Each abbreviation is looked up once, not once per row
+    abbreviations = fips["State"].astype(str)
+    state_names = {abbr: (us.states.lookup(abbr).name if us.states.lookup(abbr) else abbr) for abbr in abbreviations.unique()}
+    fips["State"] = abbreviations.map(state_names)
+    fips["FIPS"] = fips["FIPS"].str.zfill(5)
+
+    extra = pd.DataFrame(EXTRA_FIPS_ROWS)
+    extra["County"] = extra["County"].str.title()
+    extra["State"] = extra["State"].str.title()
+    extra["FIPS"] = extra["FIPS"].str.zfill(5)
+    return pd.concat([fips, extra], ignore_index=True)
+
+
+# Table name of an outbreak county (both title-cased)
+def patch_county(state, county):
+    return COUNTY_PATCHES.get((state, county), county)
+
+
+def _strip_suffix(name):
+    for suffix in COUNTY_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class FipsResolver:
+    def __init__(self, table):
+        self._exact = {}
+        for fips, state, county in zip(table["FIPS"], table["State"], table["County"]):
+            self._exact.setdefault((str(state).title(), county), fips)
+
+        # The counties a map shows, in table order (state rows and placeholder codes left out)
+        counties = table[["FIPS", "State", "County"]].drop_duplicates()
+        counties = counties[counties["FIPS"].str.match(r"^\d{5}$") & (counties["FIPS"] != "00000")]
+        self.counties = counties.reset_index(drop=True)
+
+        # Fuzzy candidates per state: (name to compare, FIPS)
+        self._candidates = {}
+        for fips, state, county in zip(self.counties["FIPS"], self.counties["State"], self.counties["County"]):
+            names = self._candidates.setdefault(str(state).title(), [])
+            names.append((county, fips))
+            if _strip_suffix(county) != county:
+                names.append((_strip_suffix(county), fips))
+
+        self._lock = threading.Lock()
+        self._report = {"pairs": 0, "exact": 0, "fuzzy": [], "unresolved": []}
+
+    # (FIPS, how) for one outbreak location; how is "exact", "fuzzy" or None (FIPS is None then)
+    def resolve(self, state, county):
+        if state is None or county is None:
+            return None, None
+        state = state.title()
+        county = county.title()
+        patched = patch_county(state, county)
+        fips = self._exact.get((state, patched))
+        if fips is not None:
+            return fips, "exact"
+
+        best_score, best = 0.0, set()
+        for name, fips in self._candidates.get(state, []):
+            score = max(
+                jellyfish.jaro_winkler_similarity(patched, name),
+                jellyfish.jaro_winkler_similarity(_strip_suffix(county), name),
+            )
+            if score > best_score:
+                best_score, best = score, {fips}
+            elif score == best_score:
+                best.add(fips)
+        # A tie between two counties is a guess, not a match
+        if best_score >= FUZZY_MIN_SIMILARITY and len(best) == 1:
+            return best.pop(), "fuzzy"
+        return None, None
+
+    # Categorical FIPS column for a snapshot frame (missing where nothing matched)
+    # Works on the State / County category codes: each distinct pair is resolved once
+    def resolve_frame(self, frame):
+        if "State" not in frame.columns or "County" not in frame.columns or len(frame) == 0:
+            return pd.Categorical([None] * len(frame))
+        states = frame["State"].astype("category")
+        counties = frame["County"].astype("category")
+        state_codes = states.cat.codes.to_numpy().astype(np.int64)
+        county_codes = counties.cat.codes.to_numpy().astype(np.int64)
+        # Shifted by one so a missing name (code -1) gets slot 0
+        state_names = [None] + [str(name) for name in states.cat.categories]
+        county_names = [None] + [str(name) for name in counties.cat.categories]
+        codes, unique_keys = pd.factorize((state_codes + 1) * len(county_names) + (county_codes + 1))
+        unique_pairs = [(state_names[key // len(county_names)], county_names[key % len(county_names)]) for key in unique_keys]
+
+        fips_codes = []
+        report = {"pairs": len(unique_pairs), "exact": 0, "fuzzy": [], "unresolved": []}
+        rows = np.bincount(codes, minlength=len(unique_pairs))
+        for (state, county), count in zip(unique_pairs, rows):
+            fips, how = self.resolve(state, county)
+            fips_codes.append(fips)
+            if how == "exact":
+                report["exact"] += 1
+            elif how == "fuzzy":
+                report["fuzzy"].append({"state": state, "county": county, "fips": fips})
+            else:
+                report["unresolved"].append({"state": state, "county": county, "rows": int(count)})
+        with self._lock:
+            self._report = report
+        return pd.Categorical(np.asarray(fips_codes, dtype=object)[codes])
+
+    # What the last resolve_frame() matched: exact / fuzzy counts and the names that matched nothing
+    def stats(self):
+        with self._lock:
+            report = self._report
+        return {
+            "pairs": report["pairs"],
+            "exact": report["exact"],
+            "fuzzy": len(report["fuzzy"]),
+            "unresolved": len(report["unresolved"]),
+            "fuzzy_matches": report["fuzzy"][:REPORT_LIMIT],
+            "unresolved_names": sorted(report["unresolved"], key=lambda item: -item["rows"])[:REPORT_LIMIT],
+        }
+
+
+@lru_cache(maxsize=None)
+def get_fips_resolver():
+    return FipsResolver(load_fips_table())
+
+
+# Copy of a normalized snapshot frame with its FIPS column added
+def add_fips_column(frame):
+    frame = frame.copy(deep=False)
+    frame["FIPS"] = get_fips_resolver().resolve_frame(frame)
+    return frame
@@ -0,0 +1,144 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .geometry_store import open_store, GEOMETRY_STORE_DIR
+    from .geometry_simplify import RESOLUTIONS
+    from .geometry_partition import StatePartition
+    from .geo_index import GeoIndex
+except ImportError:
+    from geometry_store import open_store, GEOMETRY_STORE_DIR
+    from geometry_simplify import RESOLUTIONS
+    from geometry_partition import StatePartition
+    from geo_index import GeoIndex
+
+# County / state boundary files used by the map endpoints
+# The GeoJSON files are converted once into memory-mapped geometry stores (see geometry_store.py),
+# shared read-only by every worker. The load_ functions build a fresh FeatureCollection from the store
+# on each call, so callers may modify what they get; keep the result only as long as it's needed
+# Each file also comes in simplified resolutions (see geometry_simplify.py): maps pick one by how far they're zoomed,
+# and maps zoomed to a state only get that state's counties and the ring around it (see geometry_partition.py)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+COUNTIES_GEOJSON_PATH = DATA_DIR / "geojson-counties-fips.json"
+STATES_GEOJSON_PATH = DATA_DIR / "states.json"
+GEOMETRY_PATHS = {"counties": COUNTIES_GEOJSON_PATH, "states": STATES_GEOJSON_PATH}
+# "full" is the file as it is
+GEOMETRY_RESOLUTIONS = ("full",) + tuple(RESOLUTIONS)
+
+
+# Name of a geometry at a resolution, ex: "counties" (full) or "counties-national"
+# Used for its store's folder and as the asset name in /api/map/geometry URLs
+def asset_name(name, resolution="full"):
+    return name if resolution == "full" else f"{name}-{resolution}"
+
+
+# Geometry assets published at /api/map/geometry: asset name -> (geometry name, resolution)
+GEOMETRY_ASSETS = {
+    asset_name(name, resolution): (name, resolution)
+    for name in GEOMETRY_PATHS for resolution in GEOMETRY_RESOLUTIONS
+}
+
+
+# Counties of one state, or the neighbouring counties around it, at the "state" resolution
+# ex: "counties-state-19", "counties-state-19-neighbours"
+STATE_ASSET_PATTERN = re.compile(r"^counties-state-(\d{2})(-neighbours)?$")
+
+
+def state_asset_name(state_fips, part="counties"):
+    return f"counties-state-{state_fips}" + ("-neighbours" if part == "neighbours" else "")
+
+
+# Resolution for a map view: simplified less when zoomed to a state
+def view_resolution(selected_state=None):
+    return "state" if selected_state else "national"
+
+
+# The geometry store for "counties" or "states" at a resolution, opened once per process
+@lru_cache(maxsize=None)
+def geometry_store(name, resolution="full"):
+    return open_store(
+        GEOMETRY_PATHS[name],
+        GEOMETRY_STORE_DIR / asset_name(name, resolution),
+        None if resolution == "full" else resolution,
+    )
+
+
+# Counties per state (see geometry_partition.py), worked out once per process
+@lru_cache(maxsize=None)
+def state_partition():
+    return StatePartition(geometry_store("counties"))
+
+
+# Bounding boxes, centroids, areas and name aliases of every state and county (see geo_index.py),
+# worked out once per process
+@lru_cache(maxsize=None)
+def geo_index():
+    return GeoIndex(geometry_store("counties"), geometry_store("states"))
+
+
+# with_geometry=False leaves out the polygons (for lookups by name / FIPS)
+# indexes picks features by position (ex: from state_partition()); all of them by default
+def load_counties_geojson(with_geometry=True, resolution="full", indexes=None):
+    return geometry_store("counties", resolution).feature_collection(indexes, with_geometry=with_geometry)
+
+
+def load_states_geojson(with_geometry=True, resolution="full", indexes=None):
+    return geometry_store("states", resolution).feature_collection(indexes, with_geometry=with_geometry)
+
+
+# The counties of a state (part="counties") or the ring of neighbouring counties around it (part="neighbours")
+def load_state_counties_geojson(state_fips, part="counties", with_geometry=True, resolution="state"):
+    return load_counties_geojson(with_geometry, resolution, state_partition().indexes(state_fips, part))
+
+
+# The state's feature in states.json (by name or abbreviation, any case), or None
+def find_state_feature(state_name, resolution="full"):
+    state = geo_index().state(state_name)
+    if state is None:
+        return None
+    return load_states_geojson(resolution=resolution, indexes=[state["index"]])["features"][0]
+
+
+# (bytes, content hash) of a geometry asset: the file itself at full resolution, compact JSON otherwise
+# The hash goes in the asset's URL, so the URL changes whenever the geometry does and clients can keep it forever
+# Raises KeyError for an unknown asset
+@lru_cache(maxsize=None)
+def geometry_asset(asset):
+    state_match = STATE_ASSET_PATTERN.match(asset)
+    if state_match:
+        part = "neighbours" if state_match.group(2) else "counties"
+        geojson = load_state_counties_geojson(state_match.group(1), part)
+        body = json.dumps(geojson, separators=(",", ":")).encode()
+    else:
+        name, resolution = GEOMETRY_ASSETS[asset]
+        if resolution == "full":
+            body = GEOMETRY_PATHS[name].read_bytes()
+        else:
+            body = json.dumps(geometry_store(name, resolution).feature_collection(), separators=(",", ":")).encode()
+    return body, hashlib.sha1(body).hexdigest()[:16]
+
+
+# Copy of the county FeatureCollection with outbreak_count and flock_size added to each feature's properties
+# county_totals is {fips: {"outbreaks", "flock_size"}} (see snapshot_index.fips_totals)
+# A feature matches on its id (the 5-digit county FIPS code); features without one are left as they are
+def enrich_county_features(geojson, county_totals):
+    features = []
+    for feature in geojson["features"]:
+        properties = feature["properties"]
+        fips = feature.get("id")
+        if not fips:
+            features.append(feature)
+            continue
+        totals = county_totals.get(str(fips))
+        features.append({
+            **feature,
+            "properties": {
+                **properties,
+                "outbreak_count": totals["outbreaks"] if totals else 0,
+                "flock_size": totals["flock_size"] if totals else 0,
+            },
+        })
+    return {**geojson, "features": features}
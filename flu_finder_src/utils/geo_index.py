@@ -0,0 +1,153 @@
+import numpy as np
+import us
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .geometry_store import ID_COLUMN
+except ImportError:
+    from geometry_store import ID_COLUMN
+
+# Bounding box, centroid, area and name aliases of every state and county, worked out once per process
+# from the full-resolution geometry stores (see geo_data.geo_index), so maps look places up instead of
+# walking their coordinates on every request
+# Centroids are area-weighted (holes subtracted) in plain lon / lat; areas are approximate square kilometres
+
+# Spelled-out LSAD (legal / statistical area description) of the county file's abbreviations
+LSAD_NAMES = {
+    "County": "County",
+    "Parish": "Parish",
+    "Borough": "Borough",
+    "CA": "Census Area",
+    "Cty&Bor": "City and Borough",
+    "Muno": "Municipio",
+    "Muny": "Municipality",
+    "city": "City",
+}
+KM_PER_DEGREE = 111.32
+
+
+# {"bbox": (n, 4) min_lon/min_lat/max_lon/max_lat, "centroid": (n, 2), "area_km2": (n,)} for every feature of a store
+def feature_metrics(store):
+    x, y = np.asarray(store.coords[:, 0]), np.asarray(store.coords[:, 1])
+    ring_offsets = np.asarray(store.ring_offsets)
+    polygon_offsets = np.asarray(store.polygon_offsets)
+    feature_offsets = np.asarray(store.feature_offsets)
+    ring_count, feature_count = len(ring_offsets) - 1, len(feature_offsets) - 1
+
+    # Shoelace terms of each edge (the closing vertex repeats the first, so every ring is closed)
+    cross = np.zeros(len(x))
+    cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+    cross[ring_offsets[1:] - 1] = 0  # last vertex of a ring -> first vertex of the next one isn't an edge
+    moment_x = np.zeros(len(x))
+    moment_y = np.zeros(len(x))
+    moment_x[:-1] = (x[:-1] + x[1:]) * cross[:-1]
+    moment_y[:-1] = (y[:-1] + y[1:]) * cross[:-1]
+    ring_starts = ring_offsets[:-1]
+    ring_area = np.add.reduceat(cross, ring_starts) / 2
+    ring_moment_x = np.add.reduceat(moment_x, ring_starts) / 6
+    ring_moment_y = np.add.reduceat(moment_y, ring_starts) / 6
+
+    # Outer rings count positive and holes negative, whichever way round they are drawn
+    exterior = np.zeros(ring_count, dtype=bool)
+    exterior[polygon_offsets[:-1]] = True
+    sign = np.where(exterior, 1.0, -1.0) * np.sign(ring_area)
+    polygon_of_ring = np.repeat(np.arange(len(polygon_offsets) - 1), np.diff(polygon_offsets))
+    feature_of_ring = np.repeat(np.arange(feature_count), np.diff(feature_offsets))[polygon_of_ring]
+    area = np.bincount(feature_of_ring, sign * ring_area, minlength=feature_count)
+    centroid_x = np.bincount(feature_of_ring, sign * ring_moment_x, minlength=feature_count)
+    centroid_y = np.bincount(feature_of_ring, sign * ring_moment_y, minlength=feature_count)
+
+    feature_starts = ring_offsets[polygon_offsets[feature_offsets[:-1]]]
+    bbox = np.column_stack([
+        np.minimum.reduceat(x, feature_starts),
+        np.minimum.reduceat(y, feature_starts),
+        np.maximum.reduceat(x, feature_starts),
+        np.maximum.reduceat(y, feature_starts),
+    ])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centroid = np.column_stack([centroid_x / area, centroid_y / area])
+    # Degenerate (zero-area) features fall back to the middle of their box
+    middle = np.column_stack([(bbox[:, 0] + bbox[:, 2]) / 2, (bbox[:, 1] + bbox[:, 3]) / 2])
+    centroid = np.where(np.isfinite(centroid) & (area != 0)[:, None], centroid, middle)
+    area_km2 = np.abs(area) * KM_PER_DEGREE ** 2 * np.cos(np.radians(centroid[:, 1]))
+    return {"bbox": bbox, "centroid": centroid, "area_km2": area_km2}
+
+
+# Upper-cased names a county goes by: "Bossier", "Bossier Parish", "St. Louis" / "Saint Louis" / "St Louis"...
+def county_aliases(name, lsad):
+    names = [name]
+    if lsad:
+        names.append(f"{name} {lsad}")
+    for name in list(names):
+        if name.startswith("St. "):
+            names += ["Saint " + name[4:], "St " + name[4:]]
+        elif name.startswith("Saint "):
+            names.append("St. " + name[6:])
+    return [name.upper() for name in names]
+
+
+class GeoIndex:
+    def __init__(self, county_store, state_store):
+        self._counties = feature_metrics(county_store)
+        self._county_ids = [str(county_id) for county_id in county_store.column(ID_COLUMN)]
+        self._county_names = county_store.column("NAME")
+        self._county_lsads = [LSAD_NAMES.get(lsad, lsad) for lsad in county_store.column("LSAD")]
+        self._states = feature_metrics(state_store)
+        self._state_names = state_store.column("NAME")
+        self._state_abbrs = state_store.column("STUSPS")
+
+        # State name / abbreviation / FIPS (upper case) -> FIPS, for every state and territory
+        self._state_fips = {}
+        for state in us.states.STATES_AND_TERRITORIES + [us.states.DC]:
+            for key in (state.name, state.abbr, state.fips):
+                self._state_fips[key.upper()] = state.fips
+        # State FIPS -> index in the state store
+        self._state_index = {}
+        for i, abbr in enumerate(self._state_abbrs):
+            state = us.states.lookup(abbr)
+            if state:
+                self._state_index[state.fips] = i
+
+        # (state FIPS, alias) -> county index. The full "<Name> <LSAD>" forms go first; a bare name shared by a
+        # county and an independent city ("Richmond", Virginia) means the county
+        self._county_index = {}
+        order = sorted(range(len(self._county_ids)), key=lambda i: self._county_lsads[i] == "City")
+        for full_forms in (True, False):
+            for i in order:
+                aliases = county_aliases(self._county_names[i], self._county_lsads[i])
+                aliases = [alias for alias in aliases if (alias != self._county_names[i].upper()) == full_forms]
+                for alias in aliases:
+                    self._county_index.setdefault((self._county_ids[i][:2], alias), i)
+
+    # FIPS code of a state name, abbreviation or FIPS code (any case), or None
+    def state_fips(self, state):
+        return self._state_fips.get(str(state).strip().upper()) if state else None
+
+    # {"fips", "name", "abbr", "index", "bbox", "centroid", "area_km2"} of a state, or None
+    def state(self, state):
+        i = self._state_index.get(self.state_fips(state))
+        if i is None:
+            return None
+        return {"fips": self.state_fips(state), "name": self._state_names[i], "abbr": self._state_abbrs[i],
+                **self._record(self._states, i)}
+
+    # {"fips", "name", "lsad", "state_fips", "index", "bbox", "centroid", "area_km2"} of a county, or None
+    # county can be any of its aliases ("Bossier", "Bossier Parish", "BOSSIER PARISH")
+    def county(self, state, county):
+        state_fips = self.state_fips(state)
+        if not state_fips or not county:
+            return None
+        i = self._county_index.get((state_fips, str(county).strip().upper()))
+        if i is None:
+            return None
+        return {"fips": self._county_ids[i], "name": self._county_names[i], "lsad": self._county_lsads[i],
+                "state_fips": state_fips, **self._record(self._counties, i)}
+
+    @staticmethod
+    def _record(metrics, i):
+        min_lon, min_lat, max_lon, max_lat = metrics["bbox"][i].tolist()
+        lon, lat = metrics["centroid"][i].tolist()
+        return {
+            "index": i,
+            "bbox": {"min_lon": min_lon, "min_lat": min_lat, "max_lon": max_lon, "max_lat": max_lat},
+            "centroid": {"lon": lon, "lat": lat},
+            "area_km2": float(metrics["area_km2"][i]),
+        }
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import us
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .geometry_store import ID_COLUMN
+except ImportError:
+    from geometry_store import ID_COLUMN
+
+# County features grouped by state, for maps zoomed to one state
+# Built once per process from the county geometry store (see geo_data.state_partition):
+# a state's counties are the features whose FIPS id starts with the state's FIPS code, and its neighbours
+# are the other states' counties that share a border vertex with one of them (a one-county-deep ring around it).
+# Everything is held as feature indexes, which are the same in every resolution of a store
+
+PARTS = ("counties", "neighbours")
+
+
+class StatePartition:
+    def __init__(self, county_store):
+        ids = county_store.column(ID_COLUMN)
+        prefixes = np.asarray([str(county_id)[:2] for county_id in ids])
+        self._parts = {
+            state_fips: {"counties": np.flatnonzero(prefixes == state_fips)}
+            for state_fips in dict.fromkeys(prefixes.tolist())
+        }
+
+        # Which features every vertex belongs to (vertices shared by neighbours are exactly equal)
+        point_starts = county_store.ring_offsets[county_store.polygon_offsets[county_store.feature_offsets]]
+        feature_of_point = np.repeat(np.arange(len(county_store)), np.diff(point_starts))
+        _, point_ids = np.unique(county_store.coords, axis=0, return_inverse=True)
+        owners = pd.DataFrame({"point": point_ids.ravel(), "feature": feature_of_point}).drop_duplicates()
+        owners["state"] = prefixes[owners["feature"].to_numpy()]
+        pairs = owners.merge(owners, on="point", suffixes=("", "_neighbour"))
+        pairs = pairs[pairs["state"] != pairs["state_neighbour"]]
+        for state_fips, neighbours in pairs.groupby("state")["feature_neighbour"]:
+            self._parts[state_fips]["neighbours"] = np.unique(neighbours.to_numpy())
+        for part in self._parts.values():
+            part.setdefault("neighbours", np.zeros(0, dtype=np.int64))
+
+        # State name (upper case) -> FIPS code
+        self._state_fips = {state.name.upper(): state.fips for state in us.states.STATES_AND_TERRITORIES + [us.states.DC]}
+
+    # FIPS code of a state name (any case), or None (also for a territory without county geometry)
+    def state_fips(self, state_name):
+        state_fips = self._state_fips.get(state_name.upper()) if state_name else None
+        return state_fips if state_fips in self._parts else None
+
+    # County feature indexes of a state: its own counties, or its neighbours. KeyError for an unknown state
+    def indexes(self, state_fips, part="counties"):
+        return self._parts[state_fips][part].tolist()
+
+    def states(self):
+        return list(self._parts)
@@ -0,0 +1,150 @@
+import numpy as np
+
+# Simplified copies of the county / state GeoJSON for maps that don't need every vertex
+# Borders shared by two features are simplified once, so neighbours still meet exactly (no gaps or overlaps):
+# every ring is cut into arcs at its junctions (vertices where the neighbouring features change), each arc
+# is simplified with Douglas-Peucker (endpoints always kept), and rings are put back together from the arcs.
+# Coordinates are then quantized (rounded to a fixed number of decimals), the same way on both sides of a border
+
+# Resolution name -> Douglas-Peucker tolerance (degrees) and decimals kept
+# "full" is the source file as it is (see geo_data.py)
+RESOLUTIONS = {
+    # Zoomed to one state (~0.005 degrees per pixel for a mid-sized state)
+    "state": {"tolerance": 0.001, "digits": 4},
+    # Whole country (~0.05 degrees per pixel)
+    "national": {"tolerance": 0.02, "digits": 2},
+}
+
+
+def _polygons(geometry):
+    return [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+
+
+# Open ring (closing vertex dropped) as a tuple of (lon, lat) tuples
+def _open_ring(ring):
+    points = [tuple(point) for point in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    return tuple(points)
+
+
+# Vertices where more than two features' borders meet, or where a shared border starts / ends
+def find_junctions(rings):
+    neighbours = {}
+    for ring in rings:
+        for i, point in enumerate(ring):
+            around = neighbours.setdefault(point, set())
+            around.add(ring[i - 1])
+            around.add(ring[(i + 1) % len(ring)])
+    return {point for point, around in neighbours.items() if len(around) > 2}
+
+
+# The ring cut at its junctions: a list of arcs, each running from one junction to the next (both included)
+# A ring without junctions is one closed arc starting at its smallest vertex, so both copies of it start at the same place
+def split_ring(ring, junctions):
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        start = ring.index(min(ring))
+        return [ring[start:] + ring[:start + 1]]
+    ring = ring[cuts[0]:] + ring[:cuts[0]]
+    cuts = [cut - cuts[0] if cut >= cuts[0] else cut + len(ring) - cuts[0] for cut in cuts]
+    ends = cuts[1:] + [len(ring)]
+    closed = ring + ring[:1]
+    return [closed[start:end + 1] for start, end in zip(cuts, ends)]
+
+
+# Positions of the points Douglas-Peucker keeps (always the first and last)
+# min_interior forces that many other points in (the farthest ones), for rings made of one or two arcs
+def douglas_peucker(points, tolerance, min_interior=0):
+    points = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    kept_interior = 0
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = points[first + 1:last]
+        start, end = points[first], points[last]
+        chord = end - start
+        length = np.hypot(chord[0], chord[1])
+        if length == 0:
+            # Closed arc: distance to the (single) endpoint
+            offsets = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            offsets = np.abs(chord[0] * (inner[:, 1] - start[1]) - chord[1] * (inner[:, 0] - start[0])) / length
+        farthest = first + 1 + int(np.argmax(offsets))
+        if offsets[farthest - first - 1] > tolerance or kept_interior < min_interior:
+            keep[farthest] = True
+            kept_interior += 1
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return np.flatnonzero(keep)
+
+
+# Arcs are stored in one direction, so an arc and its reversed copy in the neighbouring ring share an entry
+def _arc_key(arc):
+    reversed_arc = arc[::-1]
+    return (reversed_arc, True) if reversed_arc < arc else (arc, False)
+
+
+# Copy of a FeatureCollection of (Multi)Polygons simplified to tolerance and rounded to digits decimals
+# Rings that shrink to a sliver are dropped; a feature that would lose every polygon keeps its original geometry
+def simplify_feature_collection(geojson, tolerance, digits):
+    features = geojson["features"]
+    rings = [
+        [[_open_ring(ring) for ring in polygon] for polygon in _polygons(feature["geometry"])]
+        for feature in features
+    ]
+    junctions = find_junctions([ring for polygons in rings for polygon in polygons for ring in polygon if ring])
+
+    # Cut every ring, and work out how many interior points each arc must keep
+    split = []
+    min_interior = {}
+    for polygons in rings:
+        split.append([])
+        for polygon in polygons:
+            split[-1].append([])
+            for ring in polygon:
+                arcs = split_ring(ring, junctions) if len(ring) >= 3 else []
+                split[-1][-1].append(arcs)
+                needed = {1: 2, 2: 1}.get(len(arcs), 0)
+                for arc in arcs:
+                    key = _arc_key(arc)[0]
+                    min_interior[key] = max(min_interior.get(key, 0), needed)
+
+    simplified = {}
+    for key, needed in min_interior.items():
+        kept = douglas_peucker(key, tolerance, needed)
+        simplified[key] = [(round(key[i][0], digits), round(key[i][1], digits)) for i in kept]
+
+    new_features = []
+    for feature, polygons in zip(features, split):
+        new_polygons = []
+        for polygon in polygons:
+            new_rings = []
+            for arcs in polygon:
+                ring = []
+                for arc in arcs:
+                    key, is_reversed = _arc_key(arc)
+                    points = simplified[key][::-1] if is_reversed else simplified[key]
+                    for point in points:
+                        if not ring or ring[-1] != point:
+                            ring.append(point)
+                if len(set(ring)) >= 3:
+                    new_rings.append([list(point) for point in ring])
+                elif not new_rings:
+                    # Exterior ring collapsed: the holes go with it
+                    break
+            if new_rings:
+                new_polygons.append(new_rings)
+
+        geometry = feature["geometry"]
+        if new_polygons:
+            geometry = (
+                {"type": "Polygon", "coordinates": new_polygons[0]} if geometry["type"] == "Polygon"
+                else {"type": "MultiPolygon", "coordinates": new_polygons}
+            )
+        new_features.append({**feature, "geometry": geometry})
+    return {**geojson, "features": new_features}
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError: # Windows: no lock between processes (a single dev server doesn't need one)
+    fcntl = None
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .geometry_simplify import RESOLUTIONS, simplify_feature_collection
+except ImportError:
+    from geometry_simplify import RESOLUTIONS, simplify_feature_collection
+
+# Binary copy of a GeoJSON FeatureCollection of (Multi)Polygons, for the map endpoints
+# Layout (one folder per source file, like local_snapshot.py):
+#   <store>/manifest.json       <- source hash, feature count, key order, property columns
+#   <store>/coords.npy          <- every vertex, (n, 2) float64, in file order
+#   <store>/ring_offsets.npy    <- ring r is coords[ring_offsets[r]:ring_offsets[r + 1]]
+#   <store>/polygon_offsets.npy <- polygon p is rings polygon_offsets[p]..polygon_offsets[p + 1]
+#   <store>/feature_offsets.npy <- feature f is polygons feature_offsets[f]..feature_offsets[f + 1]
+#   <store>/types.npy           <- geometry type of each feature (index into GEOMETRY_TYPES)
+#   <store>/prop<i>.npy         <- one column per property (+ the feature id): float64, or codes into a .json list of strings
+# Workers memory-map the arrays, so the coordinates are one read-only copy shared by every process;
+# GeoJSON dicts are only built when something asks for them (see GeometryStore.feature_collection)
+# Workers build a missing / outdated store on first use: checking, building and opening happen under a
+# per-store file lock (<store>.lock next to it), so one worker builds while the others wait and then
+# open what it wrote. A rebuild never deletes a store in place: the new one is written to a temporary
+# folder, the old one is renamed aside and the new one renamed in (open maps stay valid after the rename)
+
+THIS_DIR = Path(__file__).resolve().parent
+GEOMETRY_STORE_DIR = Path(os.getenv("GEOMETRY_STORE_DIR", THIS_DIR.parent / "data" / "geometry"))
+
+MANIFEST_NAME = "manifest.json"
+GEOMETRY_TYPES = ["Polygon", "MultiPolygon"]
+# Name of the feature id column (GeoJSON keeps the id next to the properties, not in them)
+ID_COLUMN = "@id"
+
+
+def file_hash(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def _encode_values(values):
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        kind = "int" if all(isinstance(value, int) for value in values) else "float"
+        return kind, np.asarray(values, dtype=np.int64 if kind == "int" else np.float64), None
+    # Strings are dictionary-encoded: codes + the unique values (None is a value too)
+    categories = list(dict.fromkeys(None if value is None else str(value) for value in values))
+    positions = {value: code for code, value in enumerate(categories)}
+    codes = np.asarray([positions[None if value is None else str(value)] for value in values], dtype=np.int32)
+    return "category", codes, categories
+
+
+# Writes the store for one GeoJSON file into directory (replacing what's there). Returns the manifest
+# Every feature needs a Polygon or MultiPolygon geometry; property keys are taken from the first feature
+# resolution names a simplified version (see geometry_simplify.RESOLUTIONS); None stores the file as it is
+def build_store(source_path, directory, resolution=None):
+    source_path, directory = Path(source_path), Path(directory)
+    with open(source_path) as f:
+        geojson = json.load(f)
+    if resolution is not None:
+        geojson = simplify_feature_collection(geojson, **RESOLUTIONS[resolution])
+    features = geojson["features"]
+
+    coords = []
+    ring_offsets, polygon_offsets, feature_offsets, types = [0], [0], [0], []
+    for feature in features:
+        geometry = feature["geometry"]
+        types.append(GEOMETRY_TYPES.index(geometry["type"]))
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        for polygon in polygons:
+            for ring in polygon:
+                coords.extend(ring)
+                ring_offsets.append(len(coords))
+            polygon_offsets.append(len(ring_offsets) - 1)
+        feature_offsets.append(len(polygon_offsets) - 1)
+
+    tmp_dir = directory.parent / f".{directory.name}.{os.getpid()}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "coords.npy", np.asarray(coords, dtype=np.float64).reshape(-1, 2), allow_pickle=False)
+    np.save(tmp_dir / "ring_offsets.npy", np.asarray(ring_offsets, dtype=np.int64), allow_pickle=False)
+    np.save(tmp_dir / "polygon_offsets.npy", np.asarray(polygon_offsets, dtype=np.int64), allow_pickle=False)
+    np.save(tmp_dir / "feature_offsets.npy", np.asarray(feature_offsets, dtype=np.int64), allow_pickle=False)
+    np.save(tmp_dir / "types.npy", np.asarray(types, dtype=np.int8), allow_pickle=False)
+
+    names = list(features[0]["properties"].keys()) if features else []
+    if any("id" in feature for feature in features):
+        names.append(ID_COLUMN)
+    columns = []
+    for position, name in enumerate(names):
+        if name == ID_COLUMN:
+            values = [feature.get("id") for feature in features]
+        else:
+            values = [feature["properties"].get(name) for feature in features]
+        kind, array, categories = _encode_values(values)
+        column = {"name": name, "kind": kind, "file": f"prop{position}.npy"}
+        np.save(tmp_dir / column["file"], array, allow_pickle=False)
+        if categories is not None:
+            column["categories"] = f"prop{position}.categories.json"
+            with open(tmp_dir / column["categories"], "w") as f:
+                json.dump(categories, f)
+        columns.append(column)
+
+    manifest = {
+        "source": source_path.name,
+        "source_hash": file_hash(source_path),
+        "resolution": resolution,
+        "simplify": RESOLUTIONS.get(resolution),
+        "features": len(features),
+        "points": len(coords),
+        # Key order of a feature in the source, so rebuilt features serialize the same way
+        "feature_keys": list(features[0].keys()) if features else ["type", "properties", "geometry"],
+        "columns": columns,
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = directory.parent / f".{directory.name}.{os.getpid()}.old"
+    if directory.exists():
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+# Holds the store's lock file (exclusive) for the duration of the with block
+@contextmanager
+def store_lock(directory):
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    with open(directory.parent / f".{directory.name}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class GeometryStore:
+    def __init__(self, directory):
+        directory = Path(directory)
+        with open(directory / MANIFEST_NAME) as f:
+            self.manifest = json.load(f)
+        self.coords = np.load(directory / "coords.npy", mmap_mode="r", allow_pickle=False)
+        self.ring_offsets = np.load(directory / "ring_offsets.npy", mmap_mode="r", allow_pickle=False)
+        self.polygon_offsets = np.load(directory / "polygon_offsets.npy", mmap_mode="r", allow_pickle=False)
+        self.feature_offsets = np.load(directory / "feature_offsets.npy", mmap_mode="r", allow_pickle=False)
+        self.types = np.load(directory / "types.npy", mmap_mode="r", allow_pickle=False)
+        self._columns = {}
+        for column in self.manifest["columns"]:
+            values = np.load(directory / column["file"], mmap_mode="r", allow_pickle=False)
+            categories = None
+            if column["kind"] == "category":
+                with open(directory / column["categories"]) as f:
+                    categories = json.load(f)
+            self._columns[column["name"]] = (values, categories)
+
+    def __len__(self):
+        return self.manifest["features"]
+
+    # Property names in source order (the feature id isn't one)
+    def property_names(self):
+        return [name for name in self._columns if name != ID_COLUMN]
+
+    # Every feature's value for one property (or ID_COLUMN), as a list of plain Python values
+    def column(self, name):
+        values, categories = self._columns[name]
+        if categories is None:
+            return values.tolist()
+        return [categories[code] for code in values.tolist()]
+
+    # {"type", "coordinates"} of feature i, as nested lists
+    def geometry(self, i):
+        polygons = []
+        for p in range(self.feature_offsets[i], self.feature_offsets[i + 1]):
+            rings = []
+            for r in range(self.polygon_offsets[p], self.polygon_offsets[p + 1]):
+                rings.append(self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]].tolist())
+            polygons.append(rings)
+        geometry_type = GEOMETRY_TYPES[self.types[i]]
+        return {"type": geometry_type, "coordinates": polygons[0] if geometry_type == "Polygon" else polygons}
+
+    # GeoJSON Features for the given feature indexes (all of them by default), in the source's key order
+    # with_geometry=False leaves the geometry out (for lookups that only need the properties)
+    def features(self, indexes=None, with_geometry=True):
+        indexes = range(len(self)) if indexes is None else indexes
+        names = self.property_names()
+        columns = [self.column(name) for name in names]
+        ids = self.column(ID_COLUMN) if ID_COLUMN in self._columns else None
+        features = []
+        for i in indexes:
+            parts = {
+                "type": "Feature",
+                "properties": {name: values[i] for name, values in zip(names, columns)},
+                "geometry": self.geometry(i) if with_geometry else None,
+                "id": ids[i] if ids is not None else None,
+            }
+            features.append({
+                key: parts[key] for key in self.manifest["feature_keys"]
+                if key in parts and not (key == "geometry" and not with_geometry)
+            })
+        return features
+
+    def feature_collection(self, indexes=None, with_geometry=True):
+        return {"type": "FeatureCollection", "features": self.features(indexes, with_geometry)}
+
+
+# The store for a GeoJSON file, built (or rebuilt) first if it's missing, older than the file
+# or simplified with other settings
+# The check runs again once the lock is held, so a store another worker just put in place is kept
+def open_store(source_path, directory, resolution=None):
+    directory = Path(directory)
+    manifest_path = directory / MANIFEST_NAME
+    with store_lock(directory):
+        manifest = None
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        if (
+            manifest is None
+            or manifest.get("source_hash") != file_hash(source_path)
+            or manifest.get("resolution") != resolution
+            or manifest.get("simplify") != RESOLUTIONS.get(resolution)
+        ):
+            build_store(source_path, directory, resolution)
+        return GeometryStore(directory)
+
+
+# Builds the stores for the map's GeoJSON files (every resolution) ahead of time (ex: in the deploy build),
+# so workers only ever map them: python flu_finder_src/utils/geometry_store.py
+# Takes the same locks as the workers, so it is safe to run while the app is up
+if __name__ == "__main__":
+    sys.path.insert(0, str(THIS_DIR.parent.parent))
+    from flu_finder_src.utils.geo_data import GEOMETRY_PATHS, GEOMETRY_ASSETS
+
+    for asset, (name, resolution) in GEOMETRY_ASSETS.items():
+        with store_lock(GEOMETRY_STORE_DIR / asset):
+            manifest = build_store(GEOMETRY_PATHS[name], GEOMETRY_STORE_DIR / asset, None if resolution == "full" else resolution)
+        print(f"Wrote {manifest['features']} features ({manifest['points']} points) from {GEOMETRY_PATHS[name].name} to {GEOMETRY_STORE_DIR / asset}")
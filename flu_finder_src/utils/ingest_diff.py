@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+# Row identity and change detection for the daily CDC ingest
+# Each outbreak gets:
+#   - a row id: hash of the columns that identify the outbreak (date, location, flock type) plus how many
+#     identical keys came before it, so duplicate CDC rows still get distinct ids
+#   - a content hash: hash of every column, so an edited flock size shows up as "changed"
+
+KEY_COLUMNS = ["Outbreak Date", "State", "County", "Flock Type"]
+DATE_FORMAT = "%m-%d-%Y"
+
+
+# Same text for the same value no matter where the frame came from (sheet strings, CDC csv, typed snapshot)
+def canonical_frame(df):
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    for col in df.columns:
+        values = df[col].reset_index(drop=True)
+        if col == "Outbreak Date":
+            dates = pd.to_datetime(values, errors="coerce", format="mixed") if not pd.api.types.is_datetime64_any_dtype(values) else values
+            out[col] = dates.dt.strftime(DATE_FORMAT).fillna("")
+        elif col == "Flock Size":
+            out[col] = pd.to_numeric(values, errors="coerce").fillna(0).astype("int64").astype(str)
+        else:
+            out[col] = values.astype(object).where(values.notna(), "").astype(str).str.strip()
+    return out
+
+
+def row_ids(df):
+    canonical = canonical_frame(df)
+    key_cols = [col for col in KEY_COLUMNS if col in canonical.columns]
+    keys = canonical[key_cols].copy()
+    keys["_occurrence"] = keys.groupby(key_cols, sort=False).cumcount()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(canonical_frame(df), index=False).to_numpy(dtype=np.uint64)
+
+
+# (row ids, content hashes) for every row of df
+def row_identity(df):
+    return row_ids(df), row_hashes(df)
+
+
+# Compares two row_identity() results. Returns uint64 id arrays: {"added", "changed", "removed"}
+def diff_identities(old, new):
+    old_table = pd.Series(old[1], index=old[0])
+    new_table = pd.Series(new[1], index=new[0])
+
+    added = new_table.index.difference(old_table.index)
+    removed = old_table.index.difference(new_table.index)
+    shared = new_table.index.intersection(old_table.index)
+    changed = shared[new_table.loc[shared].to_numpy() != old_table.loc[shared].to_numpy()]
+
+    return {
+        "added": added.to_numpy(dtype=np.uint64),
+        "changed": changed.to_numpy(dtype=np.uint64),
+        "removed": removed.to_numpy(dtype=np.uint64),
+    }
+
+
+# Compares two versions of the data. Ids are returned as ints so they can go straight into JSON
+def diff_frames(old, new):
+    changes = diff_identities(row_identity(old), row_identity(new))
+    return {key: [int(i) for i in ids] for key, ids in changes.items()}
+
+
+def summarize_diff(diff):
+    return {
+        "rows_added": len(diff["added"]),
+        "rows_changed": len(diff["changed"]),
+        "rows_removed": len(diff["removed"]),
+    }
+
+
+# Works out the smallest set of writes that turns the sheet's current values into new_values
+# Both are lists of rows (header first). Rows are matched by row id, not by position, so a backfilled
+# outbreak in the middle of the data doesn't shift (and rewrite) every row after it:
+#   - a row whose id is already in the sheet is rewritten in place, and only if its content changed
+#   - new rows go into the slots of removed rows first, then are appended at the end
+#   - if more rows were removed than added, rows from the end of the sheet move into the leftover slots
+#     and the tail is cleared, so the sheet never has blank rows in the middle
+# This does NOT keep the sheet in date order (or same-day rows in CDC order): added rows land in freed
+# slots or at the end, and tail rows move up. Nothing may read date order from sheet position: loading
+# sorts by date (schema.normalize_frame) and data_fetcher.get_reversed_dataframe sorts on the date column
+# Returns (changed_blocks, rows_to_append, first_row_to_clear)
+#   changed_blocks: [(first_sheet_row, rows), ...] for runs of consecutive changed rows (1-based rows)
+#   first_row_to_clear: sheet row where leftover old rows start, or None
+def plan_sheet_patch(old_values, new_values):
+    header, new_rows = new_values[0], new_values[1:]
+    old_rows = old_values[1:] if old_values else []
+    width = len(header)
+    old_frame = pd.DataFrame([list(row[:width]) + [""] * (width - len(row)) for row in old_rows], columns=header)
+    new_frame = pd.DataFrame(new_rows, columns=header)
+    old_ids, old_hashes = row_identity(old_frame)
+    new_ids, new_hashes = row_identity(new_frame)
+
+    # slots[i] is the new row that ends up in data row i of the sheet (None: nothing there yet)
+    slots = [None] * len(old_rows)
+    writes = set()
+    old_positions = {row_id: position for position, row_id in enumerate(old_ids.tolist())}
+    added = []
+    for i, row_id in enumerate(new_ids.tolist()):
+        position = old_positions.get(row_id)
+        if position is None:
+            added.append(i)
+            continue
+        slots[position] = i
+        if new_hashes[i] != old_hashes[position]:
+            writes.add(position)
+
+    holes = [position for position, row in enumerate(slots) if row is None]
+    for position, i in zip(holes, added):
+        slots[position] = i
+        writes.add(position)
+    rows_to_append = [new_rows[i] for i in added[len(holes):]]
+
+    # Fill the remaining holes from the end of the sheet
+    holes = holes[len(added):]
+    length = len(slots)
+    while holes:
+        if slots[length - 1] is None:
+            holes.remove(length - 1)
+        else:
+            hole = holes.pop(0)
+            slots[hole] = slots[length - 1]
+            writes.add(hole)
+        length -= 1
+
+    # Group consecutive written rows so each run is one range in the batch update
+    changed_blocks = []
+    if old_values and [str(value) for value in old_values[0]] != [str(value) for value in header]:
+        changed_blocks.append((1, [header]))
+    positions = np.asarray(sorted(writes), dtype=np.int64)
+    if len(positions):
+        run_breaks = np.flatnonzero(np.diff(positions) > 1) + 1
+        for run in np.split(positions, run_breaks):
+            changed_blocks.append((int(run[0]) + 2, [new_rows[slots[position]] for position in run]))
+
+    first_row_to_clear = len(new_values) + 1 if len(old_values) > len(new_values) else None
+    return changed_blocks, rows_to_append, first_row_to_clear
@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .snapshot_cache import hash_frame
+except ImportError:
+    from snapshot_cache import hash_frame
+
+# Columnar copy of the outbreak data on local disk
+# Layout:
+#   SNAPSHOT_DIR/manifest.json      <- points at the current version (swapped atomically)
+#   SNAPSHOT_DIR/v<version>/        <- one .npy file per column (+ categories for string columns)
+# Web workers memory-map the .npy files, so opening a snapshot doesn't copy the data
+
+THIS_DIR = Path(__file__).resolve().parent
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", THIS_DIR.parent / "data" / "snapshot"))
+
+# How many old versions to leave on disk (workers may still have them mapped)
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+MANIFEST_NAME = "manifest.json"
+CHANGES_NAME = "changes.json"
+DATE_COLUMN = "Outbreak Date"
+
+
+def _smallest_code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+# Turn every column into something np.save can write without pickling
+def _encode_column(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime", series.to_numpy(dtype="datetime64[ns]"), None
+    if pd.api.types.is_bool_dtype(series):
+        return "bool", series.to_numpy(dtype=bool), None
+    if pd.api.types.is_integer_dtype(series):
+        return "int", series.to_numpy(), None
+    if pd.api.types.is_float_dtype(series):
+        return "float", series.to_numpy(), None
+
+    # Strings (and anything else) are dictionary-encoded: small integer codes + a list of unique values
+    values = series.astype(object).where(series.notna(), None)
+    categorical = pd.Categorical(values.map(lambda v: v if v is None else str(v)))
+    categories = [str(c) for c in categorical.categories]
+    codes = categorical.codes.astype(_smallest_code_dtype(len(categories)))
+    return "category", codes, categories
+
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    manifest_path = Path(directory) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+# Writes df as a new snapshot version and makes it current. Returns the manifest
+# changes is the ingest diff (row ids added/changed/removed since the last version), if known
+def write_snapshot(df, directory=SNAPSHOT_DIR, changes=None):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    df = df.reset_index(drop=True)
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors="coerce")
+
+    previous = read_manifest(directory)
+    version = (previous["version"] + 1) if previous else 1
+    version_name = f"v{version}"
+
+    # Write into a temp folder first so a half-written version is never visible
+    tmp_dir = directory / f".{version_name}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir()
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        kind, values, categories = _encode_column(df[name])
+        file_name = f"col{position}.npy"
+        np.save(tmp_dir / file_name, values, allow_pickle=False)
+        column = {"name": name, "kind": kind, "file": file_name, "dtype": str(values.dtype)}
+        if categories is not None:
+            column["categories"] = f"col{position}.categories.json"
+            with open(tmp_dir / column["categories"], "w") as f:
+                json.dump(categories, f)
+        columns.append(column)
+
+    date_min = date_max = None
+    if DATE_COLUMN in df.columns and df[DATE_COLUMN].notna().any():
+        date_min = df[DATE_COLUMN].min().strftime("%Y-%m-%d")
+        date_max = df[DATE_COLUMN].max().strftime("%Y-%m-%d")
+
+    manifest = {
+        "version": version,
+        "path": version_name,
+        "row_count": len(df),
+        "date_min": date_min,
+        "date_max": date_max,
+        "content_hash": hash_frame(df),
+        # What `changes` is relative to (the data version clients hold before this one, see snapshot_cache.data_token)
+        "previous_content_hash": previous.get("content_hash") if previous else None,
+        "created_at": time.time(),
+        "columns": columns,
+    }
+    if changes is not None:
+        manifest["changes"] = {key: len(ids) for key, ids in changes.items()}
+        with open(tmp_dir / CHANGES_NAME, "w") as f:
+            json.dump(changes, f)
+    with open(tmp_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    final_dir = directory / version_name
+    if final_dir.exists():
+        shutil.rmtree(final_dir)
+    os.replace(tmp_dir, final_dir)
+
+    # Swap the top-level manifest last; readers either see the old version or the new one
+    tmp_manifest = directory / f".{MANIFEST_NAME}.tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, directory / MANIFEST_NAME)
+
+    _remove_old_versions(directory, version)
+    return manifest
+
+
+def _remove_old_versions(directory, current_version):
+    for path in directory.glob("v*"):
+        try:
+            old_version = int(path.name[1:])
+        except ValueError:
+            continue
+        if old_version <= current_version - SNAPSHOT_KEEP:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# The ingest diff saved with a version ({"added", "changed", "removed"} row ids), or None
+def read_changes(manifest, directory=SNAPSHOT_DIR):
+    changes_path = Path(directory) / manifest["path"] / CHANGES_NAME
+    if "changes" not in manifest or not changes_path.exists():
+        return None
+    with open(changes_path) as f:
+        return json.load(f)
+
+
+# Opens the current snapshot without copying it (columns are read-only memory maps)
+# String columns come back as Categoricals over the stored codes; decode_strings=True turns them
+# back into plain object columns (costs one copy of those columns)
+# Returns (DataFrame, manifest)
+def open_snapshot(directory=SNAPSHOT_DIR, decode_strings=False):
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No local snapshot found in {directory}")
+
+    version_dir = directory / manifest["path"]
+    data = {}
+    for column in manifest["columns"]:
+        values = np.load(version_dir / column["file"], mmap_mode="r", allow_pickle=False)
+        if column["kind"] == "category":
+            with open(version_dir / column["categories"]) as f:
+                categories = json.load(f)
+            categorical = pd.Categorical.from_codes(values, categories=pd.Index(categories, dtype=object), validate=False)
+            data[column["name"]] = categorical.astype(object) if decode_strings else categorical
+        else:
+            data[column["name"]] = values
+
+    df = pd.DataFrame(data, copy=False)
+    df.index.name = "Index"
+    return df, manifest
+
+
+# Build a snapshot straight from the CDC file (or a local CSV) without touching Google Sheets
+# python flu_finder_src/utils/local_snapshot.py [csv url or path]
+if __name__ == "__main__":
+    try:
+        from .data_fetcher import get_sorted_dataframe_from_link
+    except ImportError:
+        from data_fetcher import get_sorted_dataframe_from_link
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "https://www.cdc.gov/bird-flu/modules/situation-summary/commercial-backyard-flocks.csv"
+    manifest = write_snapshot(get_sorted_dataframe_from_link(source))
+    print(f"Wrote snapshot v{manifest['version']} ({manifest['row_count']} rows, {manifest['date_min']} to {manifest['date_max']}) to {SNAPSHOT_DIR}")
@@ -0,0 +1,115 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Outbreak points for /api/map/data, built from whole columns instead of row by row
+# Coordinates are validated once per data version (rows without numeric Longitude/Latitude are left out)
+# and every valid point is filed into a grid of GRID_DEGREES x GRID_DEGREES cells, so a bounding-box
+# request only looks at the points in the cells it overlaps
+
+GRID_DEGREES = float(os.getenv("MAP_GRID_DEGREES", "1.0"))
+
+
+class PointIndex:
+    def __init__(self, frame):
+        self.frame = frame
+        if "Longitude" in frame.columns and "Latitude" in frame.columns:
+            longitudes = pd.to_numeric(frame["Longitude"], errors="coerce").to_numpy()
+            latitudes = pd.to_numeric(frame["Latitude"], errors="coerce").to_numpy()
+            valid = ~(pd.isna(longitudes) | pd.isna(latitudes))
+        else:
+            longitudes = latitudes = np.zeros(len(frame))
+            valid = np.zeros(len(frame), dtype=bool)
+        # Snapshot positions of the rows with usable coordinates, in snapshot order
+        self.positions = np.flatnonzero(valid)
+        self.longitudes = longitudes[self.positions]
+        self.latitudes = latitudes[self.positions]
+
+        # Grid cell of every point; points sorted by cell so each cell is one slice of cell_order
+        columns = np.floor(self.longitudes.astype(float) / GRID_DEGREES).astype(np.int64)
+        rows = np.floor(self.latitudes.astype(float) / GRID_DEGREES).astype(np.int64)
+        self.cell_order = np.lexsort((rows, columns))
+        self.cells = {}
+        if len(self.cell_order):
+            sorted_cells = np.stack([columns[self.cell_order], rows[self.cell_order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, (sorted_cells[1:] != sorted_cells[:-1]).any(axis=1)])
+            stops = np.r_[starts[1:], len(sorted_cells)]
+            for start, stop in zip(starts, stops):
+                self.cells[(int(sorted_cells[start, 0]), int(sorted_cells[start, 1]))] = (int(start), int(stop))
+
+    # Indexes into self.positions of the points inside the box (edges included)
+    def _in_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        first_column, last_column = int(np.floor(min_lon / GRID_DEGREES)), int(np.floor(max_lon / GRID_DEGREES))
+        first_row, last_row = int(np.floor(min_lat / GRID_DEGREES)), int(np.floor(max_lat / GRID_DEGREES))
+        # A box covering more cells than there are filled cells: checking the filled ones is cheaper
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > len(self.cells):
+            ranges = [
+                rows for (column, row), rows in self.cells.items()
+                if first_column <= column <= last_column and first_row <= row <= last_row
+            ]
+        else:
+            ranges = [
+                self.cells[(column, row)]
+                for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)
+                if (column, row) in self.cells
+            ]
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate([self.cell_order[start:stop] for start, stop in ranges])
+        longitudes = self.longitudes[candidates]
+        latitudes = self.latitudes[candidates]
+        inside = (longitudes >= min_lon) & (longitudes <= max_lon) & (latitudes >= min_lat) & (latitudes <= max_lat)
+        return np.sort(candidates[inside])
+
+    # Points matching every filter given. bbox is (min_lon, min_lat, max_lon, max_lat),
+    # start/end are Timestamps (both inclusive), flock_type is case insensitive
+    # Returns indexes into self.positions, in snapshot order
+    def select(self, bbox=None, start=None, end=None, flock_type=None):
+        selected = self._in_bbox(*bbox) if bbox else np.arange(len(self.positions))
+        rows = self.positions[selected]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None or end is not None:
+            dates = self.frame["Outbreak Date"].to_numpy(dtype="datetime64[ns]")[rows]
+            if start is not None:
+                keep &= dates >= np.datetime64(start)
+            if end is not None:
+                keep &= dates <= np.datetime64(end)
+        if flock_type:
+            flock_types = self.frame["Flock Type"]
+            matching = np.flatnonzero(flock_types.cat.categories.astype(str).str.title() == str(flock_type).title())
+            keep &= np.isin(flock_types.cat.codes.to_numpy()[rows], matching)
+        return selected[keep]
+
+    # GeoJSON FeatureCollection for the selected points, built from column lists
+    def feature_collection(self, selected):
+        rows = self.frame.iloc[self.positions[selected]]
+        dates = rows["Outbreak Date"].dt.strftime("%m-%d-%Y").fillna("").tolist()
+        columns = zip(
+            self.longitudes[selected].tolist(),
+            self.latitudes[selected].tolist(),
+            rows["State"].astype(object).astype(str).tolist(),
+            rows["County"].astype(object).astype(str).tolist(),
+            rows["Flock Size"].astype(int).tolist(),
+            rows["Flock Type"].astype(object).astype(str).tolist(),
+            dates,
+        )
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                "properties": {
+                    "state": state,
+                    "county": county,
+                    "flockSize": flock_size,
+                    "flockType": flock_type,
+                    "outbreakDate": outbreak_date,
+                },
+            }
+            for longitude, latitude, state, county, flock_size, flock_type, outbreak_date in columns
+        ]
+        return {"type": "FeatureCollection", "features": features}
+
+
+def build_point_index(frame):
+    return PointIndex(frame)
@@ -1,58 +1,51 @@
 import plotly.express as px
-import json
+import plotly.io as pio
 import os
+from functools import lru_cache
 from flu_finder_src.utils.queries import get_grouped_outbreaks_with_fips
+from flu_finder_src.utils.geo_data import (
+    load_counties_geojson, load_state_counties_geojson, find_state_feature, state_partition, geo_index, view_resolution
+)
 import pandas as pd
 
+COLOR_SCALE = [
+    [0, "#ffffff"],      # White for 0
+    [0.001, "#4a90c2"],  # Start blue for any non-zero value
+    [0.2, "#5a9bd4"],
+    [0.4, "#3a7bbf"],
+    [0.6, "#2b6ca3"],
+    [0.8, "#1f4e79"],
+    [1.0, "#0b2e59"]     # Very dark navy blue
+]
+HOVER_TEMPLATE = "County=%{customdata[0]}<br>State=%{customdata[1]}<br>Flock Size=%{z}<extra></extra>"
+# County outlines (applied to every choropleth trace once the figure is built)
+OUTLINE = {"color": "#666666", "width": 0.5}
+
 def generate_choropleth(return_fig=False, selected_state=None, selected_county=None):
     try:
         # Get grouped and cleaned outbreak data (with FIPS)
         grouped = get_grouped_outbreaks_with_fips()
-        
+
         # Get the global max value for consistent color scaling
         global_max = grouped["Flock Size"].max()
 
-        # Load GeoJSON
+        # Load GeoJSON (built from the shared geometry store, see geo_data.py), simplified for the view
+        # Zoomed to a state, only its counties are included, plus the neighbouring counties for context
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        geojson_path = os.path.join(base_dir, "data", "geojson-counties-fips.json")
-        with open(geojson_path) as f:
-            counties_geojson = json.load(f)
-
-        # Get state boundaries for zooming
-        states_path = os.path.join(base_dir, "data", "states.json")
-        with open(states_path) as f:
-            states_geojson = json.load(f)
+        resolution = view_resolution(selected_state)
+        state_fips = state_partition().state_fips(selected_state)
+        if state_fips:
+            counties_geojson = load_state_counties_geojson(state_fips)
+            neighbours_geojson = load_state_counties_geojson(state_fips, part="neighbours")
+        else:
+            counties_geojson = load_counties_geojson(resolution=resolution)
+            neighbours_geojson = None
 
         # Filter data if state/county selected
-        display_data = grouped.copy()
-        if selected_state:
-            display_data = display_data[display_data["State"].str.title() == selected_state.title()]
-            if selected_county:
-                display_data = display_data[display_data["County"].str.title() == selected_county.title()]
-
-        # Calculate center point for selected state
-        center_point = None
-        if selected_state:
-            # Find state boundaries
-            for feature in states_geojson['features']:
-                if feature['properties']['NAME'].upper() == selected_state.upper():
-                    coords = feature['geometry']['coordinates']
-                    # Handle multi-polygon states (like Hawaii)
-                    all_coords = []
-                    if feature['geometry']['type'] == 'MultiPolygon':
-                        for poly in coords:
-                            all_coords.extend(poly[0])
-                    else:
-                        all_coords = coords[0]
-                    
-                    # Calculate center point
-                    lons = [coord[0] for coord in all_coords]
-                    lats = [coord[1] for coord in all_coords]
-                    center_point = {
-                        'lon': sum(lons) / len(lons),
-                        'lat': sum(lats) / len(lats)
-                    }
-                    break
+        display_data = select_display_data(grouped, selected_state, selected_county)
+
+        # Find the selected state's bounding box and centroid, for zooming
+        state_info = geo_index().state(selected_state)
 
         # Create figure with filtered data but global scale
         fig = px.choropleth(
@@ -61,15 +54,7 @@ def generate_choropleth(return_fig=False, selected_state=None, selected_county=N
             locations='FIPS',
             featureidkey="id",
             color='Flock Size',
-            color_continuous_scale=[
-                [0, "#ffffff"],      # White for 0
-                [0.001, "#4a90c2"],  # Start blue for any non-zero value
-                [0.2, "#5a9bd4"],
-                [0.4, "#3a7bbf"],
-                [0.6, "#2b6ca3"],
-                [0.8, "#1f4e79"],
-                [1.0, "#0b2e59"]     # Very dark navy blue
-            ],
+            color_continuous_scale=COLOR_SCALE,
             range_color=[0, global_max],  # Force global scale starting at 0
             scope="usa",
             labels={'Flock Size': 'Flock Size'},
@@ -87,211 +72,54 @@ def generate_choropleth(return_fig=False, selected_state=None, selected_county=N
             selector=dict(type='choropleth')
         )
 
+        # Outline the neighbouring counties
+        if neighbours_geojson and neighbours_geojson['features']:
+            fig.add_trace(
+                context_trace(neighbours_geojson, locations=[feature['id'] for feature in neighbours_geojson['features']])
+            )
+
         # Special handling for Louisiana parishes and Alaska boroughs
-        if selected_state and selected_county:
-            is_louisiana = selected_state.upper() == 'LOUISIANA'
-            is_alaska = selected_state.upper() == 'ALASKA'
-            
-            if is_louisiana or is_alaska:
-                # Find the selected county/parish in the GeoJSON data
-                selected_feature = None
-                for feature in counties_geojson['features']:
-                    county_name = feature['properties'].get('NAME', '')
-                    state_name = feature['properties'].get('STATE', '')
-                    
-                    # Handle special cases for parish/borough names
-                    if is_louisiana:
-                        county_name = county_name.replace(' Parish', '')
-                    elif is_alaska:
-                        county_name = county_name.replace(' Borough', '').replace(' Census Area', '')
-                    
-                    if is_louisiana and county_name.upper() == selected_county.upper() and state_name == 'LA':
-                        selected_feature = feature
-                    elif is_alaska and county_name.upper() == selected_county.upper() and state_name == 'AK':
-                        selected_feature = feature
-                        break
-                
-                if selected_feature:
-                    # Add a trace specifically for the selected county/parish
-                    fig.add_trace(
-                        dict(
-                            type="choropleth",
-                            geojson={"type": "FeatureCollection", "features": [selected_feature]},
-                            locations=[selected_feature['properties']['NAME']],
-                            z=[1],  # Use 1 to make it visible
-                            showscale=False,
-                            hoverinfo='skip',
-                            marker=dict(
-                                line=dict(color='#ffffff', width=2),
-                                color='rgba(255, 255, 255, 0.1)'  # Slight highlight
-                            ),
-                            showlegend=False
-                        )
-                    )
+        selected_info = find_highlight_county(selected_state, selected_county)
+        if selected_info:
+            # Add a trace specifically for the selected county/parish
+            selected_feature = load_counties_geojson(resolution=resolution, indexes=[selected_info['index']])['features'][0]
+            fig.add_trace(
+                county_highlight_trace(
+                    {"type": "FeatureCollection", "features": [selected_feature]},
+                    locations=[selected_feature['id']],
+                )
+            )
 
         # Add state boundaries with highlight for selected state
-        if selected_state:
-            for feature in states_geojson['features']:
-                if feature['properties']['NAME'].upper() == selected_state.upper():
-                    # Add state boundary trace with thicker line for selected state
-                    fig.add_trace(
-                        dict(
-                            type="choropleth",
-                            geojson={"type": "FeatureCollection", "features": [feature]},
-                            locations=[feature['properties']['NAME']],
-                            z=[0],  # Use 0 to not affect scale
-                            zmin=0,  # Force non-negative
-                            zmax=global_max,  # Match global scale
-                            showscale=False,
-                            hoverinfo='skip',
-                            marker=dict(
-                                line=dict(color='#ffffff', width=2),
-                                opacity=0  # Make the fill completely transparent
-                            ),
-                            showlegend=False
-                        )
-                    )
-
-        # Set layout and title
-        layout_update = {
-            'margin': {"r": 0, "t": 0, "l": 0, "b": 0},
-            'paper_bgcolor': "#1e1e1e",
-            'plot_bgcolor': "#1e1e1e",
-            'geo': {
-                'bgcolor': "#1e1e1e",
-                'lakecolor': "#1e1e1e",
-                'landcolor': "#2d2d2d",
-                'subunitcolor': "#666666",
-                'showlakes': True,
-                'showland': True,
-                'showsubunits': True,
-                'showcountries': True,
-                'countrycolor': "#666666",
-                'coastlinecolor': "#666666",
-                'scope': 'usa',
-                'showframe': False,  # Remove the frame
-                'projection': {
-                    'scale': 1.0,
-                    'type': 'albers usa'
-                },
-                'domain': {
-                    'x': [0, 1],  # Use full width 
-                    'y': [0, 1]   # Use full height
-                }
-            },
-            'coloraxis': {
-                'cmin': 0,
-                'cmax': global_max,
-                'cmid': global_max/2,
-                'colorbar': dict(
-                    title=dict(
-                        text="Flock Size",
-                        font=dict(color="#ffffff")
-                    ),
-                    tickmode='array',
-                    tickvals=[0, 2_018_000, 4_036_000, 6_054_000, 8_072_000, 10_090_000, 12_108_000],
-                    ticktext=[
-                        "0",
-                        "2,018,000",
-                        "4,036,000", 
-                        "6,054,000",
-                        "8,072,000",
-                        "10,090,000",
-                        "12,108,000"
-                    ],
-                    tickfont=dict(color="#ffffff"),
-                    len=0.9,
-                    thickness=15,
-                    x=-0.07,  # Move closer to edge
-                    y=0.5,
-                    yanchor='middle'
+        state_outline = find_state_feature(selected_state, resolution=resolution)
+        if state_outline:
+            # Add state boundary trace with thicker line for selected state
+            fig.add_trace(
+                state_highlight_trace(
+                    {"type": "FeatureCollection", "features": [state_outline]},
+                    locations=[state_outline['properties']['NAME']],
+                    global_max=global_max,
                 )
-            },
-            'autosize': True,
-            'width': 1200,  # Set a wider width to ensure full horizontal expansion
-            'height': 600   # Maintain aspect ratio
-        }
+            )
 
-        # Add zoom settings if state is selected
-        if center_point:
-            state_feature = next((f for f in states_geojson['features'] 
-                               if f['properties']['NAME'].upper() == selected_state.upper()), None)
-            if state_feature:
-                coords = state_feature['geometry']['coordinates']
-                all_coords = []
-                if state_feature['geometry']['type'] == 'MultiPolygon':
-                    for poly in coords:
-                        all_coords.extend(poly[0])
-                else:
-                    all_coords = coords[0]
-                
-                lons = [coord[0] for coord in all_coords]
-                lats = [coord[1] for coord in all_coords]
-                
-                # Calculate state size
-                lon_range = max(lons) - min(lons)
-                lat_range = max(lats) - min(lats)
-                state_size = max(lon_range, lat_range)
-                
-                # Special handling for Alaska and Louisiana
-                is_alaska = selected_state.upper() == 'ALASKA'
-                is_louisiana = selected_state.upper() == 'LOUISIANA'
-                
-                # Calculate padding for view that includes entire state plus surrounding area
-                padding_factor = 0.2  # Default padding
-                
-                if is_alaska:
-                    padding_factor = 0.3  # More padding for Alaska
-                    projection_scale = 0.8  # Smaller scale for Alaska
-                elif is_louisiana:
-                    padding_factor = 0.15  # Less padding for Louisiana
-                    projection_scale = 1.2  # Larger scale for Louisiana
-                else:
-                    # For wider states, use less padding to ensure full width utilization
-                    if lon_range > lat_range * 1.5:  # Wide state
-                        padding_factor = 0.1
-                    projection_scale = 1.0
-                
-                lon_padding = lon_range * padding_factor
-                lat_padding = lat_range * padding_factor
-                
-                # Update layout with calculated bounds
-                layout_update['geo'].update({
-                    'center': {'lon': center_point['lon'], 'lat': center_point['lat']},
-                    'projection': {
-                        'scale': projection_scale,
-                        'type': 'albers usa'
-                    },
-                    'lonaxis': {
-                        'range': [min(lons) - lon_padding, max(lons) + lon_padding],
-                        'showgrid': False
-                    },
-                    'lataxis': {
-                        'range': [min(lats) - lat_padding, max(lats) + lat_padding],
-                        'showgrid': False
-                    }
-                })
+        # Set layout and title, zoomed to the state if one is selected
+        layout_update = choropleth_layout(global_max)
+        view = state_view(state_info, selected_state)
+        if view:
+            layout_update['geo'].update(view['geo'])
 
         fig.update_layout(**layout_update)
 
         # Outline each county
-        fig.update_traces(marker_line_width=0.5, marker_line_color="#666666", selector=dict(type='choropleth'))
+        fig.update_traces(marker_line_width=OUTLINE["width"], marker_line_color=OUTLINE["color"], selector=dict(type='choropleth'))
 
         # Return figure or save HTML
         if return_fig:
-            if selected_state and state_feature:
+            if view:
                 # Include bounds information in the return value
                 return {
                     'figure': fig,
-                    'bounds': {
-                        'bounds': {
-                            'min_lon': min(lons) - lon_padding,
-                            'max_lon': max(lons) + lon_padding,
-                            'min_lat': min(lats) - lat_padding,
-                            'max_lat': max(lats) + lat_padding
-                        },
-                        'center': center_point
-                    }
+                    'bounds': view['bounds']
                 }
             return {
                 'figure': fig
@@ -305,6 +133,261 @@ def generate_choropleth(return_fig=False, selected_state=None, selected_county=N
         print(f"Error in generate_choropleth: {str(e)}")
         raise
 
+# The same map without any geometry in it: the traces point at the county / state GeoJSON by URL
+# (plotly.js downloads a URL geojson once and keeps it), and the traces and layout are put together
+# as plain dicts instead of going through px.choropleth
+# geometry_urls is {"counties": url, "states": url} (at the view's resolution), plus "neighbours" when zoomed
+# to a state (then "counties" is only that state's counties). Returns {"data", "layout", "bounds"}
+def generate_choropleth_values(geometry_urls, selected_state=None, selected_county=None):
+    grouped = get_grouped_outbreaks_with_fips()
+    global_max = grouped["Flock Size"].max()
+    display_data = select_display_data(grouped, selected_state, selected_county)
+    state_info = geo_index().state(selected_state)
+
+    traces = [{
+        "type": "choropleth",
+        "geojson": geometry_urls["counties"],
+        "featureidkey": "id",
+        "locations": display_data["FIPS"].tolist(),
+        "z": display_data["Flock Size"].astype(float).tolist(),
+        "customdata": display_data[["County", "State"]].to_numpy().tolist(),
+        "hovertemplate": HOVER_TEMPLATE,
+        "coloraxis": "coloraxis",
+        "geo": "geo",
+        "name": "",
+        "zmin": 0,
+        "marker": {"line": dict(OUTLINE)},
+    }]
+
+    state_fips = state_partition().state_fips(selected_state)
+    if "neighbours" in geometry_urls and state_fips:
+        neighbours = load_state_counties_geojson(state_fips, part="neighbours", with_geometry=False)["features"]
+        if neighbours:
+            trace = context_trace(geometry_urls["neighbours"], locations=[feature["id"] for feature in neighbours])
+            trace["featureidkey"] = "id"
+            traces.append(trace)
+
+    selected_info = find_highlight_county(selected_state, selected_county)
+    if selected_info:
+        trace = county_highlight_trace(geometry_urls["counties"], locations=[selected_info["fips"]])
+        trace["featureidkey"] = "id"
+        traces.append(trace)
+    if state_info:
+        trace = state_highlight_trace(geometry_urls["states"], locations=[state_info["name"]], global_max=global_max)
+        trace["featureidkey"] = "properties.NAME"
+        traces.append(trace)
+    for trace in traces[1:]:
+        trace["marker"]["line"] = dict(OUTLINE)
+
+    layout = choropleth_layout(global_max)
+    layout["geo"] = {"domain": {"x": [0, 1], "y": [0, 1]}, "center": {}, **layout["geo"]}
+    layout["coloraxis"] = {
+        "colorbar": layout["coloraxis"]["colorbar"],
+        "colorscale": COLOR_SCALE,
+        "cmin": 0,
+        "cmax": global_max,
+        "autocolorscale": False,
+        "cmid": layout["coloraxis"]["cmid"],
+    }
+    view = state_view(state_info, selected_state)
+    if view:
+        layout["geo"].update(view["geo"])
+    layout = {"template": default_template(), **layout, "legend": {"tracegroupgap": 0}}
+    return {"data": traces, "layout": layout, "bounds": view["bounds"] if view else None}
+
+# The layout template px.choropleth would add (shared, don't modify)
+@lru_cache(maxsize=None)
+def default_template():
+    return pio.templates[pio.templates.default].to_plotly_json()
+
+# Rows for the selected state / county (name comparisons are case insensitive)
+def select_display_data(grouped, selected_state=None, selected_county=None):
+    display_data = grouped.copy()
+    if selected_state:
+        display_data = display_data[display_data["State"].str.title() == selected_state.title()]
+        if selected_county:
+            display_data = display_data[display_data["County"].str.title() == selected_county.title()]
+    return display_data
+
+# Louisiana parishes and Alaska boroughs get their own highlight trace
+# The county's geo index entry (any of its names: "Bossier", "Bossier Parish"...), or None
+def find_highlight_county(selected_state, selected_county):
+    if not (selected_state and selected_county):
+        return None
+    if selected_state.upper() not in ('LOUISIANA', 'ALASKA'):
+        return None
+    return geo_index().county(selected_state, selected_county)
+
+def county_highlight_trace(geojson, locations):
+    return dict(
+        type="choropleth",
+        geojson=geojson,
+        locations=locations,
+        z=[1],  # Use 1 to make it visible
+        colorscale=[[0, 'rgba(255, 255, 255, 0.1)'], [1, 'rgba(255, 255, 255, 0.1)']],  # Slight highlight
+        showscale=False,
+        hoverinfo='skip',
+        marker=dict(
+            line=dict(color='#ffffff', width=2)
+        ),
+        showlegend=False
+    )
+
+# Counties around a zoomed state: outlines only (transparent fill, no hover)
+def context_trace(geojson, locations):
+    return dict(
+        type="choropleth",
+        geojson=geojson,
+        locations=locations,
+        z=[0] * len(locations),
+        colorscale=[[0, "rgba(0, 0, 0, 0)"], [1, "rgba(0, 0, 0, 0)"]],
+        showscale=False,
+        hoverinfo='skip',
+        marker=dict(line=dict(OUTLINE)),
+        showlegend=False
+    )
+
+def state_highlight_trace(geojson, locations, global_max):
+    return dict(
+        type="choropleth",
+        geojson=geojson,
+        locations=locations,
+        z=[0],  # Use 0 to not affect scale
+        zmin=0,  # Force non-negative
+        zmax=global_max,  # Match global scale
+        showscale=False,
+        hoverinfo='skip',
+        marker=dict(
+            line=dict(color='#ffffff', width=2),
+            opacity=0  # Make the fill completely transparent
+        ),
+        showlegend=False
+    )
+
+# Layout shared by both map versions (a new dict each call)
+def choropleth_layout(global_max):
+    return {
+        'margin': {"r": 0, "t": 0, "l": 0, "b": 0},
+        'paper_bgcolor': "#1e1e1e",
+        'plot_bgcolor': "#1e1e1e",
+        'geo': {
+            'bgcolor': "#1e1e1e",
+            'lakecolor': "#1e1e1e",
+            'landcolor': "#2d2d2d",
+            'subunitcolor': "#666666",
+            'showlakes': True,
+            'showland': True,
+            'showsubunits': True,
+            'showcountries': True,
+            'countrycolor': "#666666",
+            'coastlinecolor': "#666666",
+            'scope': 'usa',
+            'showframe': False,  # Remove the frame
+            'projection': {
+                'scale': 1.0,
+                'type': 'albers usa'
+            },
+            'domain': {
+                'x': [0, 1],  # Use full width
+                'y': [0, 1]   # Use full height
+            }
+        },
+        'coloraxis': {
+            'cmin': 0,
+            'cmax': global_max,
+            'cmid': global_max/2,
+            'colorbar': dict(
+                title=dict(
+                    text="Flock Size",
+                    font=dict(color="#ffffff")
+                ),
+                tickmode='array',
+                tickvals=[0, 2_018_000, 4_036_000, 6_054_000, 8_072_000, 10_090_000, 12_108_000],
+                ticktext=[
+                    "0",
+                    "2,018,000",
+                    "4,036,000",
+                    "6,054,000",
+                    "8,072,000",
+                    "10,090,000",
+                    "12,108,000"
+                ],
+                tickfont=dict(color="#ffffff"),
+                len=0.9,
+                thickness=15,
+                x=-0.07,  # Move closer to edge
+                y=0.5,
+                yanchor='middle'
+            )
+        },
+        'autosize': True,
+        'width': 1200,  # Set a wider width to ensure full horizontal expansion
+        'height': 600   # Maintain aspect ratio
+    }
+
+# Zoom settings for a selected state: {"geo": layout geo update, "bounds": bounds for the response}, or None
+# state_info is the state's geo index entry (bounding box and centroid)
+def state_view(state_info, selected_state):
+    if not state_info:
+        return None
+    bbox = state_info['bbox']
+
+    # Center on the state's (area-weighted) centroid
+    center_point = dict(state_info['centroid'])
+
+    # Calculate state size
+    lon_range = bbox['max_lon'] - bbox['min_lon']
+    lat_range = bbox['max_lat'] - bbox['min_lat']
+
+    # Special handling for Alaska and Louisiana
+    is_alaska = selected_state.upper() == 'ALASKA'
+    is_louisiana = selected_state.upper() == 'LOUISIANA'
+
+    # Calculate padding for view that includes entire state plus surrounding area
+    padding_factor = 0.2  # Default padding
+
+    if is_alaska:
+        padding_factor = 0.3  # More padding for Alaska
+        projection_scale = 0.8  # Smaller scale for Alaska
+    elif is_louisiana:
+        padding_factor = 0.15  # Less padding for Louisiana
+        projection_scale = 1.2  # Larger scale for Louisiana
+    else:
+        # For wider states, use less padding to ensure full width utilization
+        if lon_range > lat_range * 1.5:  # Wide state
+            padding_factor = 0.1
+        projection_scale = 1.0
+
+    lon_padding = lon_range * padding_factor
+    lat_padding = lat_range * padding_factor
+
+    return {
+        'geo': {
+            'center': {'lon': center_point['lon'], 'lat': center_point['lat']},
+            'projection': {
+                'scale': projection_scale,
+                'type': 'albers usa'
+            },
+            'lonaxis': {
+                'range': [bbox['min_lon'] - lon_padding, bbox['max_lon'] + lon_padding],
+                'showgrid': False
+            },
+            'lataxis': {
+                'range': [bbox['min_lat'] - lat_padding, bbox['max_lat'] + lat_padding],
+                'showgrid': False
+            }
+        },
+        'bounds': {
+            'bounds': {
+                'min_lon': bbox['min_lon'] - lon_padding,
+                'max_lon': bbox['max_lon'] + lon_padding,
+                'min_lat': bbox['min_lat'] - lat_padding,
+                'max_lat': bbox['max_lat'] + lat_padding
+            },
+            'center': center_point
+        }
+    }
+
 if __name__ == "__main__":
     print("👋 map_visualizer.py is being run directly")
-    generate_choropleth()
\ No newline at end of file
+    generate_choropleth()
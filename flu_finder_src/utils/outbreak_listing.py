@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Newest-first pages of outbreaks straight from the date-sorted snapshot
+# Rows are listed in reverse snapshot order (newest date first; same-day rows in reverse source-row order,
+# which is the CDC file's order for the local / postgres snapshots but not for an incrementally patched
+# sheet, see ingest_diff.plan_sheet_patch) and a page is found by position, not by scanning: the rows
+# that can match (the whole snapshot, or one state's / county's rows from the LocationIndex) are a sorted
+# array of snapshot positions, the date window is two binary searches inside it, and the cursor is the
+# position of the last row sent
+# (keyset pagination: the next page is "positions below the cursor")
+# Only the Flock Type filter has to look at rows, and it only looks at as many as it needs to fill the page
+# Rows without a date aren't listed: the snapshot keeps them after every dated row (see schema.normalize_frame),
+# so each candidate slice is cut at its first NaT (one more binary search)
+
+LISTING_FIELDS = ["Outbreak Date", "State", "County", "Flock Size", "Flock Type"]
+# Rows checked at a time when a Flock Type filter has to skip non-matching rows
+SCAN_CHUNK = 512
+
+
+class OutbreakListing:
+    def __init__(self, frame, location_index):
+        self.frame = frame
+        self.location_index = location_index
+        self.positions = np.arange(len(frame))
+        self.dates = frame["Outbreak Date"].to_numpy(dtype="datetime64[ns]")
+        self.state_dates = location_index.by_state["Outbreak Date"].to_numpy(dtype="datetime64[ns]")
+        self.county_dates = location_index.by_county["Outbreak Date"].to_numpy(dtype="datetime64[ns]")
+        self.type_codes = frame["Flock Type"].cat.codes.to_numpy()
+        self.type_names = frame["Flock Type"].cat.categories.astype(str).str.title()
+
+    # Sorted snapshot positions that can match the location filter, with their dates (dated rows only)
+    def _candidates(self, state=None, county=None):
+        if county:
+            start, stop = self.location_index.county_ranges.get((state, county), (0, 0))
+            candidates, dates = self.location_index.county_positions[start:stop], self.county_dates[start:stop]
+        elif state:
+            start, stop = self.location_index.state_ranges.get(state, (0, 0))
+            candidates, dates = self.location_index.state_positions[start:stop], self.state_dates[start:stop]
+        else:
+            candidates, dates = self.positions, self.dates
+        dated = int(np.searchsorted(dates, np.datetime64("NaT"), side="left"))
+        return candidates[:dated], dates[:dated]
+
+    # Row positions of one page, newest first, plus the total number of matches when include_total is set
+    # start/end are Timestamps (or None), before is a cursor position (or None), offset skips rows
+    def page(self, limit, before=None, offset=0, state=None, county=None, flock_type=None,
+             start=None, end=None, include_total=False):
+        candidates, dates = self._candidates(state, county)
+        first = int(np.searchsorted(dates, np.datetime64(start), side="left")) if start is not None else 0
+        last = int(np.searchsorted(dates, np.datetime64(end), side="right")) if end is not None else len(dates)
+        window_stop = max(first, last)
+        if before is not None:
+            last = min(last, int(np.searchsorted(candidates, before, side="left")))
+
+        keep_codes = None
+        if flock_type:
+            keep_codes = np.flatnonzero(self.type_names == str(flock_type).title())
+
+        total = None
+        if include_total:
+            window = candidates[first:window_stop]
+            total = len(window) if keep_codes is None else int(np.isin(self.type_codes[window], keep_codes).sum())
+
+        # One extra row tells whether there is a next page
+        wanted = offset + limit + 1
+        if keep_codes is None:
+            stop = max(first, last)
+            picked = candidates[max(first, stop - wanted):stop][::-1]
+        else:
+            chunks = []
+            found = 0
+            stop = last
+            while stop > first and found < wanted:
+                chunk_start = max(first, stop - max(SCAN_CHUNK, wanted - found))
+                chunk = candidates[chunk_start:stop][::-1]
+                chunk = chunk[np.isin(self.type_codes[chunk], keep_codes)]
+                chunks.append(chunk)
+                found += len(chunk)
+                stop = chunk_start
+            picked = np.concatenate(chunks)[:wanted] if chunks else np.zeros(0, dtype=np.int64)
+
+        picked = picked[offset:]
+        has_more = len(picked) > limit
+        picked = picked[:limit]
+        next_before = int(picked[-1]) if has_more else None
+        return picked, next_before, total
+
+    # Column -> list of values for the given rows (same formats as /api/cdc/data)
+    def columns(self, positions, fields=LISTING_FIELDS):
+        rows = self.frame.iloc[positions]
+        out = {}
+        for field in fields:
+            values = rows[field]
+            if field == "Outbreak Date":
+                out[field] = values.dt.strftime("%m/%d/%Y").fillna("").tolist()
+            elif field == "Flock Size":
+                out[field] = values.fillna(0).astype(int).tolist()
+            else:
+                out[field] = values.astype(object).fillna("Unknown").tolist()
+        return out
+
+
+def build_outbreak_listing(frame, location_index):
+    return OutbreakListing(frame, location_index)
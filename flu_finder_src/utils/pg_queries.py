@@ -0,0 +1,78 @@
+import os
+import sys
+import pandas as pd
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from ..db import get_connection, replace_outbreaks, OUTBREAK_COLUMNS
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from db import get_connection, replace_outbreaks, OUTBREAK_COLUMNS
+
+# SQL versions of the queries.py aggregations. The database does the filtering and summing,
+# so only the answer (not the whole dataset) comes back to Python
+
+GROUPABLE_COLUMNS = {
+    "State": "state",
+    "County": "county",
+    "Flock Type": "flock_type",
+    "Outbreak Date": "outbreak_date",
+}
+
+
+# Builds the WHERE clause shared by every query. Values are always passed as parameters
+def _where(state=None, county=None, start=None, end=None):
+    clauses = []
+    params = []
+    if state:
+        clauses.append("state = %s")
+        params.append(state)
+    if county:
+        clauses.append("county = %s")
+        params.append(county)
+    if start:
+        clauses.append("outbreak_date >= %s")
+        params.append(pd.to_datetime(start).date())
+    if end:
+        clauses.append("outbreak_date <= %s")
+        params.append(pd.to_datetime(end).date())
+    sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return sql, params
+
+
+# Outbreak count and total flock size in one round trip
+def outbreak_totals(state=None, county=None, start=None, end=None):
+    where, params = _where(state, county, start, end)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*), COALESCE(SUM(flock_size), 0) FROM outbreaks{where}", params)
+            outbreaks, flock_size = cur.fetchone()
+    return {"outbreaks": int(outbreaks), "flock_size": int(flock_size)}
+
+
+# Outbreak count and flock size per group (ex: by=["State"] or by=["State", "County"])
+def grouped_totals(by, state=None, county=None, start=None, end=None):
+    group_sql = ", ".join(GROUPABLE_COLUMNS[col] for col in by)
+    where, params = _where(state, county, start, end)
+    query = (
+        f"SELECT {group_sql}, COUNT(*), COALESCE(SUM(flock_size), 0) FROM outbreaks{where} "
+        f"GROUP BY {group_sql} ORDER BY {group_sql}"
+    )
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    return pd.DataFrame(rows, columns=list(by) + ["Outbreak Count", "Flock Size"])
+
+
+# Rows matching the filters, in the same shape get_db() returns
+# "Index" is the row's index in the ingested dataset (stored by replace_outbreaks)
+def select_outbreaks(state=None, county=None, start=None, end=None):
+    where, params = _where(state, county, start, end)
+    columns = ", ".join(OUTBREAK_COLUMNS)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT source_index, {columns} FROM outbreaks{where} ORDER BY source_index, id", params)
+            rows = cur.fetchall()
+    df = pd.DataFrame(rows, columns=["Index"] + list(OUTBREAK_COLUMNS.values())).set_index("Index")
+    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"])
+    df["Flock Size"] = df["Flock Size"].astype("int64")
+    return df
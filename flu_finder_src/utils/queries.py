@@ -1,58 +1,78 @@
+import os
+import threading
 import pandas as pd
 from tabulate import tabulate
 from datetime import timedelta
+from functools import lru_cache
+from cachetools import LRUCache
 try: # Render requires a relative path, GitHub Actions requires an absolute path
     from .data_fetcher import get_reversed_dataframe
     from .db_methods import *
+    from .schema import map_categories, is_date_sorted
+    from .snapshot_index import build_location_index, RangeTotals, location_totals, fips_totals
+    from .aggregate_cube import build_aggregate_cube, DIMENSIONS, MONTH
+    from .outbreak_listing import build_outbreak_listing, LISTING_FIELDS
+    from .ingest_diff import row_identity
+    from .map_points import build_point_index
+    from .fips_resolver import get_fips_resolver, COUNTY_PATCHES, patch_county
 except ImportError:
     from data_fetcher import get_reversed_dataframe
     from db_methods import *
+    from schema import map_categories, is_date_sorted
+    from snapshot_index import build_location_index, RangeTotals, location_totals, fips_totals
+    from aggregate_cube import build_aggregate_cube, DIMENSIONS, MONTH
+    from outbreak_listing import build_outbreak_listing, LISTING_FIELDS
+    from ingest_diff import row_identity
+    from map_points import build_point_index
+    from fips_resolver import get_fips_resolver, COUNTY_PATCHES, patch_county
 
 #------------------------------------------- National Methods -----------------------------------------#
 
 # Get total outbreaks in the US
+# With the postgres backend the counting and summing is done in SQL instead of pandas
 def total_outbreaks_national():
-    df = get_db()
-    return len(df)
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals()["outbreaks"]
+    return get_range_totals().national()["outbreaks"]
 
 # Get total flock size in the US
 def total_flock_size_national():
-    df = get_db()
-    return df["Flock Size"].sum()
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals()["flock_size"]
+    return get_range_totals().national()["flock_size"]
 
-# Get summary for the US
-def get_national_summary():
-    total_outbreaks = total_outbreaks_national()
-    total_flock_size = total_flock_size_national()
-    return {
-        "outbreaks": f"{total_outbreaks:,}",
-        "flock_size": f"{total_flock_size:,}"
-    }
+# Get summary for the US (optionally between start and end, both inclusive)
+def get_national_summary(start=None, end=None):
+    if DB_BACKEND == "postgres":
+        return format_summary(**get_pg_queries().outbreak_totals(start=start, end=end))
+    return format_summary(**get_range_totals().national(*date_bounds(start, end)))
 
 #------------------------------------------- State Methods -----------------------------------------#
 # Filter cases by State
 def filter_by_state(state: str):
-    df = get_db()
-    return df[df["State"] == state]
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().select_outbreaks(state=state)
+    return get_location_index().state_rows(state)
 
 # Get total outbreaks by State
 def total_outbreaks_by_state(state: str):
-    return len(filter_by_state(state))
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals(state=state)["outbreaks"]
+    return get_range_totals().state(state)["outbreaks"]
 
 # Get total flock size by State
 def total_flock_size_by_state(state: str):
-    return filter_by_state(state)["Flock Size"].sum()
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals(state=state)["flock_size"]
+    return get_range_totals().state(state)["flock_size"]
 
-# Get summary for State
-def get_state_summary(state: str):
-    outbreaks = total_outbreaks_by_state(state)
-    flock_size = total_flock_size_by_state(state)
-    return {
-        "outbreaks": f"{outbreaks:,}",
-        "flock_size": f"{flock_size:,}"
-    }
+# Get summary for State (optionally between start and end, both inclusive)
+def get_state_summary(state: str, start=None, end=None):
+    if DB_BACKEND == "postgres":
+        return format_summary(**get_pg_queries().outbreak_totals(state=state, start=start, end=end))
+    return format_summary(**get_range_totals().state(state, *date_bounds(start, end)))
 
-# Sort counties in a state by newest to oldest
+# Sort counties in a state by newest to oldest (each county's row is its latest outbreak)
 def get_r_sorted_counties(state: str):
     s = get_reversed_dataframe(filter_by_state(state))
     s = s.drop_duplicates(subset='County', keep='first')
@@ -61,61 +81,205 @@ def get_r_sorted_counties(state: str):
 #------------------------------------------- County Methods -----------------------------------------#
 # Filter cases by County
 def filter_by_county(county: str, state: str):
-    df = get_db()
-    return df[(df["County"] == county) & (df["State"] == state)]
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().select_outbreaks(state=state, county=county)
+    return get_location_index().county_rows(county, state)
 
 # Get total outbreaks by County
 def total_outbreaks_by_county(county: str, state: str):
-    return len(filter_by_county(county, state))
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals(state=state, county=county)["outbreaks"]
+    return get_range_totals().county(county, state)["outbreaks"]
 
 # Get total flock size by County
 def total_flock_size_by_county(county: str, state: str):
-    return filter_by_county(county, state)["Flock Size"].sum()
+    if DB_BACKEND == "postgres":
+        return get_pg_queries().outbreak_totals(state=state, county=county)["flock_size"]
+    return get_range_totals().county(county, state)["flock_size"]
+
+# Get summary for County (optionally between start and end, both inclusive)
+def get_county_summary(county: str, state: str, start=None, end=None):
+    if DB_BACKEND == "postgres":
+        return format_summary(**get_pg_queries().outbreak_totals(state=state, county=county, start=start, end=end))
+    return format_summary(**get_range_totals().county(county, state, *date_bounds(start, end)))
+
+#------------------------------------------- Batch Methods -----------------------------------------#
+SUMMARY_SCOPES = ["national", "states", "counties"]
+# How many distinct start/end windows keep their summaries in memory (per process)
+SUMMARY_WINDOW_CACHE_SIZE = int(os.getenv("SUMMARY_WINDOW_CACHE_SIZE", "64"))
+_summary_windows = LRUCache(maxsize=SUMMARY_WINDOW_CACHE_SIZE)
+_summary_windows_lock = threading.Lock()
+
+# Summaries for the nation, every state and every county (optionally between start and end, both inclusive)
+# scope picks which of "national", "states", "counties" to return (default: all three)
+# Computed in one grouped pass and kept until the data version changes
+def get_all_summaries(start=None, end=None, scope=None):
+    if DB_BACKEND == "postgres":
+        summaries = format_location_totals(pg_location_totals(start, end))
+    elif not start and not end:
+        snapshot = get_snapshot()
+        summaries = snapshot.derived("summaries", lambda frame: format_location_totals(get_location_totals(snapshot)))
+    else:
+        summaries = get_window_summaries(start, end)
+    return {name: summaries[name] for name in (scope or SUMMARY_SCOPES)}
+
+# Outbreak count and flock size (as ints) for the nation, every state and every county (built once per data version)
+def get_location_totals(snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot.derived("location_totals", location_totals)
+
+# Outbreak count and flock size (as ints) per county FIPS code (built once per data version)
+def get_fips_totals(snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot.derived("fips_totals", fips_totals)
+
+# Date-bounded summaries, cached per (data version, start, end)
+def get_window_summaries(start=None, end=None):
+    snapshot = get_snapshot()
+    lower, upper = date_bounds(start, end)
+    key = (snapshot.version, lower, upper)
+    with _summary_windows_lock:
+        summaries = _summary_windows.get(key)
+    if summaries is None:
+        dates = snapshot.frame["Outbreak Date"]
+        first = dates.searchsorted(lower, side="left") if lower is not None else 0
+        last = dates.searchsorted(upper, side="right") if upper is not None else len(dates)
+        summaries = format_location_totals(location_totals(snapshot.frame.iloc[first:max(first, last)]))
+        with _summary_windows_lock:
+            _summary_windows[key] = summaries
+    return summaries
+
+# Same shape as snapshot_index.location_totals, from three SQL aggregations
+def pg_location_totals(start=None, end=None):
+    pg = get_pg_queries()
+    result = {"national": pg.outbreak_totals(start=start, end=end), "states": {}, "counties": {}}
+    for state, outbreaks, flock_size in pg.grouped_totals(["State"], start=start, end=end).itertuples(index=False):
+        if state is not None:
+            result["states"][state] = {"outbreaks": int(outbreaks), "flock_size": int(flock_size)}
+    for state, county, outbreaks, flock_size in pg.grouped_totals(["State", "County"], start=start, end=end).itertuples(index=False):
+        if state is not None and county is not None:
+            result["counties"].setdefault(state, {})[county] = {"outbreaks": int(outbreaks), "flock_size": int(flock_size)}
+    return result
+
+def format_location_totals(totals):
+    return {
+        "national": format_summary(**totals["national"]),
+        "states": {state: format_summary(**values) for state, values in totals["states"].items()},
+        "counties": {
+            state: {county: format_summary(**values) for county, values in counties.items()}
+            for state, counties in totals["counties"].items()
+        },
+    }
 
-# Get summary for County
-def get_county_summary(county: str, state: str):
-    outbreaks = total_outbreaks_by_county(county, state)
-    flock_size = total_flock_size_by_county(county, state)
+#------------------------------------------- General Methods -----------------------------------------#
+# State/County index for the current snapshot (built once per data version)
+# Filters return read-only slices of the shared snapshot; copy before changing values in place
+def get_location_index():
+    return get_snapshot().derived("location_index", build_location_index)
+
+# Running totals over the date axis for the nation, every state and every county (built once per data version)
+def get_range_totals():
+    snapshot = get_snapshot()
+    return snapshot.derived(
+        "range_totals",
+        lambda frame: RangeTotals(frame, snapshot.derived("location_index", build_location_index))
+    )
+
+# Outbreaks with usable coordinates, on a grid for bounding-box lookups (built once per data version)
+def get_point_index():
+    return get_snapshot().derived("point_index", build_point_index)
+
+# Stable id of every snapshot row, in row order (see ingest_diff.row_ids)
+def get_row_ids(snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot.derived("row_identity", row_identity)[0]
+
+# Row ids added / changed / removed since a client's data version, or None when the change log
+# doesn't reach back that far (the client has to download everything again)
+def get_changes_since(version, snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot_cache.change_log.since(version, snapshot.version, get_row_ids(snapshot))
+
+# Newest-first, keyset-paginated outbreak listing (built once per data version)
+# Pass the snapshot in when the caller also needs its version (ex: for cursors)
+def get_outbreak_listing(snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot.derived(
+        "outbreak_listing",
+        lambda frame: build_outbreak_listing(frame, snapshot.derived("location_index", build_location_index))
+    )
+
+# Outbreak counts and flock size totals per (State, County, Flock Type, month) (built once per data version)
+def get_aggregate_cube():
+    return get_snapshot().derived("aggregate_cube", build_aggregate_cube)
+
+# Any roll-up of the aggregate cube, ex: get_aggregates(["Flock Type"], state="Georgia", start_month="2024-01")
+def get_aggregates(by, **filters):
+    return get_aggregate_cube().rollup(by, **filters)
+
+# Summary format shared by the national, state and county endpoints
+def format_summary(outbreaks, flock_size):
     return {
         "outbreaks": f"{outbreaks:,}",
         "flock_size": f"{flock_size:,}"
     }
 
-#------------------------------------------- General Methods -----------------------------------------#
+# Turns a user-supplied date ("2024", "01/19/2025", "2025-01-01") into a Timestamp
+# Each distinct string is parsed once. Dates past what pandas can store (ex: "3000") are clamped
+@lru_cache(maxsize=512)
+def parse_date_bound(value):
+    bound = pd.Timestamp(value)
+    if bound > pd.Timestamp.max:
+        return pd.Timestamp.max
+    if bound < pd.Timestamp.min:
+        return pd.Timestamp.min
+    return bound.as_unit("ns")
+
+# Parsed (start, end) for the summary methods. Unlike get_time_frame_from_df, a missing bound means open-ended
+def date_bounds(start=None, end=None):
+    return (parse_date_bound(start) if start else None, parse_date_bound(end) if end else None)
+
 # Returns subset of main dataframe based on Outbreak Date range
 # Note: to get the full frame, either use the filter_by_ method, or set the start year to 1000 and the end year to 4000
 # You also don't need specific dates. You can just input the year (ex: start=2025, end=2026 returns from start of 2025)
+# Snapshot frames (and slices of them) are sorted by date (no-date rows last), so the bounds are found
+# by binary search and the result is a slice of df, not a copy. Rows without a date are never in a range
 def get_time_frame_from_df(df, start=None, end=None):
     # Skip unnecessary code if no range passed
     if not start and not end:
         return df
-    df = df.copy()
-    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"])
-    mask = (df['Outbreak Date'] >= (start or "2022")) & (df['Outbreak Date'] <= (end or "3000"))
+    # Snapshot frames already hold datetimes (see schema.py); only convert frames from elsewhere
+    if not pd.api.types.is_datetime64_any_dtype(df["Outbreak Date"]):
+        df = df.copy()
+        df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"])
+    lower = parse_date_bound(start or "2022")
+    upper = parse_date_bound(end or "3000")
+    dates = df["Outbreak Date"]
+    if is_date_sorted(dates):
+        first = dates.searchsorted(lower, side="left")
+        last = dates.searchsorted(upper, side="right")
+        return df.iloc[first:last]
+    mask = (dates >= lower) & (dates <= upper)
     return df.loc[mask]
 
 # Returns subset by selected scope and date range (national, state, or county). Case insensitive
 def get_time_frame_by_location(start=None, end=None, *args):
-    # Skip unnecessary code if no range passed
-    if not start and not end:
-        return df
-    df = get_db()
     # National
     if len(args) < 1:
-        return get_time_frame_from_df(df, start, end)
+        frame = get_db()
     # State
     elif len(args) == 1:
-        state = filter_by_state(args[0].title())
-        return get_time_frame_from_df(state, start, end)
+        frame = filter_by_state(args[0].title())
     # County
-    elif len(args) > 1:
-        county = filter_by_county(args[1].title(), args[0].title())
-        return get_time_frame_from_df(county, start, end)
+    else:
+        frame = filter_by_county(args[1].title(), args[0].title())
+    return get_time_frame_from_df(frame, start, end)
 
 # Should be used in graph visualizations (sums flock sizes that occur on the same date)
 def sum_by_date(df):
-    df = df.copy()
-    df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"], errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(df["Outbreak Date"]):
+        df = df.copy()
+        df["Outbreak Date"] = pd.to_datetime(df["Outbreak Date"], errors='coerce')
     grouped = df.groupby("Outbreak Date", as_index=False)["Flock Size"].sum()
     return grouped
 
@@ -131,70 +295,33 @@ def get_recurrences(df, start, weeks=4):
 def get_cleaned_db():
     df = get_db()
 
-    # Normalize casing
-    df["State"] = df["State"].str.title()
-    df["County"] = df["County"].str.title()
-
-    # Patch known mismatches
-    patch_counties = {
-        "Jefferson Davis": "Jeff Davis",
-        "Bossier": "Bossier Parish",
-        "Matanuska Susitna": "Matanuska-Susitna",
-        "Saint Croix": "St. Croix",
-        "Bethel": "Bethel Census Area",
-        "Calcasieu": "Calcasieu Parish",
-        "De Soto": "Desoto",
-        "Culebra": "Culebra Municipio"
-    }
-
-    df["County"] = df["County"].replace(patch_counties)
+    # Normalize casing (on the category names, not every row)
+    df["State"] = map_categories(df["State"], lambda names: names.str.title())
+    df["County"] = map_categories(df["County"], lambda names: names.str.title())
+
+    # Patch known mismatches (see fips_resolver.py)
+    # (by state: only the few patched pairs are touched)
+    for state, county in COUNTY_PATCHES:
+        rows = (df["State"] == state) & (df["County"] == county)
+        if rows.any():
+            name = patch_county(state, county)
+            if name not in df["County"].cat.categories:
+                df["County"] = df["County"].cat.add_categories([name])
+            df.loc[rows, "County"] = name
     return df
 
-# Load FIPS (local) and cross-reference
-def get_grouped_outbreaks_with_fips():
-    df = get_cleaned_db()
-
-    # Load FIPS
-    import os
-    import us
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    fips_path = os.path.join(base_dir, "data", "fips_lookup.csv")
-
-    fips = pd.read_csv(fips_path, dtype=str).rename(columns={
-        "fips": "FIPS",
-        "name": "County",
-        "state": "State"
-    })
-
-    fips["County"] = fips["County"].str.replace(" County", "", regex=False).str.strip().str.title()
-    fips["State"] = fips["State"].astype(str)
-    fips["State"] = fips["State"].apply(lambda abbr: us.states.lookup(abbr).name if us.states.lookup(abbr) else abbr)
-    fips["FIPS"] = fips["FIPS"].str.zfill(5)
-
-    # Add patched rows
-    alt_fips_rows = pd.DataFrame([
-        {"FIPS": "22053", "County": "Jeff Davis", "State": "Louisiana"},
-        {"FIPS": "02020", "County": "Matanuska-Susitna", "State": "Alaska"},
-        {"FIPS": "72049", "County": "Culebra Municipio", "State": "Puerto Rico"},
-    ])
-    alt_fips_rows["County"] = alt_fips_rows["County"].str.title()
-    alt_fips_rows["State"] = alt_fips_rows["State"].str.title()
-    alt_fips_rows["FIPS"] = alt_fips_rows["FIPS"].str.zfill(5)
-
-    fips = pd.concat([fips, alt_fips_rows], ignore_index=True)
-
-    # Merge with outbreak data
-    df = df.merge(fips, on=["State", "County"], how="left")
-
-    # Group outbreaks
-    outbreaks = df.groupby(["FIPS", "State", "County"], as_index=False)["Flock Size"].sum()
-    all_counties = fips[["FIPS", "State", "County"]].drop_duplicates()
-    grouped = all_counties.merge(outbreaks, on=["FIPS", "State", "County"], how="left")
-    grouped["Flock Size"] = grouped["Flock Size"].fillna(0)
-
-    # Filter out placeholder FIPS
-    grouped = grouped[grouped["FIPS"].str.match(r"^\d{5}$") & (grouped["FIPS"] != "00000")]
-
+# Flock size per county for the choropleth: every county in the FIPS table (FIPS, State, County)
+# with the summed Flock Size of its outbreaks (0 for none)
+# Outbreak rows carry their FIPS code from the snapshot load (see fips_resolver.py), so this is one
+# group-by per data version and no name matching at all
+def get_grouped_outbreaks_with_fips(snapshot=None):
+    snapshot = snapshot or get_snapshot()
+    return snapshot.derived("fips_grouped", group_outbreaks_by_fips)
+
+def group_outbreaks_by_fips(frame):
+    sums = frame.groupby("FIPS", observed=True)["Flock Size"].sum()
+    grouped = get_fips_resolver().counties.copy()
+    grouped["Flock Size"] = grouped["FIPS"].map(sums).astype(float).fillna(0)
     return grouped
 
 
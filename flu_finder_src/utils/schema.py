@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Canonical column types for the outbreak data. Applied once when a snapshot is loaded,
+# so the queries and charts never have to re-parse dates or re-clean names per request
+#   Outbreak Date -> datetime64
+#   State, County, Flock Type -> Categorical with whitespace-trimmed names (each name stored once)
+#   Flock Size -> int32 (largest CDC flock is a few million birds)
+# Rows are kept in Outbreak Date order, rows without a date (NaT) last
+
+DATE_COLUMN = "Outbreak Date"
+CATEGORY_COLUMNS = ["State", "County", "Flock Type"]
+SIZE_COLUMN = "Flock Size"
+SIZE_DTYPE = "int32"
+# Added to snapshots after normalizing (see fips_resolver.py); not part of the outbreak records
+DERIVED_COLUMNS = ["FIPS"]
+
+
+def _parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    # Sheet and CDC dates are MM-DD-YYYY; anything else falls back to pandas' own parsing
+    parsed = pd.to_datetime(values, format="%m-%d-%Y", errors="coerce")
+    if parsed.isna().sum() > values.isna().sum():
+        parsed = pd.to_datetime(values, format="mixed", errors="coerce")
+    return parsed
+
+
+# Relabels a Categorical through func (applied to the categories only, not every row)
+# Categories that end up with the same label are merged
+def map_categories(series, func):
+    categories = series.cat.categories
+    new_categories = pd.Index(func(categories), dtype=object)
+    if new_categories.is_unique:
+        return series.cat.rename_categories(new_categories)
+    merged = new_categories.unique()
+    remap = np.append(merged.get_indexer(new_categories), -1)
+    codes = remap[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=merged), index=series.index, name=series.name)
+
+
+def _to_category(values):
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object).where(values.notna(), None)
+        values = values.map(lambda v: v if v is None else str(v)).astype("category")
+    return map_categories(values, lambda categories: categories.astype(str).str.strip())
+
+
+# True when dates are in order with any missing dates at the end (the order normalize_frame keeps)
+# Binary search (pandas / numpy searchsorted) works on such a column: NaT sorts after every date
+def is_date_sorted(dates):
+    missing = int(dates.isna().sum())
+    dated = len(dates) - missing
+    return dates.iloc[:dated].is_monotonic_increasing and (missing == 0 or bool(dates.iloc[dated:].isna().all()))
+
+
+# Returns a new frame with the canonical types. Columns that are already right are reused, not copied
+def normalize_frame(df):
+    df = df.copy(deep=False)
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = _parse_dates(df[DATE_COLUMN])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = _to_category(df[col])
+    if SIZE_COLUMN in df.columns and df[SIZE_COLUMN].dtype != SIZE_DTYPE:
+        df[SIZE_COLUMN] = pd.to_numeric(df[SIZE_COLUMN], errors="coerce").fillna(0).astype(SIZE_DTYPE)
+    df.index.name = "Index"
+    # Keep snapshots in date order so date ranges can be found by binary search.
+    # The ingest already writes rows in date order, so this is normally a no-op check
+    # Rows without a date stay in the frame (they still count in the totals), after every dated row
+    if DATE_COLUMN in df.columns and not is_date_sorted(df[DATE_COLUMN]):
+        df = df.sort_values(DATE_COLUMN, kind="stable", na_position="last")
+    return df
+
+
+# Same as series.str.title() == value.title(), but the title-casing runs over the
+# categories (a few hundred names) instead of every row
+def title_equals(series, value):
+    value = str(value).title()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        matching_codes = np.flatnonzero(series.cat.categories.astype(str).str.title() == value)
+        return pd.Series(np.isin(series.cat.codes.to_numpy(), matching_codes), index=series.index)
+    return series.str.title() == value
+
+
+# Plain-object copy of the frame for JSON output (dates as MM-DD-YYYY text, like the sheet stores them)
+def to_records_frame(df):
+    out = df.drop(columns=[col for col in DERIVED_COLUMNS if col in df.columns])
+    if DATE_COLUMN in out.columns and pd.api.types.is_datetime64_any_dtype(out[DATE_COLUMN]):
+        out[DATE_COLUMN] = out[DATE_COLUMN].dt.strftime("%m-%d-%Y")
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(object)
+    return out
@@ -0,0 +1,181 @@
+import os
+import time
+import hashlib
+import threading
+import pandas as pd
+try: # Render requires a relative path, GitHub Actions requires an absolute path
+    from .schema import normalize_frame
+    from .ingest_diff import row_identity, diff_identities
+    from .change_log import ChangeLog
+    from .fips_resolver import add_fips_column, get_fips_resolver
+except ImportError:
+    from schema import normalize_frame
+    from ingest_diff import row_identity, diff_identities
+    from change_log import ChangeLog
+    from fips_resolver import add_fips_column, get_fips_resolver
+
+# How long a loaded snapshot is served before the source is checked again (seconds)
+SNAPSHOT_TTL_SECONDS = float(os.getenv("SNAPSHOT_TTL_SECONDS", "600"))
+
+
+# One loaded copy of the outbreak data. The frame is never modified after it is built:
+# a refresh builds a brand new Snapshot and swaps it in
+# version is the data's token (see SnapshotCache): the same in every worker that holds the same data
+# modified_at is when the data was ingested if the loader knows it (frame.attrs["ingested_at"],
+# ex: the local snapshot manifest), otherwise when this process first loaded it
+class Snapshot:
+    def __init__(self, frame, version, content_hash, loaded_at, load_seconds, ttl=SNAPSHOT_TTL_SECONDS):
+        self.frame = frame
+        self.version = version
+        self.content_hash = content_hash
+        self.loaded_at = loaded_at
+        self.modified_at = frame.attrs.get("ingested_at", loaded_at)
+        self.load_seconds = load_seconds
+        self.expires_at = time.monotonic() + ttl
+        self._derived = {}
+        # Re-entrant so one builder can ask for another derived structure (ex: totals built on the location index)
+        self._derived_lock = threading.RLock()
+
+    def is_expired(self):
+        return time.monotonic() >= self.expires_at
+
+    # Indexes and aggregates built from this snapshot's frame. builder(frame) runs once per
+    # snapshot; later calls (from any thread) get the same object back
+    def derived(self, name, builder):
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = builder(self.frame)
+                    self._derived[name] = value
+        return value
+
+
+# Hashes the frame contents so a reload that returns the same rows keeps its version
+def hash_frame(df):
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+# Data version token for a content hash (what clients send back in ?since=)
+def data_token(content_hash):
+    return content_hash[:16]
+
+
+# Process-wide cache in front of a loader function (ex: the Google Sheets download)
+# Threads always see a complete snapshot: the new one is fully built before it replaces the old one
+# A snapshot's version is a token derived from the data, never a per-process counter, so clients can send it
+# to any worker: a loader that knows the token stamped at ingest (frame.attrs["data_version"], ex: the local
+# snapshot manifest) sets it, otherwise it is the start of the frame's content hash (same rows, same token)
+# Every version change is recorded in change_log (row ids added/changed/removed), see change_log.py
+class SnapshotCache:
+    def __init__(self, loader, ttl=None):
+        self._loader = loader
+        self._ttl = SNAPSHOT_TTL_SECONDS if ttl is None else ttl
+        self._current = None
+        self.change_log = ChangeLog()
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "last_load_seconds": 0.0,
+            "total_load_seconds": 0.0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def get(self):
+        snapshot = self._current
+        if snapshot is not None and not snapshot.is_expired():
+            self._count("hits")
+            return snapshot
+
+        # Another thread is already refreshing; keep serving the old snapshot instead of waiting
+        if snapshot is not None and not self._load_lock.acquire(blocking=False):
+            self._count("stale_hits")
+            return snapshot
+        if snapshot is None:
+            self._load_lock.acquire()
+
+        try:
+            # Someone may have finished loading while we waited for the lock
+            current = self._current
+            if current is not None and not current.is_expired():
+                self._count("hits")
+                return current
+            self._count("misses")
+            return self._reload(current)
+        finally:
+            self._load_lock.release()
+
+    def _reload(self, previous):
+        started = time.perf_counter()
+        try:
+            raw = self._loader()
+            # Not kept on the frame: pandas copies attrs into every frame derived from it
+            saved_changes = raw.attrs.pop("changes", None)
+            saved_changes_since = raw.attrs.pop("changes_since", None)
+            # County FIPS codes are resolved here, once per load (see fips_resolver.py)
+            frame = add_fips_column(normalize_frame(raw))
+        except Exception:
+            self._count("load_errors")
+            # A failed refresh shouldn't take the site down if we still have data
+            if previous is not None:
+                previous.expires_at = time.monotonic() + self._ttl
+                return previous
+            raise
+        content_hash = hash_frame(frame)
+        load_seconds = time.perf_counter() - started
+
+        with self._stats_lock:
+            self._stats["loads"] += 1
+            self._stats["last_load_seconds"] = load_seconds
+            self._stats["total_load_seconds"] += load_seconds
+
+        # Same data as before: keep the version, just push the expiry back
+        if previous is not None and previous.content_hash == content_hash:
+            previous.expires_at = time.monotonic() + self._ttl
+            return previous
+
+        version = str(frame.attrs.get("data_version") or data_token(content_hash))
+        snapshot = Snapshot(frame, version, content_hash, time.time(), load_seconds, self._ttl)
+        self._record_changes(previous, snapshot, saved_changes, saved_changes_since)
+        self._current = snapshot
+        return snapshot
+
+    def _record_changes(self, previous, snapshot, saved_changes=None, saved_changes_since=None):
+        if previous is not None:
+            changes = diff_identities(
+                previous.derived("row_identity", row_identity),
+                snapshot.derived("row_identity", row_identity)
+            )
+            self.change_log.record(previous.version, snapshot.version, changes)
+        # First load in this process: the ingest may have left the diff from the version before
+        elif saved_changes is not None and saved_changes_since:
+            self.change_log.record(str(saved_changes_since), snapshot.version, saved_changes)
+
+    # Forces the next get() to go back to the source (ex: right after update_db())
+    def invalidate(self):
+        snapshot = self._current
+        if snapshot is not None:
+            snapshot.expires_at = 0
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        snapshot = self._current
+        stats["version"] = snapshot.version if snapshot else None
+        stats["rows"] = len(snapshot.frame) if snapshot else 0
+        stats["ttl_seconds"] = self._ttl
+        stats["change_log"] = self.change_log.stats()
+        stats["fips"] = get_fips_resolver().stats()
+        return stats
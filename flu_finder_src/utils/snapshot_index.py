@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# Indexes built once per snapshot (see Snapshot.derived)
+
+
+def _code_ranges(codes):
+    # codes must be sorted. Returns {code: (start, stop)} for every code that appears
+    if len(codes) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(codes)]
+    return {int(codes[start]): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+
+# State -> County -> date index
+# Keeps two re-ordered copies of the snapshot:
+#   by_state:  rows grouped by State, in snapshot (date) order inside each state
+#   by_county: rows grouped by (State, County), in snapshot (date) order inside each county
+# plus the row range each state / county occupies, so a location filter is a slice (a view, not a copy)
+# state_positions / county_positions hold the snapshot row position of every by_state / by_county row
+# The sorts are stable, so a slice has exactly the rows (and row order) a boolean mask over the
+# snapshot would give
+class LocationIndex:
+    def __init__(self, frame):
+        state_codes = frame["State"].cat.codes.to_numpy()
+        county_codes = frame["County"].cat.codes.to_numpy()
+        states = frame["State"].cat.categories
+        counties = frame["County"].cat.categories
+
+        state_order = np.argsort(state_codes, kind="stable")
+        self.by_state = frame.iloc[state_order]
+        self.state_positions = state_order
+        self.state_ranges = {
+            states[code]: rows
+            for code, rows in _code_ranges(state_codes[state_order]).items() if code >= 0
+        }
+
+        county_order = np.lexsort((county_codes, state_codes))
+        self.by_county = frame.iloc[county_order]
+        self.county_positions = county_order
+        sorted_states = state_codes[county_order]
+        sorted_counties = county_codes[county_order]
+        # One combined code per (state, county) pair so the pairs can be split the same way as states
+        pair_codes = sorted_states.astype(np.int64) * (len(counties) + 1) + sorted_counties
+        self.county_ranges = {}
+        for pair_code, (start, stop) in _code_ranges(pair_codes).items():
+            state_code, county_code = sorted_states[start], sorted_counties[start]
+            if state_code >= 0 and county_code >= 0:
+                self.county_ranges[(states[state_code], counties[county_code])] = (start, stop)
+
+    def state_rows(self, state):
+        start, stop = self.state_ranges.get(state, (0, 0))
+        return self.by_state.iloc[start:stop]
+
+    def county_rows(self, county, state):
+        start, stop = self.county_ranges.get((state, county), (0, 0))
+        return self.by_county.iloc[start:stop]
+
+
+def build_location_index(frame):
+    return LocationIndex(frame)
+
+
+# Date-bounded outbreak counts and flock size totals in two binary searches
+# For the nation and for every state/county slice of the LocationIndex it keeps the (sorted) dates
+# and a running total of Flock Size, so any [start, end] window is:
+#   outbreaks  = last - first
+#   flock size = running_total[last] - running_total[first]
+# where first/last are found with searchsorted inside that location's row range
+class RangeTotals:
+    def __init__(self, frame, location_index):
+        self.location_index = location_index
+        self._national = self._prefix_arrays(frame)
+        self._by_state = self._prefix_arrays(location_index.by_state)
+        self._by_county = self._prefix_arrays(location_index.by_county)
+
+    @staticmethod
+    def _prefix_arrays(frame):
+        dates = frame["Outbreak Date"].to_numpy(dtype="datetime64[ns]")
+        running_total = np.zeros(len(frame) + 1, dtype=np.int64)
+        np.cumsum(frame["Flock Size"].to_numpy(dtype=np.int64), out=running_total[1:])
+        return dates, running_total
+
+    @staticmethod
+    def _totals(arrays, start_row, stop_row, start=None, end=None):
+        dates, running_total = arrays
+        first, last = start_row, stop_row
+        if start is not None:
+            first = start_row + int(np.searchsorted(dates[start_row:stop_row], np.datetime64(start), side="left"))
+        if end is not None:
+            last = start_row + int(np.searchsorted(dates[start_row:stop_row], np.datetime64(end), side="right"))
+        last = max(first, last)
+        return {"outbreaks": last - first, "flock_size": int(running_total[last] - running_total[first])}
+
+    # start/end are Timestamps (or None for an open end), both inclusive
+    def national(self, start=None, end=None):
+        return self._totals(self._national, 0, len(self._national[0]), start, end)
+
+    def state(self, state, start=None, end=None):
+        start_row, stop_row = self.location_index.state_ranges.get(state, (0, 0))
+        return self._totals(self._by_state, start_row, stop_row, start, end)
+
+    def county(self, county, state, start=None, end=None):
+        start_row, stop_row = self.location_index.county_ranges.get((state, county), (0, 0))
+        return self._totals(self._by_county, start_row, stop_row, start, end)
+
+
+# Outbreak count and flock size for the nation, every state and every county in one grouped pass
+# Returns raw ints: {"national": {...}, "states": {state: {...}}, "counties": {state: {county: {...}}}}
+# Rows with no County still count towards their state (and rows with no State towards the nation)
+def location_totals(frame):
+    states = frame["State"].cat.categories
+    counties = frame["County"].cat.categories
+    cells = pd.DataFrame({
+        "state": frame["State"].cat.codes.to_numpy(),
+        "county": frame["County"].cat.codes.to_numpy(),
+        "flock_size": frame["Flock Size"].to_numpy(dtype=np.int64),
+    })
+    by_county = cells.groupby(["state", "county"], sort=True)["flock_size"].agg(["size", "sum"]).reset_index()
+    by_state = by_county.groupby("state", sort=True)[["size", "sum"]].sum().reset_index()
+
+    def totals(outbreaks, flock_size):
+        return {"outbreaks": int(outbreaks), "flock_size": int(flock_size)}
+
+    result = {
+        "national": totals(len(cells), by_county["sum"].sum()),
+        "states": {},
+        "counties": {},
+    }
+    for state_code, outbreaks, flock_size in by_state.itertuples(index=False):
+        if state_code >= 0:
+            result["states"][states[state_code]] = totals(outbreaks, flock_size)
+    for state_code, county_code, outbreaks, flock_size in by_county.itertuples(index=False):
+        if state_code >= 0 and county_code >= 0:
+            result["counties"].setdefault(states[state_code], {})[counties[county_code]] = totals(outbreaks, flock_size)
+    return result
+
+
+# Outbreak count and flock size per county FIPS code (the snapshot's FIPS column, see fips_resolver.py)
+# Returns raw ints: {fips: {"outbreaks", "flock_size"}}. Rows without a FIPS code aren't counted
+def fips_totals(frame):
+    if "FIPS" not in frame.columns:
+        return {}
+    cells = pd.DataFrame({
+        "fips": frame["FIPS"].astype(object).to_numpy(),
+        "flock_size": frame["Flock Size"].to_numpy(dtype=np.int64),
+    }).dropna(subset=["fips"])
+    by_fips = cells.groupby("fips", sort=True)["flock_size"].agg(["size", "sum"])
+    return {
+        str(fips): {"outbreaks": int(outbreaks), "flock_size": int(flock_size)}
+        for fips, outbreaks, flock_size in by_fips.itertuples()
+    }
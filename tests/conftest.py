@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+import pandas as pd
+import pytest
+
+# Tests import the app modules the way app.py does (flu_finder_src.utils...), from the repo root
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# Built geometry / snapshot files go to a throwaway folder instead of flu_finder_src/data
+os.environ.setdefault("GEOMETRY_STORE_DIR", tempfile.mkdtemp(prefix="flu_finder_geometry_"))
+os.environ.setdefault("SNAPSHOT_DIR", tempfile.mkdtemp(prefix="flu_finder_snapshot_"))
+# The app reads that local snapshot, never Google Sheets
+os.environ.setdefault("DB_BACKEND", "local")
+
+
+# Flask test client over a small local snapshot (the app loads the data when it is imported)
+@pytest.fixture(scope="session")
+def app_client():
+    from flu_finder_src.utils.local_snapshot import write_snapshot, SNAPSHOT_DIR
+
+    write_snapshot(pd.DataFrame({
+        "Outbreak Date": pd.to_datetime(["2024-01-02", "2024-02-01"]),
+        "State": ["Iowa", "Louisiana"],
+        "County": ["Buena Vista", "Bossier"],
+        "Flock Type": ["Commercial Table Egg Layer", "WOAH Poultry"],
+        "Flock Size": [1000, 40],
+    }), SNAPSHOT_DIR)
+    from flu_finder_src.app import app
+    return app.test_client()
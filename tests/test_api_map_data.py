@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.mark.parametrize("bbox", ["nan,40,-90,45", "-100,-inf,-90,45", "-100,40,1e999,45", "-100,40,-90", "a,b,c,d"])
+def test_bad_bbox_is_a_400(app_client, bbox):
+    response = app_client.get(f"/api/map/data?bbox={bbox}")
+
+    assert response.status_code == 400
+    assert "bbox" in response.get_json()["error"]
+
+
+def test_finite_bbox_is_accepted(app_client):
+    assert app_client.get("/api/map/data?bbox=-100,40,-90,45").status_code == 200
@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from flu_finder_src.utils.data_fetcher import fetch_cdc_dataframe
+
+CSV_V1 = (
+    "Outbreak Date,State,County,Flock Type,Flock Size\n"
+    "03-05-2024,Iowa,Sac,WOAH Poultry,7\n"
+    "01-02-2024,Iowa,Buena Vista,Commercial Table Egg Layer,1000\n"
+)
+CSV_V2 = CSV_V1 + "02-01-2024,Louisiana,Bossier,WOAH Poultry,40\n"
+
+
+# Stand-in for the CDC server: serves the current body with an ETag and honours If-None-Match
+class CdcStandIn(BaseHTTPRequestHandler):
+    body = CSV_V1
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        body = self.body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", "Tue, 05 Mar 2024 00:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cdc_server():
+    CdcStandIn.body, CdcStandIn.etag, CdcStandIn.requests = CSV_V1, '"v1"', []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CdcStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/commercial-backyard-flocks.csv"
+    server.shutdown()
+    server.server_close()
+
+
+def test_first_fetch_downloads_and_sorts_by_date(cdc_server):
+    df, stats = fetch_cdc_dataframe(cdc_server)
+
+    assert stats["status"] == 200
+    assert stats["etag"] == '"v1"'
+    assert stats["last_modified"] == "Tue, 05 Mar 2024 00:00:00 GMT"
+    assert stats["bytes"] == len(CSV_V1)
+    assert df["County"].tolist() == ["Buena Vista", "Sac"]
+    assert df.index.name == "Index"
+
+
+def test_unchanged_file_is_not_downloaded(cdc_server):
+    _, stats = fetch_cdc_dataframe(cdc_server)
+    df, stats = fetch_cdc_dataframe(cdc_server, validators={"etag": stats["etag"], "last_modified": stats["last_modified"]})
+
+    assert df is None
+    assert stats["status"] == 304
+    assert stats["not_modified"]
+    assert stats["etag"] == '"v1"'
+    assert CdcStandIn.requests[-1]["If-None-Match"] == '"v1"'
+    assert CdcStandIn.requests[-1]["If-Modified-Since"] == "Tue, 05 Mar 2024 00:00:00 GMT"
+
+
+def test_changed_etag_downloads_the_new_file(cdc_server):
+    _, stats = fetch_cdc_dataframe(cdc_server)
+    CdcStandIn.body, CdcStandIn.etag = CSV_V2, '"v2"'
+    df, stats = fetch_cdc_dataframe(cdc_server, validators={"etag": stats["etag"]})
+
+    assert stats["status"] == 200
+    assert not stats["not_modified"]
+    assert stats["etag"] == '"v2"'
+    assert df["County"].tolist() == ["Buena Vista", "Bossier", "Sac"]
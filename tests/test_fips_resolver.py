@@ -0,0 +1,25 @@
+from flu_finder_src.utils.fips_resolver import get_fips_resolver
+
+
+def test_patches_only_apply_in_their_state():
+    resolver = get_fips_resolver()
+
+    assert resolver.resolve("Louisiana", "Jefferson Davis") == ("22053", "exact")
+    assert resolver.resolve("Mississippi", "Jefferson Davis")[0] == "28065"
+    assert resolver.resolve("Louisiana", "De Soto") == ("22031", "exact")
+    assert resolver.resolve("Mississippi", "De Soto") == ("28033", "exact")
+
+
+def test_matanuska_susitna_resolves_to_its_own_code():
+    resolver = get_fips_resolver()
+
+    assert resolver.resolve("Alaska", "Matanuska Susitna") == ("02170", "exact")
+    assert resolver.resolve("Alaska", "Matanuska-Susitna") == ("02170", "exact")
+    # Anchorage keeps its own code
+    assert "02020" not in set(resolver.counties.loc[resolver.counties["County"] == "Matanuska-Susitna", "FIPS"])
+
+
+def test_counties_have_one_row_per_fips():
+    counties = get_fips_resolver().counties
+
+    assert counties["FIPS"].is_unique
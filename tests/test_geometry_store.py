@@ -0,0 +1,47 @@
+import json
+import multiprocessing
+from flu_finder_src.utils.geometry_store import open_store, MANIFEST_NAME
+
+
+def write_source(path, count):
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"NAME": f"County {i}", "AREA": float(i)},
+            "geometry": {"type": "Polygon", "coordinates": [[[i, 0], [i + 1, 0], [i + 1, 1], [i, 0]]]},
+            "id": f"{i:05d}",
+        }
+        for i in range(count)
+    ]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+
+def open_and_count(source, directory):
+    store = open_store(source, directory)
+    return len(store), store.column("NAME")[-1]
+
+
+def test_workers_opening_at_once_share_one_store(tmp_path):
+    source, directory = tmp_path / "counties.json", tmp_path / "stores" / "counties"
+    write_source(source, 50)
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        results = pool.starmap(open_and_count, [(source, directory)] * 8)
+
+    assert results == [(50, "County 49")] * 8
+    assert sorted(path.name for path in directory.parent.iterdir()) == [".counties.lock", "counties"]
+
+
+def test_rebuild_keeps_open_stores_readable(tmp_path):
+    source, directory = tmp_path / "counties.json", tmp_path / "stores" / "counties"
+    write_source(source, 3)
+    old = open_store(source, directory)
+
+    write_source(source, 5)
+    new = open_store(source, directory)
+
+    assert len(new) == 5
+    assert json.loads((directory / MANIFEST_NAME).read_text())["features"] == 5
+    # The old store's arrays are still mapped after the swap
+    assert len(old) == 3
+    assert old.geometry(2)["coordinates"][0][0] == [2.0, 0.0]
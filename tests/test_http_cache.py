@@ -0,0 +1,24 @@
+import pytest
+from flu_finder_src.utils import db_methods, geo_data
+
+
+@pytest.fixture
+def client(app_client, monkeypatch):
+    def no_snapshot():
+        raise AssertionError("loaded the outbreak snapshot")
+
+    monkeypatch.setattr(db_methods, "get_snapshot", no_snapshot)
+    return app_client
+
+
+def test_geometry_is_served_without_loading_the_snapshot(client):
+    url = f"/api/map/geometry/states.{geo_data.geometry_asset('states')[1]}.json"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert "Last-Modified" not in response.headers
+
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": "Thu, 01 Jan 2015 00:00:00 GMT"}).status_code == 304
@@ -0,0 +1,99 @@
+from flu_finder_src.utils.ingest_diff import plan_sheet_patch
+
+HEADER = ["Outbreak Date", "State", "County", "Flock Type", "Flock Size"]
+
+
+def sheet(*rows):
+    return [HEADER] + [list(row) for row in rows]
+
+
+def row(day, county, size=10):
+    return [f"01-{day:02d}-2024", "Iowa", county, "WOAH Poultry", size]
+
+
+# What the sheet holds after patch_sheet sends the plan (same three calls, on a list of rows)
+def apply_plan(old_values, plan):
+    changed_blocks, rows_to_append, first_row_to_clear = plan
+    values = [list(values) for values in old_values]
+    for first_row, rows in changed_blocks:
+        for offset, values_row in enumerate(rows):
+            values[first_row - 1 + offset] = list(values_row)
+    values += [list(values_row) for values_row in rows_to_append]
+    if first_row_to_clear:
+        values = values[:first_row_to_clear - 1]
+    return values
+
+
+def sorted_rows(values):
+    return sorted(tuple(str(value) for value in values_row) for values_row in values[1:])
+
+
+def written_rows(plan):
+    changed_blocks, rows_to_append, _ = plan
+    return sum(len(rows) for _, rows in changed_blocks) + len(rows_to_append)
+
+
+def test_backfilled_row_is_only_appended():
+    old = sheet(*[row(day, f"County {day}") for day in range(1, 21)])
+    new = sheet(*([row(day, f"County {day}") for day in range(1, 6)] + [row(5, "Backfilled")]
+                  + [row(day, f"County {day}") for day in range(6, 21)]))
+
+    plan = plan_sheet_patch(old, new)
+
+    assert plan == ([], [row(5, "Backfilled")], None)
+    assert sorted_rows(apply_plan(old, plan)) == sorted_rows(new)
+
+
+def test_edited_row_is_rewritten_in_place():
+    old = sheet(row(1, "Sac"), row(2, "Ida"), row(3, "Clay"))
+    new = sheet(row(1, "Sac"), row(2, "Ida", size=99), row(3, "Clay"))
+
+    plan = plan_sheet_patch(old, new)
+
+    assert plan == ([(3, [row(2, "Ida", size=99)])], [], None)
+
+
+def test_unchanged_values_in_other_types_are_not_rewritten():
+    old = sheet(["01-02-2024", "Iowa", "Sac", "WOAH Poultry", "10"])
+    new = sheet(["01-02-2024", "Iowa", "Sac", "WOAH Poultry", 10])
+
+    assert plan_sheet_patch(old, new) == ([], [], None)
+
+
+def test_removed_rows_are_filled_and_the_tail_cleared():
+    old = sheet(*[row(day, f"County {day}") for day in range(1, 11)])
+    # Two rows gone, one new one
+    new = sheet(*[row(day, f"County {day}") for day in range(1, 11) if day not in (3, 7)] + [row(11, "New")])
+
+    plan = plan_sheet_patch(old, new)
+    result = apply_plan(old, plan)
+
+    assert len(result) == len(new)
+    assert sorted_rows(result) == sorted_rows(new)
+    # The new row goes into one hole, the last row moves into the other
+    assert written_rows(plan) == 2
+    assert plan[2] == len(new) + 1
+
+
+def test_duplicate_rows_are_kept():
+    old = sheet(row(1, "Sac"), row(1, "Sac"))
+    new = sheet(row(1, "Sac"), row(1, "Sac"), row(1, "Sac"))
+
+    plan = plan_sheet_patch(old, new)
+
+    assert plan == ([], [row(1, "Sac")], None)
+
+
+def test_reversed_frame_sorts_on_dates_not_sheet_position():
+    import pandas as pd
+    from flu_finder_src.utils.data_fetcher import get_reversed_dataframe
+
+    old = sheet(row(1, "Sac"), row(3, "Clay"))
+    new = sheet(row(1, "Sac"), row(2, "Backfilled"), row(3, "Clay"))
+    patched = apply_plan(old, plan_sheet_patch(old, new))
+    # The backfilled row is appended after a newer one
+    assert [values[2] for values in patched[1:]] == ["Sac", "Clay", "Backfilled"]
+    df = pd.DataFrame(patched[1:] + [["", "Iowa", "Undated", "WOAH Poultry", 1]], columns=HEADER)
+    df.index.name = "Index"
+
+    assert get_reversed_dataframe(df)["County"].tolist() == ["Clay", "Backfilled", "Sac", "Undated"]
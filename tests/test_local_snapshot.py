@@ -0,0 +1,56 @@
+import pandas as pd
+from flu_finder_src.utils.local_snapshot import write_snapshot, open_snapshot, read_changes
+from flu_finder_src.utils.schema import normalize_frame
+from flu_finder_src.utils.snapshot_cache import SnapshotCache, hash_frame
+from flu_finder_src.utils.snapshot_index import location_totals
+
+
+# Same shape as the ingest frame (data_fetcher.fetch_cdc_dataframe): parsed dates, in date order
+def ingest_frame():
+    df = pd.DataFrame({
+        "Outbreak Date": pd.to_datetime(["2024-01-02", "2024-01-09", "2024-02-01", "2024-03-05"]),
+        "State": ["Iowa", "Iowa", "Louisiana", "Iowa"],
+        "County": ["Buena Vista", "Sac", "Bossier", "Sac"],
+        "Flock Type": ["Commercial Table Egg Layer", "WOAH Poultry", "WOAH Poultry", None],
+        "Flock Size": [1000, 7, 40, 5],
+    })
+    df.index.name = "Index"
+    return df
+
+
+def test_snapshot_round_trip_matches_the_fresh_frame(tmp_path):
+    manifest = write_snapshot(ingest_frame(), tmp_path)
+    df, opened_manifest = open_snapshot(tmp_path)
+
+    assert opened_manifest == manifest
+    assert manifest["row_count"] == 4
+    assert (manifest["date_min"], manifest["date_max"]) == ("2024-01-02", "2024-03-05")
+    assert manifest["content_hash"] == hash_frame(ingest_frame())
+    # Columns are memory maps / categoricals over the stored codes, not copies
+    assert isinstance(df["State"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(normalize_frame(df), normalize_frame(ingest_frame()), check_categorical=False)
+
+
+def test_cached_snapshot_gives_the_same_totals_as_a_fresh_frame(tmp_path):
+    write_snapshot(ingest_frame(), tmp_path)
+    cache = SnapshotCache(lambda: open_snapshot(tmp_path)[0])
+
+    snapshot = cache.get()
+    cached = snapshot.derived("location_totals", location_totals)
+
+    assert cached == location_totals(normalize_frame(ingest_frame()))
+    assert cached["national"] == {"outbreaks": 4, "flock_size": 1052}
+    assert cached["counties"]["Iowa"]["Sac"] == {"outbreaks": 2, "flock_size": 12}
+    # Built once per data version
+    assert snapshot.derived("location_totals", location_totals) is cached
+
+
+def test_new_version_keeps_the_ingest_diff(tmp_path):
+    first = write_snapshot(ingest_frame(), tmp_path)
+    changes = {"added": ["row-a"], "changed": [], "removed": []}
+    second = write_snapshot(ingest_frame().iloc[:3], tmp_path, changes=changes)
+
+    assert second["version"] == first["version"] + 1
+    assert second["previous_content_hash"] == first["content_hash"]
+    assert read_changes(second, tmp_path) == changes
+    assert len(open_snapshot(tmp_path)[0]) == 3
@@ -0,0 +1,60 @@
+import pandas as pd
+from flu_finder_src.utils.schema import normalize_frame
+from flu_finder_src.utils.fips_resolver import add_fips_column
+from flu_finder_src.utils.snapshot_index import fips_totals
+from flu_finder_src.utils import geo_data
+
+
+def outbreak_frame():
+    return pd.DataFrame({
+        "Outbreak Date": ["01-02-2024", "01-09-2024", "02-01-2024", "03-05-2024"],
+        "State": ["Iowa", "Iowa", "Louisiana", "Iowa"],
+        "County": ["Buena Vista", "buena vista ", "Bossier", "Sac"],
+        "Flock Size": [1000, 250, 40, 7],
+        "Flock Type": ["Commercial Table Egg Layer"] * 4,
+    })
+
+
+def test_fips_totals_groups_rows_by_county_fips():
+    totals = fips_totals(add_fips_column(normalize_frame(outbreak_frame())))
+
+    assert totals["19021"] == {"outbreaks": 2, "flock_size": 1250}  # Buena Vista, IA
+    assert totals["22015"] == {"outbreaks": 1, "flock_size": 40}    # Bossier Parish, LA
+    assert totals["19161"] == {"outbreaks": 1, "flock_size": 7}     # Sac, IA
+
+
+def test_enrich_county_features_joins_on_feature_id():
+    totals = fips_totals(add_fips_column(normalize_frame(outbreak_frame())))
+    enriched = geo_data.enrich_county_features(geo_data.load_counties_geojson(with_geometry=False), totals)
+    by_id = {feature["id"]: feature["properties"] for feature in enriched["features"]}
+
+    assert by_id["19021"]["outbreak_count"] == 2
+    assert by_id["19021"]["flock_size"] == 1250
+    assert by_id["22015"]["outbreak_count"] == 1
+    # Counties without outbreaks are still there, with zeros
+    assert by_id["01001"]["outbreak_count"] == 0
+    assert by_id["01001"]["flock_size"] == 0
+    assert sum(properties["outbreak_count"] for properties in by_id.values()) == 4
+
+
+def test_cached_enrichment_matches_a_row_by_row_join():
+    from flu_finder_src.utils.fips_resolver import get_fips_resolver
+    from flu_finder_src.utils.snapshot_cache import SnapshotCache
+
+    snapshot = SnapshotCache(outbreak_frame).get()
+    cached = snapshot.derived("fips_totals", fips_totals)
+    enriched = geo_data.enrich_county_features(geo_data.load_counties_geojson(with_geometry=False), cached)
+
+    # Reference: resolve each row on its own and add it to its county
+    resolver = get_fips_resolver()
+    expected = {}
+    frame = outbreak_frame()
+    for state, county, flock_size in zip(frame["State"], frame["County"], frame["Flock Size"]):
+        fips, _ = resolver.resolve(state.strip(), county.strip())
+        totals = expected.setdefault(fips, {"outbreak_count": 0, "flock_size": 0})
+        totals["outbreak_count"] += 1
+        totals["flock_size"] += flock_size
+    for feature in enriched["features"]:
+        assert {key: feature["properties"][key] for key in ("outbreak_count", "flock_size")} == \
+            expected.get(feature["id"], {"outbreak_count": 0, "flock_size": 0})
+    assert snapshot.derived("fips_totals", fips_totals) is cached
@@ -0,0 +1,42 @@
+import pandas as pd
+from flu_finder_src.utils.schema import normalize_frame
+from flu_finder_src.utils.snapshot_index import build_location_index
+from flu_finder_src.utils.outbreak_listing import build_outbreak_listing
+
+
+def listing():
+    frame = normalize_frame(pd.DataFrame({
+        "Outbreak Date": ["01-02-2024", "", "01-09-2024", "02-01-2024", "03-05-2024"],
+        "State": ["Iowa", "Iowa", "Iowa", "Louisiana", "Iowa"],
+        "County": ["Buena Vista", "Sac", "Sac", "Bossier", "Sac"],
+        "Flock Type": ["WOAH Poultry"] * 5,
+        "Flock Size": [1000, 5, 7, 40, 12],
+    }))
+    return frame, build_outbreak_listing(frame, build_location_index(frame))
+
+
+def all_sizes(listing, **filters):
+    sizes, before = [], None
+    while True:
+        positions, before, _ = listing.page(2, before=before, **filters)
+        sizes += listing.frame["Flock Size"].iloc[positions].tolist()
+        if before is None:
+            return sizes
+
+
+def test_first_page_starts_with_the_newest_dated_row():
+    frame, outbreaks = listing()
+
+    positions, _, total = outbreaks.page(2, include_total=True)
+
+    assert frame["Flock Size"].iloc[positions].tolist() == [12, 40]
+    assert total == 4
+
+
+def test_rows_without_a_date_are_not_listed():
+    _, outbreaks = listing()
+
+    assert all_sizes(outbreaks) == [12, 40, 7, 1000]
+    assert all_sizes(outbreaks, state="Iowa") == [12, 7, 1000]
+    assert all_sizes(outbreaks, state="Iowa", county="Sac") == [12, 7]
+    assert all_sizes(outbreaks, state="Iowa", county="Sac", flock_type="woah poultry") == [12, 7]
@@ -0,0 +1,69 @@
+import os
+import pandas as pd
+import pytest
+
+# Runs against a real Postgres database, which the tests empty and refill:
+# TEST_DATABASE_URL=postgresql://localhost/flu_finder_test python -m pytest tests/test_pg_queries.py
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    from flu_finder_src import db
+    from flu_finder_src.utils import pg_queries
+
+    db.close_pool()
+    monkeypatch.setattr(db, "DATABASE_URL", TEST_DATABASE_URL)
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS outbreaks")
+            cur.execute(db.SCHEMA_SQL)
+    yield pg_queries
+    db.close_pool()
+
+
+def outbreak_frame():
+    df = pd.DataFrame({
+        "Outbreak Date": pd.to_datetime(["2024-01-02", None, "2024-02-01", "2024-03-05"]),
+        "State": ["Iowa", "Iowa", " Louisiana", "Iowa"],
+        "County": ["Buena Vista", "Sac", "Bossier ", "Sac"],
+        "Flock Type": ["Commercial Table Egg Layer", "WOAH Poultry", None, "WOAH Poultry"],
+        "Flock Size": [1000, 5, 40, 7],
+    })
+    df.index.name = "Index"
+    return df
+
+
+def test_replace_outbreaks_round_trip(pg):
+    assert pg.replace_outbreaks(outbreak_frame()) == 3
+
+    rows = pg.select_outbreaks()
+    # Row 1 has no date and isn't loaded; the others keep their index in the dataset
+    assert rows.index.tolist() == [0, 2, 3]
+    assert rows.index.name == "Index"
+    assert rows.loc[2, "State"] == "Louisiana"
+    assert rows.loc[2, "County"] == "Bossier"
+    assert rows.loc[2, "Flock Type"] == ""
+    assert rows.loc[3, "Outbreak Date"] == pd.Timestamp("2024-03-05")
+    assert rows["Flock Size"].dtype == "int64"
+    assert pg.select_outbreaks(state="Iowa", county="Sac").index.tolist() == [3]
+
+
+def test_replace_outbreaks_replaces_previous_rows(pg):
+    pg.replace_outbreaks(outbreak_frame())
+    pg.replace_outbreaks(outbreak_frame().iloc[:1])
+
+    assert pg.select_outbreaks().index.tolist() == [0]
+
+
+def test_totals(pg):
+    pg.replace_outbreaks(outbreak_frame())
+
+    assert pg.outbreak_totals() == {"outbreaks": 3, "flock_size": 1047}
+    assert pg.outbreak_totals(state="Iowa", start="2024-02-01") == {"outbreaks": 1, "flock_size": 7}
+    grouped = pg.grouped_totals(["State"])
+    assert grouped.to_dict("records") == [
+        {"State": "Iowa", "Outbreak Count": 2, "Flock Size": 1007},
+        {"State": "Louisiana", "Outbreak Count": 1, "Flock Size": 40},
+    ]
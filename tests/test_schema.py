@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from flu_finder_src.utils.schema import normalize_frame, is_date_sorted
+from flu_finder_src.utils.queries import get_time_frame_from_df
+
+
+def frame_with_missing_date():
+    return pd.DataFrame({
+        "Outbreak Date": ["01-09-2024", "01-02-2024", "", "03-05-2024"],
+        "State": ["Iowa", "Iowa", "Iowa", "Louisiana"],
+        "County": ["Sac", "Buena Vista", "Sac", "Bossier"],
+        "Flock Type": ["WOAH Poultry"] * 4,
+        "Flock Size": [7, 1000, 5, 40],
+    })
+
+
+def test_rows_without_a_date_are_kept_last():
+    df = normalize_frame(frame_with_missing_date())
+
+    assert df["Flock Size"].tolist() == [1000, 7, 40, 5]
+    assert df["Outbreak Date"].isna().tolist() == [False, False, False, True]
+    assert is_date_sorted(df["Outbreak Date"])
+    assert not is_date_sorted(pd.Series(pd.to_datetime(["2024-01-02", None, "2024-01-09"])))
+
+
+def test_date_range_with_missing_dates_uses_binary_search():
+    df = normalize_frame(frame_with_missing_date())
+
+    window = get_time_frame_from_df(df, "2024-01-05", "2024-12-31")
+    # A slice of the frame (the searchsorted path), not a boolean-mask copy
+    assert window["Flock Size"].tolist() == [7, 40]
+    assert window.index.tolist() == df.index[1:3].tolist()
+    assert np.shares_memory(window["Flock Size"].to_numpy(), df["Flock Size"].to_numpy())
+    assert get_time_frame_from_df(df, "2024-04-01")["Flock Size"].tolist() == []
+    assert get_time_frame_from_df(df, end="2024-01-02")["Flock Size"].tolist() == [1000]
+
+
+def test_normalize_frame_types():
+    df = normalize_frame(pd.DataFrame({
+        "Outbreak Date": ["01-02-2024", "2024-01-09"],
+        "State": ["Iowa ", "Iowa"],
+        "County": [" Sac", "Sac"],
+        "Flock Type": ["WOAH Poultry", None],
+        "Flock Size": ["7", "n/a"],
+    }))
+
+    assert df["Outbreak Date"].tolist() == [pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-09")]
+    # Names are trimmed on the categories, and categories that end up equal are merged
+    assert isinstance(df["State"].dtype, pd.CategoricalDtype)
+    assert df["State"].cat.categories.tolist() == ["Iowa"]
+    assert df["County"].tolist() == ["Sac", "Sac"]
+    assert df["Flock Type"].isna().tolist() == [False, True]
+    assert df["Flock Size"].dtype == "int32"
+    assert df["Flock Size"].tolist() == [7, 0]
+    assert df.index.name == "Index"
+
+
+def test_normalize_frame_is_idempotent():
+    df = normalize_frame(frame_with_missing_date())
+
+    pd.testing.assert_frame_equal(normalize_frame(df), df)